@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+"""compare the gevent Fetcher with the AsyncFetcher against a local fake
+MediaWiki answering every request after a fixed latency
+
+usage: time-asyncfetch.py [articles] [latency_ms] [max_requests_per_second]
+
+Both engines run in their own process with the same
+[fetch] max_requests_per_second. The gevent engine runs monkey patched,
+like in nslave.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+
+IMAGES_PER_ARTICLE = 3
+
+
+def serve(port, latency):
+    from mwlib.network.siteinfo import get_siteinfo
+
+    siteinfo = get_siteinfo("en")
+
+    class FakeWiki(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, body, content_type="application/json"):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            url = parse.urlparse(self.path)
+            if url.path.startswith("/images/"):
+                self.send_body(b"\x89PNG" + os.urandom(20000), "image/png")
+                return
+            self.answer(dict(parse.parse_qsl(url.query)))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            self.answer(dict(parse.parse_qsl(body.decode())))
+
+        def answer(self, args):
+            self.send_body(json.dumps(self.get_result(args)).encode())
+
+        def get_result(self, args):
+            action = args["action"]
+            if args.get("meta") == "siteinfo":
+                return {"query": siteinfo}
+            if action == "parse":
+                name = args.get("page") or args.get("oldid")
+                return {"parse": {"title": name, "text": {"*": f"<p>{name}</p>" * 200}}}
+            if action == "expandtemplates":
+                return {"expandtemplates": {"wikitext": f"expanded {args['title']}\n" * 200}}
+
+            pages = {}
+            for pageid, title in enumerate(args.get("titles", "").split("|"), 1):
+                page = {"pageid": pageid, "ns": 0, "title": title}
+                prop = args.get("prop", "")
+                if prop == "images":
+                    page["images"] = [
+                        {"ns": 6, "title": f"File:{title} {i}.png"}
+                        for i in range(IMAGES_PER_ARTICLE)
+                    ]
+                elif prop == "imageinfo|info":
+                    name = parse.quote(title.split(":", 1)[1])
+                    page["ns"] = 6
+                    page["imageinfo"] = [
+                        {"thumburl": f"http://127.0.0.1:{port}/images/{name}", "descriptionurl": ""}
+                    ]
+                elif prop == "contributors":
+                    page["contributors"] = [{"name": "Alice"}, {"name": "Bob"}]
+                pages[str(pageid)] = page
+            return {"query": {"pages": pages}}
+
+    ThreadingHTTPServer(("127.0.0.1", port), FakeWiki).serve_forever()
+
+
+def run_fetch(engine, port, articles):
+    import httpcore  # noqa: F401
+
+    if engine == "gevent":
+        # patch after importing httpcore, which imports trio if it is
+        # installed, which needs the unpatched select.epoll. mwlib is
+        # imported afterwards, like in nslave.
+        from gevent import monkey
+
+        monkey.patch_all()
+
+    from mwlib.network import asyncfetch, fetch, sapi
+
+    api = sapi.MwApi(f"http://127.0.0.1:{port}/w/api.php")
+    api.set_limit()
+    pages = [(f"Article {i}", None) for i in range(articles)]
+    fetcher_cls = asyncfetch.AsyncFetcher if engine == "asyncio" else fetch.Fetcher
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fsout = fetch.FsOutput(os.path.join(tmpdir, "nuwiki"))
+        stime = time.time()
+        fetcher = fetcher_cls(api, fsout, pages, licenses=[])
+        fetcher.run()
+        needed = time.time() - stime
+        num_images = len(os.listdir(os.path.join(fsout.path, "images")))
+    requests = sum(x.request_counter for x in {api, fetcher.api})
+    print(f"{engine}: {needed:.2f}s, {num_images} images, {requests} api requests")
+
+
+def main():
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    max_rps = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    port = 8765
+
+    env = dict(
+        os.environ,
+        MWLIB_FETCH_MAX_REQUESTS_PER_SECOND=str(max_rps),
+        MWLIB_HTTP2_ENABLED="false",
+    )
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", str(port), str(latency / 1000)], env=env
+    )
+    try:
+        time.sleep(1)
+        print(f"{articles} articles, {latency}ms latency, {max_rps} requests/s")
+        for engine in ("gevent", "asyncio"):
+            subprocess.run(
+                [sys.executable, __file__, "--fetch", engine, str(port), str(articles)],
+                env=env,
+                check=True,
+            )
+    finally:
+        server.kill()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--serve"]:
+        serve(int(sys.argv[2]), float(sys.argv[3]))
+    elif sys.argv[1:2] == ["--fetch"]:
+        run_fetch(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+import sys
+import time
+
+from mwlib.rendering.fontswitcher import FontSwitcher
+from mwlib.writers.rl import fontconfig
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1], encoding="utf-8") as f:
+        s = f.read()
+else:
+    s = (
+        "The Tokyo Metropolis (東京都, Tōkyō-to) is the capital of Japan. "
+        "القاهرة هي عاصمة جمهورية مصر العربية. "
+        "Seoul (서울) and Bangkok (กรุงเทพมหานคร) are mentioned as well.\n"
+    ) * 2000
+
+
+def legacy_get_font_list(fs, txt):
+    txt_list = []
+    last_font = None
+    last_txt = []
+    for c in txt:
+        ord_c = ord(c)
+        if ord_c in fs.no_switch_chars:
+            font = last_font or fs.default_font
+        else:
+            font = fs.default_font
+            for block_start, block_end, font_name in fs.code_points2font:
+                if block_start <= ord_c <= block_end:
+                    font = font_name
+                    break
+        if font != last_font and last_txt:
+            txt_list.append(("".join(last_txt), last_font))
+            last_txt = []
+        last_txt.append(c)
+        last_font = font
+    if last_txt:
+        txt_list.append(("".join(last_txt), last_font))
+    return txt_list
+
+
+fs = FontSwitcher()
+for font in fontconfig.fonts:
+    fs.register_font(font["name"], code_points=font.get("code_points"))
+fs.register_default_font("DejaVuSans")
+print("chars:", len(s))
+
+stime = time.time()
+old = legacy_get_font_list(fs, s)
+print("per char lookup:", time.time() - stime)
+
+stime = time.time()
+fs.get_font_list(s)
+print("run matching (cold):", time.time() - stime)
+
+stime = time.time()
+new = fs.get_font_list(s)
+print("run matching:", time.time() - stime)
+
+print("runs:", len(new), "identical:", [(t, f) for t, f in old] == [(t, f) for t, f in new])
@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+import re
+import sys
+import time
+
+from mwlib.core import nshandling
+from mwlib.network import siteinfo
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1], encoding="utf-8") as f:
+        raw = f.read()
+else:
+    # templates and categories repeat, most links are distinct
+    raw = "".join(
+        f"[[Berlin {i}]] ist die [[Hauptstadt]] der [[Deutschland|Bundesrepublik]]. "
+        "{{Infobox Stadt|Name=Berlin}} {{Coordinate|NS=52.5|EW=13.4}} "
+        f"[[Datei:Berlin Brandenburger Tor {i}.jpg|mini|Das Tor]] "
+        "[[image:Berliner_Dom.jpg]] [[Kategorie:Hauptstadt in Europa]] "
+        f"[[category:Ort in Berlin]] [[user:Schmir]] [[:Vorlage:Navigationsleiste {i % 10}]] "
+        f"[[Spree_(Fluss) {i}]] [[en:Berlin]] [[Wikipedia:Artikel {i}]] [[Portal:Berlin]] "
+        for i in range(500)
+    )
+
+# links are in the main namespace, templates in the template namespace
+names = [(m, 0) for m in re.findall(r"\[\[([^|\]]+)", raw)]
+names += [(m.strip(), 10) for m in re.findall(r"\{\{([^|}]+)", raw)]
+print("names:", len(names), "distinct:", len(set(names)))
+
+
+def legacy_splitname(nshandler, title, defaultns=0):
+    siteinfo = nshandler.siteinfo
+
+    def find_namespace(name, defaultns):
+        name = name.lower().strip()
+        for namespace in siteinfo["namespaces"].values():
+            star = namespace["*"]
+            if star.lower() == name or namespace.get("canonical", "").lower() == name:
+                return True, namespace["id"], star
+        for alias in siteinfo.get("namespacealiases", []):
+            if alias["*"].lower() == name:
+                nsid = alias["id"]
+                return True, nsid, siteinfo["namespaces"][str(nsid)]["*"]
+        return False, defaultns, siteinfo["namespaces"][str(defaultns)]["*"]
+
+    name = re.sub(r" +", " ", title.replace("_", " ").strip())
+    if name.startswith(":"):
+        name = name[1:].strip()
+        defaultns = 0
+    if ":" in name:
+        namespace, partial_name = name.split(":", 1)
+        was_namespace, nsnum, prefix = find_namespace(namespace, defaultns)
+        suffix = partial_name.strip() if was_namespace else name
+    else:
+        prefix = siteinfo["namespaces"][str(defaultns)]["*"]
+        suffix = name
+        nsnum = defaultns
+    suffix = nshandler.maybe_capitalize(suffix.strip("‎‏"))
+    if prefix:
+        prefix += ":"
+    return (nsnum, suffix, f"{prefix}{suffix}")
+
+
+nshandler = nshandling.NsHandler(siteinfo.get_siteinfo("de"))
+
+stime = time.time()
+old = [legacy_splitname(nshandler, name, ns) for name, ns in names]
+print("linear scan:", time.time() - stime)
+
+stime = time.time()
+nshandling.NsHandler(nshandler.siteinfo)
+print("creating a NsHandler:", time.time() - stime)
+
+stime = time.time()
+new = [nshandler._splitname(name, ns) for name, ns in names]
+print("indexed:", time.time() - stime)
+
+stime = time.time()
+new = [nshandler.splitname(name, ns) for name, ns in names]
+print("indexed + memo (cold):", time.time() - stime)
+
+stime = time.time()
+new = [nshandler.splitname(name, ns) for name, ns in names]
+print("indexed + memo (warm):", time.time() - stime)
+
+print("identical:", old == new)
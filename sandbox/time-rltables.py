@@ -0,0 +1,71 @@
+#! /usr/bin/env python
+"""time the column sizing of large tables in the rl writer"""
+
+import sys
+import time
+
+from mwlib.parser import advtree
+from mwlib.parser.refine import uparser
+from mwlib.parser.treecleaner import TreeCleaner
+from mwlib.utils import lrucache
+from mwlib.writers.rl import measure
+from mwlib.writers.rl.writer import RlWriter
+
+rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+# a sports results table: short, often repeated cell contents
+lines = ['{| class="wikitable"', "! Pos !! Club !! Pld !! W !! D !! L !! GF:GA !! Pts !! Notes"]
+for i in range(rows):
+    lines.append("|-")
+    lines.append(
+        f"| {i + 1} || FC Example {i % 40} || 34 || {i % 20} || {i % 7} || {i % 11} "
+        f"|| {i % 90}:{i % 70} || {(i * 7) % 80} || {'Relegation' if i % 5 else 'Champions League qualification'}"
+    )
+lines.append("|}")
+
+tree = uparser.parse_string(title="Test", raw="\n".join(lines))
+advtree.build_advanced_tree(tree)
+TreeCleaner(tree).clean_all()
+table = tree.get_child_nodes_by_class(advtree.Table)[0]
+table.num_cols = table.numcols
+
+writer = RlWriter(test_mode=True)
+writer.table_nesting = 1
+
+
+# cell contents are built once, only their measurement is timed
+contents = [writer.renderCell(cell) for row in table.children for cell in row.children]
+
+
+def measure_cells(get_max_para_width, repeat=5):
+    orig = measure.get_max_para_width
+    measure.get_max_para_width = get_max_para_width
+    try:
+        start = time.time()
+        for _ in range(repeat):
+            sizes = [writer.getCellSize(content, None) for content in contents]
+        return time.time() - start, sizes
+    finally:
+        measure.get_max_para_width = orig
+
+
+def no_memo(paragraph, avail_width):
+    width = measure.get_plain_text_width(paragraph, avail_width)
+    if width is None:
+        width = measure.get_wrapped_width(paragraph, avail_width)
+    return width
+
+
+legacy, legacy_sizes = measure_cells(measure.get_wrapped_width)
+fast, fast_sizes = measure_cells(no_memo)
+measure._cache.clear()
+memo, memo_sizes = measure_cells(measure.get_max_para_width)
+same = all(
+    abs(a[1] - b[1]) < 1e-6 and abs(a[1] - c[1]) < 1e-6
+    for a, b, c in zip(legacy_sizes, fast_sizes, memo_sizes)
+)
+print(f"rows: {rows} cells: {len(contents)} identical: {same}")
+print(f"wrap every paragraph: {legacy:.3f}s")
+print(f"stringWidth for plain text: {fast:.3f}s")
+print(f"stringWidth and memo: {memo:.3f}s")
+print(lrucache.stats()["rl_paragraph_widths"])
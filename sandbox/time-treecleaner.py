@@ -0,0 +1,28 @@
+#! /usr/bin/env python
+import sys
+import time
+
+from mwlib.parser import advtree
+from mwlib.parser.dummydb import DummyDB
+from mwlib.parser.refine.uparser import parse_string
+from mwlib.parser.treecleaner import TreeCleaner
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1], encoding="utf-8") as f:
+        raw = f.read()
+else:
+    # a long list and a big table: wide nodes with many siblings
+    raw = "\n".join(f"* item {i}<br/> with ''x'' <br/>" for i in range(3000))
+    raw += "\n{|\n" + "\n".join(f"|-\n| a {i} || <br/> b || c" for i in range(2000)) + "\n|}\n"
+
+stime = time.time()
+tree = parse_string(title="test", raw=raw, wikidb=DummyDB())
+print("parse: %.2fs" % (time.time() - stime))
+
+stime = time.time()
+advtree.build_advanced_tree(tree)
+print("build_advanced_tree: %.2fs" % (time.time() - stime))
+
+stime = time.time()
+TreeCleaner(tree).clean_all()
+print("clean_all: %.2fs" % (time.time() - stime))
@@ -20,6 +20,7 @@ import click
 
 from mwlib.apps.make_nuwiki import make_nuwiki
 from mwlib.apps.utils import create_zip_from_wiki_env, make_wiki_env_from_options
+from mwlib.core import revstore
 from mwlib.core.metabook import Collection
 from mwlib.network.podclient import PODClient, podclient_from_serviceurl
 from mwlib.utils import linuxmem, unorganized
@@ -228,7 +229,12 @@ class ZipCreator:
                     if skip_ext and os.path.splitext(filepath)[1] == skip_ext:
                         continue
                     arcname = os.path.relpath(filepath, source_dir)
-                    zf.write(filepath, arcname.replace("\\", "/"))
+                    # compressed revisions are stored as they are, so that
+                    # ZipNuWiki can map them without extracting them
+                    compress_type = None
+                    if filepath.endswith(revstore.FrameWriter.suffix):
+                        compress_type = zipfile.ZIP_STORED
+                    zf.write(filepath, arcname.replace("\\", "/"), compress_type=compress_type)
 
 
 def zip_dir(dirname, output=None, skip_ext=None):
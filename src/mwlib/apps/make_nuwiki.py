@@ -10,10 +10,10 @@ import gevent
 import gevent.pool
 
 from mwlib.core.metabook import Collection, get_licenses, parse_collection_page
-from mwlib.network import fetch
+from mwlib.network import asyncfetch, fetch
 from mwlib.network import sapi as mwapi
 from mwlib.parser.parse_collection_page import extract_metadata
-from mwlib.utils import myjson
+from mwlib.utils import conf, myjson
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +57,10 @@ class StartFetcher:
 
         fsout.nfo = nfo
         pages = fetch.pages_from_metabook(metabook)
-        self.fetcher = fetch.Fetcher(
+        fetcher_cls = fetch.Fetcher
+        if conf.get("fetch", "engine", "gevent") == "asyncio":
+            fetcher_cls = asyncfetch.AsyncFetcher
+        self.fetcher = fetcher_cls(
             api,
             fsout,
             pages,
@@ -21,7 +21,7 @@ import click
 
 from mwlib.apps.buildzip import make_zip
 from mwlib.apps.utils import make_wiki_env_from_options
-from mwlib.core import _locale, nuwiki, wiki
+from mwlib.core import _locale, nuwiki, wiki, workerpool
 from mwlib.rendering.writerbase import WriterError
 from mwlib.utils import conf, unorganized
 from mwlib.utils.log import setup_console_logging
@@ -36,6 +36,11 @@ USE_HELP_TEXT = "Use --help for usage information."
 def init_tmp_cleaner():
     tempfile.tempdir = tempfile.mkdtemp(prefix="tmp-%s" % os.path.basename(sys.argv[0]))
     os.environ["TMP"] = os.environ["TEMP"] = os.environ["TMPDIR"] = tempfile.tempdir
+    if workerpool.is_worker_process():
+        # the worker lives on after the job, remove the directory when the job is done
+        workerpool.at_job_exit(shutil.rmtree, tempfile.tempdir, ignore_errors=True)
+        return
+
     ppid = os.getpid()
     try:
         pid = os.fork()
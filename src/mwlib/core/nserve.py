@@ -119,7 +119,7 @@ class WatchQServe:
         print(self.prefix, msg)
 
     def _serverproxy(self):
-        return rpcclient.ServerProxy(host=self.host, port=self.port)
+        return rpcclient.get_proxy(host=self.host, port=self.port)
 
     def _mark_busy(self, is_busy):
         if is_busy and busy[self.ident] != is_busy:
@@ -140,12 +140,18 @@ class WatchQServe:
             with gevent.Timeout(self.getstats_timeout):
                 return self.qserve.getstats()
         except gevent.Timeout:
-            self.qserve = None
+            self._reset_connection()
             raise RuntimeError("timeout calling getstats")
         except BaseException as exc:
-            self.qserve = None
+            self._reset_connection()
             raise RuntimeError(f"error calling getstats: {exc}") from exc
 
+    def _reset_connection(self):
+        # the connection is shared with the http requests to nserve,
+        # a hanging connection would stall them too
+        self.qserve.get_client().close()
+        self.qserve = None
+
     def _iterate(self):
         try:
             stats = self._getstats()
@@ -259,7 +265,7 @@ class Application:
                 )
             collid2qserve[collection_id] = qserve
 
-        self.qserve = rpcclient.ServerProxy(host=qserve[0], port=qserve[1])
+        self.qserve = rpcclient.get_proxy(host=qserve[0], port=qserve[1])
 
         try:
             return method(collection_id, http_request.params, is_new)
@@ -351,18 +357,27 @@ class Application:
             "is_cached": False,
         }
 
-        self.qserve.qadd(
-            channel="makezip",
-            payload={"params": params.__dict__},
-            jobid=f"{collection_id}:makezip",
-            timeout=20 * 60,
-        )
-
-        self.qserve.qadd(
-            channel="render",
-            payload={"params": params.__dict__},
-            jobid=f"{collection_id}:render-{writer}",
-            timeout=20 * 60,
+        self.qserve.batch(
+            [
+                (
+                    "qadd",
+                    {
+                        "channel": "makezip",
+                        "payload": {"params": params.__dict__},
+                        "jobid": f"{collection_id}:makezip",
+                        "timeout": 20 * 60,
+                    },
+                ),
+                (
+                    "qadd",
+                    {
+                        "channel": "render",
+                        "payload": {"params": params.__dict__},
+                        "jobid": f"{collection_id}:render-{writer}",
+                        "timeout": 20 * 60,
+                    },
+                ),
+            ]
         )
 
         return response
@@ -394,9 +409,15 @@ class Application:
         writer = post_data.get("writer", self.default_writer)
         name_writer = name2writer[writer]
 
-        jobid = f"{collection_id}:render-{writer}"
-
-        res = self.qserve.qinfo(jobid=jobid) or {}
+        # ask for both jobs in one round trip, the makezip job is
+        # needed as long as the render job has not started
+        res, zip_res = self.qserve.batch(
+            [
+                ("qinfo", {"jobid": f"{collection_id}:render-{writer}"}),
+                ("qinfo", {"jobid": f"{collection_id}:makezip"}),
+            ]
+        )
+        res = res or {}
         info = res.get("info", {})
         done = res.get("done", False)
         error = res.get("error", None)
@@ -408,8 +429,7 @@ class Application:
             return self._process_and_return_finished_state(res, name_writer, retval)
 
         if not info:
-            jobid = f"{collection_id}:makezip"
-            res = self.qserve.qinfo(jobid=jobid) or {}
+            res = zip_res or {}
 
             done = res.get("done", False)
             if not done:
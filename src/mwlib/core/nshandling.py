@@ -32,6 +32,11 @@ NS_HELP_TALK = 13
 NS_CATEGORY = 14
 NS_CATEGORY_TALK = 15
 
+# maximum number of splitname results remembered by a NsHandler
+SPLITNAME_CACHE_SIZE = 20000
+
+_spaces_rex = re.compile(r" +")
+
 
 class ILink:
     url = ""
@@ -85,34 +90,44 @@ class NsHandler:
             prefix2_interwiki[k["prefix"]] = k
 
         self.set_redirect_matcher(siteinfo)
+        self._build_namespace_index()
 
     def set_redirect_matcher(self, siteinfo):
         self.redirect_matcher = get_redirect_matcher(siteinfo, self)
 
+    def _build_namespace_index(self):
+        # lower-cased namespace names, canonical names and aliases ->
+        # (id, name). the first namespace matching a name wins, the
+        # namespaces take precedence over the aliases.
+        namespaces = self.siteinfo.get("namespaces", {})
+        index = self.namespace_index = {}
+        for namespace in namespaces.values():
+            star = namespace["*"]
+            index.setdefault(star.lower(), (namespace["id"], star))
+            index.setdefault(namespace.get("canonical", "").lower(), (namespace["id"], star))
+
+        for alias in self.siteinfo.get("namespacealiases", []):
+            nsid = alias["id"]
+            if str(nsid) in namespaces:
+                index.setdefault(alias["*"].lower(), (nsid, namespaces[str(nsid)]["*"]))
+
+        self._splitname_cache = {}
+
     def __getstate__(self):
         data = self.__dict__.copy()
         del data['redirect_matcher']
+        del data['_splitname_cache']
         return data
 
     def __setstate__(self, data):
         self.__dict__ = data
         self.set_redirect_matcher(self.siteinfo)
-
+        self._splitname_cache = {}
 
     def _find_namespace(self, name, defaultns=0):
-        name = name.lower().strip()
-        namespaces = list(self.siteinfo["namespaces"].values())
-        for namespace in namespaces:
-            star = namespace["*"]
-            if star.lower() == name or namespace.get("canonical", "").lower() == name:
-                return True, namespace["id"], star
-
-        aliases = self.siteinfo.get("namespacealiases", [])
-        for alias in aliases:
-            if alias["*"].lower() == name:
-                nsid = alias["id"]
-                return True, nsid, self.siteinfo["namespaces"][str(nsid)]["*"]
-
+        found = self.namespace_index.get(name.lower().strip())
+        if found is not None:
+            return True, found[0], found[1]
         return False, defaultns, self.siteinfo["namespaces"][str(defaultns)]["*"]
 
     def get_fqname(self, title, defaultns=0):
@@ -126,7 +141,18 @@ class NsHandler:
     def splitname(self, title, defaultns=0):
         if not isinstance(title, str):
             title = title.decode('utf-8') if isinstance(title, bytes) else str(title)
-        name = re.sub(r' +', ' ', title.replace("_", " ").strip())
+        key = (title, defaultns)
+        try:
+            return self._splitname_cache[key]
+        except KeyError:
+            pass
+        if len(self._splitname_cache) >= SPLITNAME_CACHE_SIZE:
+            self._splitname_cache.clear()
+        res = self._splitname_cache[key] = self._splitname(title, defaultns)
+        return res
+
+    def _splitname(self, title, defaultns):
+        name = _spaces_rex.sub(' ', title.replace("_", " ").strip())
         if name.startswith(":"):
             name = name[1:].strip()
             defaultns = 0
@@ -179,7 +205,9 @@ def get_nshandler_for_lang(lang):
         site_info = siteinfo.get_siteinfo("en")
         if not site_info:
             raise ValueError("no siteinfo for en")
-    return NsHandler(site_info)
+    from mwlib.parser.sitecontext import get_site_context
+
+    return get_site_context(site_info).nshandler
 
 
 def get_redirect_matcher(siteinfo, handler=None):
@@ -19,6 +19,7 @@ logger = logging.getLogger(__name__)
 
 CACHE_DIR = None
 CACHE_URL = None
+WORKER_POOL = None
 
 
 # -- find_ip is copied from woof sources
@@ -53,7 +54,10 @@ def get_collection_dir(collection_id):
 def system(args, timeout=None):
     stime = time.time()
 
-    retcode, stdout = proc.run_cmd(args, timeout=timeout)
+    if WORKER_POOL is not None:
+        retcode, stdout = WORKER_POOL.run_cmd(args, timeout=timeout)
+    else:
+        retcode, stdout = proc.run_cmd(args, timeout=timeout)
 
     d = time.time() - stime
 
@@ -221,6 +225,75 @@ class Commands:
         return doit(**params)
 
 
+def _mw_zip(args):
+    from mwlib.apps import buildzip
+
+    buildzip.main.main(args=args, prog_name="mw-zip")
+
+
+def _mw_render(args):
+    from mwlib.apps import render
+
+    render.main.main(args=args, prog_name="mw-render")
+
+
+_module_snapshots = []
+
+
+def _preload_worker():
+    """import and initialize everything mw-zip and mw-render need
+
+    runs once in the worker pool's zygote process, the workers inherit
+    the result.
+    """
+    from mwlib.apps import buildzip, render  # noqa: F401
+    from mwlib.network.siteinfo import get_siteinfo
+
+    for name in ("rl", "odf"):
+        try:
+            render.load_writer(name)
+        except Exception as exc:
+            logger.warning(f"could not preload writer {name!r}: {exc}")
+
+    try:
+        from reportlab import rl_config
+
+        from mwlib.writers.rl import fontconfig, pdfstyles
+
+        fontconfig.RLFontSwitcher().register_reportlab_fonts(fontconfig.fonts)
+    except ImportError:
+        pass
+    else:
+        # the rl writer modifies these modules for rtl languages
+        for mod in (pdfstyles, rl_config):
+            _module_snapshots.append((mod, dict(vars(mod))))
+
+    get_siteinfo("en")
+
+
+def _cleanup_worker():
+    for mod, snapshot in _module_snapshots:
+        namespace = vars(mod)
+        for name in set(namespace) - set(snapshot):
+            del namespace[name]
+        namespace.update(snapshot)
+
+
+def start_worker_pool(numprocs, max_jobs, max_rss):
+    global WORKER_POOL
+    from mwlib.core.workerpool import WorkerPool
+
+    WORKER_POOL = WorkerPool(
+        {"mw-zip": _mw_zip, "mw-render": _mw_render},
+        size=numprocs,
+        max_jobs=max_jobs,
+        max_rss=max_rss,
+        preload=_preload_worker,
+        cleanup=_cleanup_worker,
+    )
+    WORKER_POOL.start()
+
+
 def start_serving_files(cachedir, address, port):
     from gevent.pywsgi import WSGIServer
 
@@ -258,10 +331,14 @@ def main():
     http_address = "0.0.0.0"
     http_port = int(os.environ.get("PORT", 8898))
     serve_files = True
+    use_worker_pool = False
+    max_jobs_per_worker = 50
+    max_worker_rss = 0
 
     opts, args = argv.parse(
         sys.argv[1:],
-        "--no-serve-files --serve-files-port= --serve-files-address= --serve-files --cachedir= --url= --numprocs=",
+        "--no-serve-files --serve-files-port= --serve-files-address= --serve-files --cachedir= --url= --numprocs= "
+        "--worker-pool --max-jobs-per-worker= --max-worker-rss=",
     )
     for o, a in opts:
         if o == "--cachedir":
@@ -277,10 +354,20 @@ def main():
             http_port = int(a)
         elif o == "--serve-files-address":
             http_address = str(a)
+        elif o == "--worker-pool":
+            use_worker_pool = True
+        elif o == "--max-jobs-per-worker":
+            max_jobs_per_worker = int(a)
+        elif o == "--max-worker-rss":
+            max_worker_rss = int(a)
 
     if CACHE_DIR is None:
         sys.exit("nslave: missing --cachedir argument")
 
+    if use_worker_pool:
+        # fork the workers before any greenlets are running
+        start_worker_pool(numgreenlets, max_jobs_per_worker, max_worker_rss)
+
     if serve_files:
         wsgi_server = start_serving_files(CACHE_DIR, http_address, http_port)
         port = wsgi_server.socket.getsockname()[1]
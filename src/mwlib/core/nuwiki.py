@@ -1,41 +1,42 @@
 # Copyright (c) 2007-2009 PediaPress GmbH
 # See README.rst for additional licensing information.
 
+import io
 import logging
+import mmap
 import os
 import shutil
+import sqlite3
+import struct
 import tempfile
 import urllib
 import urllib.parse
 import zipfile
 from hashlib import sha256
 
-from sqlitedict import SqliteDict
+from sqlitedict import decode
 
 from mwlib import parser
 from mwlib.core import metabook, nshandling
 from mwlib.core.authors import get_authors
+from mwlib.core.revstore import RevisionStore, index_filename
 from mwlib.parser import advtree
 from mwlib.parser.expander import Expander, find_template, get_template_args, get_templates
 from mwlib.parser.refine import uparser
+from mwlib.parser.sitecontext import get_site_context
 from mwlib.parser.templ.parser import parse
 from mwlib.utils import myjson as json
 from mwlib.utils import unorganized
-from mwlib.utils.unorganized import python2sort
 
 log = logging.getLogger(__name__)
 
 
-class Page:
-    expanded = 0
-
-    def __init__(self, meta, rawtext):
-        self.__dict__.update(meta)
-        self.rawtext = rawtext
-
-
 class DumbJsonDB:
-    database = None
+    """read access to a SqliteDict database written by FsOutput"""
+
+    _database = None
+    _pid = None
+    tablename = "unnamed"  # the default table of SqliteDict
 
     def __init__(self, file_name, allow_pickle=False):
         self.file_name = file_name
@@ -43,14 +44,31 @@ class DumbJsonDB:
         self.read_db()
 
     def read_db(self):
-        self.database = SqliteDict(self.file_name)
+        # the file does not change anymore: sqlite neither needs to lock it
+        # nor to check for changes made by other connections
+        path = urllib.parse.quote(os.path.abspath(self.file_name))
+        self._database = sqlite3.connect(
+            f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+        self._pid = os.getpid()
+
+    @property
+    def database(self):
+        # a sqlite connection must not be used across fork, forked worker
+        # processes like the ones of the rl writer open their own
+        if self._pid != os.getpid():
+            self.read_db()
+        return self._database
 
     def __getitem__(self, key):
-        val = self.database.get(key, "")
-        if val:
-            return json.loads(val)
-        else:
-            return None
+        row = self.database.execute(
+            f'SELECT value FROM "{self.tablename}" WHERE key = ?', (key,)
+        ).fetchone()
+        if row is not None:
+            val = decode(row[0])
+            if val:
+                return json.loads(val)
+        return None
 
     def get(self, key, default=None):
         res = self[key]
@@ -60,7 +78,12 @@ class DumbJsonDB:
             return res
 
     def items(self):
-        return list(self.database.items())
+        rows = self.database.execute(f'SELECT key, value FROM "{self.tablename}" ORDER BY rowid')
+        return [(key, decode(value)) for key, value in rows]
+
+    def close(self):
+        if self._pid == os.getpid():
+            self._database.close()
 
     def __getstate__(self):
         # Pickling zip based containers is not supported and currently not needed.
@@ -70,7 +93,8 @@ class DumbJsonDB:
                 "ERROR: pickling not allowed for zip files. Use unzipped zip file instead"
             )
         data = self.__dict__.copy()
-        del data["database"]
+        del data["_database"]
+        del data["_pid"]
         return data
 
     def __setstate__(self, data):
@@ -94,30 +118,30 @@ class NuWiki:
         self.revisions = {}
         self._read_revisions()
 
-        file_name = os.path.join(self.path, "authors.db")
-        if not os.path.exists(file_name):
+        file_name = self._pathjoin("authors.db")
+        if not self._exists(file_name):
             self.authors = None
             log.warning("no authors present. parsing revision info instead")
         else:
-            self.authors = DumbJsonDB(file_name, allow_pickle=allow_pickle)
+            self.authors = DumbJsonDB(self._disk_path(file_name), allow_pickle=allow_pickle)
 
-        file_name = os.path.join(self.path, "html.db")
-        if not os.path.exists(file_name):
+        file_name = self._pathjoin("html.db")
+        if not self._exists(file_name):
             self.html = self.extract_html(self._loadjson("parsed_html.json", {}))
             log.warning("no html present. parsing revision info instead")
         else:
-            self.html = DumbJsonDB(file_name, allow_pickle=allow_pickle)
+            self.html = DumbJsonDB(self._disk_path(file_name), allow_pickle=allow_pickle)
 
-        file_name = os.path.join(self.path, "imageinfo.db")
-        if not os.path.exists(file_name):
+        file_name = self._pathjoin("imageinfo.db")
+        if not self._exists(file_name):
             self.imageinfo = self._loadjson("imageinfo.json", {})
             log.warning("loading imageinfo from pickle")
         else:
-            self.imageinfo = DumbJsonDB(file_name, allow_pickle=allow_pickle)
+            self.imageinfo = DumbJsonDB(self._disk_path(file_name), allow_pickle=allow_pickle)
 
         self.redirects = self._loadjson("redirects.json", {})
         self.siteinfo = self._loadjson("siteinfo.json", {})
-        self.nshandler = nshandling.NsHandler(self.siteinfo)
+        self.nshandler = get_site_context(self.siteinfo).nshandler
         self.en_nshandler = nshandling.get_nshandler_for_lang("en")
         self.nfo = self._loadjson("nfo.json", {})
 
@@ -126,6 +150,7 @@ class NuWiki:
     def __getstate__(self):
         data = self.__dict__.copy()
         del data["make_print_template"]
+        data.pop("revstore", None)
         return data
 
     def __setstate__(self, data):
@@ -138,40 +163,38 @@ class NuWiki:
     def _loadjson(self, path, default=None):
         path = self._pathjoin(path)
         if self._exists(path):
-            return json.load(open(path, "rb"))
+            return json.loads(bytes(self._read(path)))
         return default
 
     def _read_revisions(self):
+        self.revstore = RevisionStore()
         count = 1
         while True:
-            file_name = self._pathjoin(f"revisions-{count}.txt")
-            if not os.path.exists(file_name):
-                break
+            file_name = self._pathjoin(f"revisions-{count}.frames")
+            if not self._exists(file_name):
+                file_name = self._pathjoin(f"revisions-{count}.txt")
+                if not self._exists(file_name):
+                    break
             count += 1
             log.info(f"reading {file_name}")
-            with open(self._pathjoin(file_name), "rb") as f:
-                file_content = str(f.read(), "utf-8")
-            pages = file_content.split("\n --page-- ")
-
-            for page in pages[1:]:
-                jmeta, rawtext = page.split("\n", 1)
-                meta = json.loads(jmeta)
-                new_page = Page(meta, rawtext)
+            entries = self._loadjson(index_filename(file_name))
+            buf, start, end = self._map(file_name)
+            for new_page in self.revstore.add(buf, start, end, entries):
                 if new_page.title in self.excluded and new_page.ns != 0:
                     new_page.rawtext = chr(0xEBAD)
-                revid = meta.get("revid")
-                if revid is None:
+                if new_page.revid is None:
                     self.revisions[new_page.title] = new_page
                     continue
 
-                self.revisions[meta["revid"]] = new_page
+                self.revisions[new_page.revid] = new_page
 
-        tmp = list(self.revisions.items())
-        python2sort(tmp, reverse=True)
-        for revid, page in tmp:
-            title = page.title
-            if title not in self.revisions:
-                self.revisions[title] = page
+        # titles without a revision-less page map to their latest revision
+        latest = {}
+        for revid, page in self.revisions.items():
+            if isinstance(revid, int) and (page.title not in latest or revid > latest[page.title].revid):
+                latest[page.title] = page
+        for title, page in latest.items():
+            self.revisions.setdefault(title, page)
 
     def _pathjoin(self, *paths):
         return os.path.join(self.path, *paths)
@@ -179,6 +202,24 @@ class NuWiki:
     def _exists(self, path):
         return os.path.exists(path)
 
+    def _read(self, path):
+        """return the content of file path as bytes-like object"""
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _disk_path(self, path):
+        """make sure path exists on disk for tools that cannot read it otherwise"""
+        return path
+
+    def _map(self, path):
+        """return (buffer, start, end) with the content of file path"""
+        with open(self._disk_path(path), "rb") as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                buf = b""
+        return buf, 0, len(buf)
+
     def get_siteinfo(self):
         return self.siteinfo
 
@@ -242,6 +283,7 @@ class NuWiki:
         hex_digest += ext
         safe_path = self._pathjoin("images", "safe", hex_digest)
         log.debug(safe_path)
+        self._disk_path(path)
         if not os.path.exists(safe_path):
             log.debug("no such file: %s" % safe_path)
             try:
@@ -303,8 +345,8 @@ def extract_member(zipfile, member, dstdir):
         os.makedirs(upperdirs)
 
     if not member.filename.endswith("/"):
-        with open(targetpath, "wb") as output_file:
-            output_file.write(zipfile.read(member.filename))
+        with zipfile.open(member) as source, open(targetpath, "wb") as output_file:
+            shutil.copyfileobj(source, output_file)
 
 
 def extractall(zip_file, dst):
@@ -314,6 +356,82 @@ def extractall(zip_file, dst):
         extract_member(zip_file, zipinfo, dst)
 
 
+class ZipNuWiki(NuWiki):
+    """NuWiki reading directly from a collection zip file
+
+    revisions and json files are read from the zip file on demand. Members
+    are only extracted into a temporary directory when they have to exist
+    on disk: the sqlite databases and images handed to external tools.
+    """
+
+    def __init__(self, zip_file):
+        self.zip_file = zip_file
+        self.members = {
+            info.filename: info for info in zip_file.infolist() if not info.filename.endswith("/")
+        }
+        self._mmap = None
+        try:
+            self._mmap = mmap.mmap(zip_file.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            pass
+        super().__init__(tempfile.mkdtemp(), allow_pickle=False)
+
+    def __getstate__(self):
+        raise ValueError("ERROR: pickling not allowed for zip files. Use unzipped zip file instead")
+
+    def _member(self, path):
+        name = os.path.relpath(path, self.path).replace(os.sep, "/")
+        return self.members.get(name)
+
+    def _exists(self, path):
+        return self._member(path) is not None or os.path.exists(path)
+
+    def _stored_offset(self, info):
+        """offset of the data of an uncompressed member in the mapped zip file"""
+        if self._mmap is None or info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+            return None
+        name_len, extra_len = struct.unpack("<HH", self._mmap[info.header_offset + 26 : info.header_offset + 30])
+        return info.header_offset + 30 + name_len + extra_len
+
+    def _read(self, path):
+        info = self._member(path)
+        if info is None:
+            return super()._read(path)
+        offset = self._stored_offset(info)
+        if offset is not None:
+            # stored members are served straight from the mapped zip file
+            return memoryview(self._mmap)[offset : offset + info.file_size]
+        return self.zip_file.read(info)
+
+    def _map(self, path):
+        info = self._member(path)
+        offset = None if info is None else self._stored_offset(info)
+        if offset is None:
+            # compressed members are extracted, so that they can be mapped
+            return super()._map(path)
+        return self._mmap, offset, offset + info.file_size
+
+    def _disk_path(self, path):
+        info = self._member(path)
+        if info is not None and not os.path.exists(path):
+            log.debug(f"extracting {info.filename}")
+            extract_member(self.zip_file, info, self.path + os.sep)
+        return path
+
+    def close(self):
+        self.revstore = None
+        self.revisions = {}
+        for db in (self.authors, self.html, self.imageinfo):
+            if isinstance(db, DumbJsonDB):
+                db.close()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:  # a member is still referenced
+                return
+            self._mmap = None
+
+
 class Adapt:
     edits = None
     interwikimap = None
@@ -321,10 +439,7 @@ class Adapt:
 
     def __init__(self, path_or_instance):
         if isinstance(path_or_instance, zipfile.ZipFile):
-            zip_file = path_or_instance
-            tmpdir = tempfile.mkdtemp()
-            extractall(zip_file, tmpdir)
-            path_or_instance = tmpdir
+            path_or_instance = ZipNuWiki(path_or_instance)
             self.was_tmpdir = True
 
         if isinstance(path_or_instance, str):
@@ -451,6 +566,8 @@ class Adapt:
         return res
 
     def clear(self):
+        if isinstance(self.nuwiki, ZipNuWiki):
+            self.nuwiki.close()
         if self.was_tmpdir and os.path.exists(self.nuwiki.path):
             print("removing %r" % self.nuwiki.path)
             shutil.rmtree(self.nuwiki.path, ignore_errors=True)
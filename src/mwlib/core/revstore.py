@@ -0,0 +1,295 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.rst for additional licensing information.
+
+"""lazily decoded page revisions of a nuwiki
+
+The pages fetched for a collection are stored in one of two formats:
+
+- a revisions-N.frames file starts with FILE_MAGIC and holds one frame
+  per page: a FRAME_HEADER with the codec and the lengths of the parts,
+  the json encoded page header and the page text, compressed with zlib
+  or zstd.
+- a revisions-N.txt file, written by older versions and with
+  [fetch] revisions_compression = none, holds the plain page texts, each
+  one preceded by a header line "\\n\\f --page-- <json>\\n".
+
+Instead of decoding every page up front, only the headers are read into
+small Page records pointing at the byte range of the frame or of the page
+text. The text is decoded when it is first accessed and kept in a bounded
+cache.
+
+The byte ranges are either read from a revisions-N.idx file written while
+fetching or found by scanning the revisions file for page headers.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from mwlib.utils.lrucache import LRUCache
+
+PAGE_SEPARATOR = b"\n\f --page-- "
+
+FILE_MAGIC = b"MWREV\x00\x00\x01"
+# codec, length of the json header, length of the stored and of the
+# decoded text
+FRAME_HEADER = struct.Struct("<BIII")
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+
+def index_filename(revisions_filename):
+    """return the name of the index file belonging to revisions_filename"""
+    return os.path.splitext(revisions_filename)[0] + ".idx"
+
+
+def is_framed(buf, start=0):
+    """return True if buf[start:] is a revisions-N.frames file"""
+    return bytes(buf[start : start + len(FILE_MAGIC)]) == FILE_MAGIC
+
+
+def compress(data, codec):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data)
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def decompress(data, codec, size):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd compressed revisions")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    return bytes(data)
+
+
+def scan_revisions(buf, start=0, end=None):
+    """find all pages in buf[start:end]
+
+    Return a list of (meta, offset, length) tuples, where offset and length
+    give the position of the page text relative to start.
+    """
+    if end is None:
+        end = len(buf)
+    entries = []
+    sep_len = len(PAGE_SEPARATOR)
+    pos = buf.find(PAGE_SEPARATOR, start, end)
+    while pos != -1:
+        header_start = pos + sep_len
+        header_end = buf.find(b"\n", header_start, end)
+        if header_end == -1:
+            header_end = end
+        meta = json.loads(bytes(buf[header_start:header_end]))
+        text_start = min(header_end + 1, end)
+        pos = buf.find(PAGE_SEPARATOR, text_start, end)
+        text_end = end if pos == -1 else pos
+        entries.append((meta, text_start - start, text_end - text_start))
+    return entries
+
+
+def scan_frames(buf, start=0, end=None):
+    """find all frames in the revisions-N.frames file buf[start:end]
+
+    Return a list of (meta, offset, length) tuples, where offset and length
+    give the position of the frame relative to start.
+    """
+    if end is None:
+        end = len(buf)
+    entries = []
+    pos = start + len(FILE_MAGIC)
+    while pos + FRAME_HEADER.size <= end:
+        _, meta_len, data_len, _ = FRAME_HEADER.unpack_from(buf, pos)
+        meta_start = pos + FRAME_HEADER.size
+        meta = json.loads(bytes(buf[meta_start : meta_start + meta_len]))
+        length = FRAME_HEADER.size + meta_len + data_len
+        entries.append((meta, pos - start, length))
+        pos += length
+    return entries
+
+
+def read_frame_text(buf, offset):
+    """return the decoded text of the frame at buf[offset:]"""
+    codec, meta_len, data_len, text_len = FRAME_HEADER.unpack_from(buf, offset)
+    data_start = offset + FRAME_HEADER.size + meta_len
+    data = decompress(buf[data_start : data_start + data_len], codec, text_len)
+    return str(data, "utf-8")
+
+
+class TextWriter:
+    """write pages to a revisions-N.txt file"""
+
+    suffix = ".txt"
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")  # noqa: SIM115
+        self.offset = 0
+        self.index = []  # (meta, offset, length) of the page texts
+
+    def write(self, meta, text):
+        header = ("\n\f --page-- %s\n" % json.dumps(meta, sort_keys=True)).encode("utf-8")
+        text = text.encode("utf-8")
+        self.file.write(header)
+        self.file.write(text)
+        self.offset += len(header)
+        self.index.append((meta, self.offset, len(text)))
+        self.offset += len(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+        with open(index_filename(self.path), "w", encoding="utf8") as out_file:
+            json.dump(self.index, out_file, sort_keys=True)
+
+
+class FrameWriter:
+    """write pages as compressed frames to a revisions-N.frames file
+
+    The index entries are appended to the index file as the frames are
+    written, instead of being kept in memory until the end.
+    """
+
+    suffix = ".frames"
+
+    def __init__(self, path, codec=CODEC_ZLIB):
+        if codec == CODEC_ZSTD and zstandard is None:
+            raise RuntimeError("zstandard is required to write zstd compressed revisions")
+        self.path = path
+        self.codec = codec
+        self.file = open(path, "wb")  # noqa: SIM115
+        self.file.write(FILE_MAGIC)
+        self.offset = len(FILE_MAGIC)
+        self.index_file = open(index_filename(path), "w", encoding="utf8")  # noqa: SIM115
+        self.index_file.write("[")
+        self.count = 0
+
+    def write(self, meta, text):
+        meta_data = json.dumps(meta, sort_keys=True).encode("utf-8")
+        text = text.encode("utf-8")
+        codec, data = self.codec, compress(text, self.codec)
+        if len(data) >= len(text):
+            codec, data = CODEC_NONE, text
+        self.file.write(FRAME_HEADER.pack(codec, len(meta_data), len(data), len(text)))
+        self.file.write(meta_data)
+        self.file.write(data)
+
+        length = FRAME_HEADER.size + len(meta_data) + len(data)
+        if self.count:
+            self.index_file.write(",")
+        self.index_file.write("\n" + json.dumps([meta, self.offset, length], sort_keys=True))
+        self.offset += length
+        self.count += 1
+
+    def flush(self):
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.file.close()
+        self.index_file.write("\n]\n")
+        self.index_file.close()
+
+
+def get_writer(path, compression="zlib"):
+    """return a writer for the revisions file path without suffix.
+    compression is one of "none", "zlib" or "zstd".
+    """
+    codec = CODECS.get(compression)
+    if codec is None:
+        raise ValueError(f"unknown revisions compression {compression!r}")
+    if codec == CODEC_NONE:
+        return TextWriter(path + TextWriter.suffix)
+    return FrameWriter(path + FrameWriter.suffix, codec)
+
+
+class Page:
+    __slots__ = ("title", "ns", "revid", "expanded", "_store", "_key", "_rawtext")
+
+    def __init__(self, meta, rawtext=None, store=None, key=None):
+        self.title = meta.get("title")
+        self.ns = meta.get("ns")
+        self.revid = meta.get("revid")
+        self.expanded = meta.get("expanded", 0)
+        self._store = store
+        self._key = key
+        self._rawtext = rawtext
+
+    @property
+    def rawtext(self):
+        if self._rawtext is not None:
+            return self._rawtext
+        return self._store.get_text(self._key)
+
+    @rawtext.setter
+    def rawtext(self, value):
+        self._rawtext = value
+
+    def __getstate__(self):
+        return {"meta": {"title": self.title, "ns": self.ns, "revid": self.revid,
+                         "expanded": self.expanded},
+                "rawtext": self.rawtext}
+
+    def __setstate__(self, state):
+        self.__init__(state["meta"], state["rawtext"])
+
+    def __repr__(self):
+        return f"<Page {self.title!r} revid={self.revid!r}>"
+
+
+class RevisionStore:
+    """byte ranges of page texts in one or more revisions buffers
+
+    Buffers are bytes-like objects supporting slicing, typically memory
+    mapped revisions files.
+    """
+
+    cache_size = 500
+
+    def __init__(self, cache_size=None):
+        self.buffers = []
+        self._cache = LRUCache(cache_size or self.cache_size)
+
+    def add(self, buf, start=0, end=None, entries=None):
+        """register buf[start:end] and return Page records for its pages
+
+        entries is the (meta, offset, length) list from an index file.
+        If it is missing, the buffer is scanned for page headers.
+        """
+        if end is None:
+            end = len(buf)
+        framed = is_framed(buf, start)
+        if entries is None:
+            entries = scan_frames(buf, start, end) if framed else scan_revisions(buf, start, end)
+        buf_no = len(self.buffers)
+        self.buffers.append((buf, start, framed))
+        return [Page(meta, store=self, key=(buf_no, offset, length))
+                for meta, offset, length in entries]
+
+    def get_text(self, key):
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        buf_no, offset, length = key
+        buf, start, framed = self.buffers[buf_no]
+        offset += start
+        if framed:
+            text = read_frame_text(buf, offset)
+        else:
+            text = str(buf[offset : offset + length], "utf-8")
+        self._cache[key] = text
+        return text
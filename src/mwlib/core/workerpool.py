@@ -0,0 +1,294 @@
+"""pool of warm worker processes running mw-zip/mw-render in-process
+
+nslave normally runs each job by spawning a fresh mw-zip or mw-render
+process, which pays interpreter startup, imports, font registration and
+siteinfo loading every time. A WorkerPool instead forks a zygote process
+once. The zygote imports and initializes everything needed and then forks
+the worker processes, which run the commands in-process. Workers exit
+after max_jobs jobs or when their resident memory exceeds max_rss
+megabytes and are replaced by fresh forks of the zygote.
+
+WorkerPool.run_cmd is a drop-in replacement for qs.proc.run_cmd.
+"""
+
+import logging
+import os
+import pickle
+import signal
+import struct
+import sys
+import tempfile
+import traceback
+
+from gevent import Timeout, queue, socket
+from gevent.lock import Semaphore
+from gevent.os import fork_gevent
+
+from mwlib.utils import linuxmem
+
+logger = logging.getLogger(__name__)
+
+_header = struct.Struct("!I")
+_pid = struct.Struct("!i")
+
+_is_worker = False
+
+
+def is_worker_process():
+    """return True if we are running inside of a pool worker"""
+    return _is_worker
+
+
+def _send(sock, obj):
+    data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_header.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise EOFError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock):
+    (size,) = _header.unpack(_recv_exactly(sock, _header.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+def _get_exit_code(exc):
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    sys.stderr.write(f"{exc.code}\n")
+    return 1
+
+
+def at_job_exit(func, *args, **kwargs):
+    """call func(*args, **kwargs) after the current job has finished
+
+    Commands running inside of a worker use this instead of forking helper
+    processes or relying on the process exit to clean up after them, e.g.
+    to remove a temporary directory they created.
+    """
+    _job_exit_funcs.append((func, args, kwargs))
+
+
+_job_exit_funcs = []
+
+
+def _run_job_exit_funcs():
+    while _job_exit_funcs:
+        func, args, kwargs = _job_exit_funcs.pop()
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("error in job exit function")
+
+
+def run_command(commands, args, cleanup=None):
+    """run args[0] from commands with arguments args[1:] in this process
+
+    stdout and stderr are captured. Returns the exit status encoded like
+    os.waitpid does and the output, just like qs.proc.run_cmd.
+    """
+    saved_cwd = os.getcwd()
+    saved_tempdir = tempfile.tempdir
+    saved_environ = dict(os.environ)
+    saved_streams = sys.stdout, sys.stderr
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = os.dup(1), os.dup(2)
+
+    output_file = tempfile.TemporaryFile()
+    os.dup2(output_file.fileno(), 1)
+    os.dup2(output_file.fileno(), 2)
+    sys.stdout = open(1, "w", encoding="utf-8", closefd=False)  # noqa: SIM115
+    sys.stderr = open(2, "w", encoding="utf-8", closefd=False)  # noqa: SIM115
+    try:
+        command = commands[args[0]]
+        command(list(args[1:]))
+        exit_code = 0
+    except SystemExit as exc:
+        exit_code = _get_exit_code(exc)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.close()
+        sys.stderr.close()
+        sys.stdout, sys.stderr = saved_streams
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in saved_fds:
+            os.close(fd)
+
+        os.chdir(saved_cwd)
+        _run_job_exit_funcs()
+        tempfile.tempdir = saved_tempdir
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception:
+                logger.exception("error while cleaning up after job")
+
+    output_file.seek(0)
+    output = output_file.read().decode("utf-8", "replace")
+    output_file.close()
+    return (exit_code & 0xFF) << 8, output
+
+
+class WorkerPool:
+    def __init__(self, commands, size=1, max_jobs=50, max_rss=0, preload=None, cleanup=None):
+        """commands maps command names to callables taking an argument list
+
+        preload is called once in the zygote before any workers are
+        forked, cleanup is called in the worker after each job.
+        """
+        self.commands = commands
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.preload = preload
+        self.cleanup = cleanup
+
+        self._idle = queue.Queue()
+        self._zygote = None
+        self._zygote_pid = None
+        self._zygote_lock = Semaphore()
+
+    def start(self):
+        """fork the zygote and the workers
+
+        call this before spawning any greenlets, so they do not end up in
+        the forked processes.
+        """
+        parent_sock, zygote_sock = socket.socketpair()
+        pid = fork_gevent()
+        if pid == 0:
+            parent_sock.close()
+            try:
+                self._zygote_main(zygote_sock)
+            finally:
+                os._exit(0)
+
+        zygote_sock.close()
+        self._zygote = parent_sock
+        self._zygote_pid = pid
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        logger.info(f"started worker pool with {self.size} workers")
+
+    def stop(self):
+        while not self._idle.empty():
+            _, sock = self._idle.get()
+            sock.close()
+        if self._zygote is not None:
+            self._zygote.close()
+            os.waitpid(self._zygote_pid, 0)
+            self._zygote = None
+
+    def _spawn(self):
+        with self._zygote_lock:
+            self._zygote.sendall(b"f")
+            data, fds, _, _ = socket.recv_fds(self._zygote, _pid.size, 1)
+        (pid,) = _pid.unpack(data)
+        return pid, socket.socket(fileno=fds[0])
+
+    def _zygote_main(self, sock):
+        if self.preload is not None:
+            try:
+                self.preload()
+            except Exception:
+                logger.exception("error while preloading worker")
+
+        while sock.recv(1):
+            worker_sock, parent_sock = socket.socketpair()
+            pid = fork_gevent()
+            if pid == 0:
+                # fork again, so workers get reparented and we don't
+                # have to reap them
+                sock.close()
+                parent_sock.close()
+                if fork_gevent() == 0:
+                    try:
+                        self._worker_main(worker_sock)
+                    finally:
+                        os._exit(0)
+                os._exit(0)
+
+            worker_sock.close()
+            os.waitpid(pid, 0)
+            data = _recv_exactly(parent_sock, _pid.size)
+            socket.send_fds(sock, [data], [parent_sock.fileno()])
+            parent_sock.close()
+
+    def _worker_main(self, sock):
+        global _is_worker
+        _is_worker = True
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        sock.sendall(_pid.pack(os.getpid()))
+
+        num_jobs = 0
+        while True:
+            try:
+                args = _recv(sock)
+            except (EOFError, OSError):
+                return
+            status, output = run_command(self.commands, args, cleanup=self.cleanup)
+            num_jobs += 1
+            retire = num_jobs >= self.max_jobs or bool(
+                self.max_rss and linuxmem.resident() > self.max_rss
+            )
+            _send(sock, (status, output, retire))
+            if retire:
+                return
+
+    def _kill(self, pid, sock):
+        sock.close()
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def run_cmd(self, args, timeout=None):
+        pid, sock = self._idle.get()
+        status, output = signal.SIGKILL, ""
+        retire = True
+
+        timer = Timeout(timeout)
+        timer.start()
+        try:
+            _send(sock, list(args))
+            status, output, retire = _recv(sock)
+        except Timeout as t:
+            if t is not timer:
+                raise
+            logger.error(f"worker {pid} timed out after {timeout}s running {args[0]}")
+            self._kill(pid, sock)
+        except (EOFError, OSError) as exc:
+            logger.error(f"worker {pid} died while running {args[0]}: {exc}")
+            output = f"worker process died: {exc}"
+            self._kill(pid, sock)
+        finally:
+            timer.cancel()
+            if retire:
+                sock.close()
+                pid, sock = self._replace(pid, sock)
+            self._idle.put((pid, sock))
+        return status, output
+
+    def _replace(self, pid, sock):
+        try:
+            return self._spawn()
+        except Exception:
+            # keep the dead worker, the next job will try again
+            logger.exception("failed to start worker")
+            return pid, sock
@@ -0,0 +1,595 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.rst for additional licensing information.
+
+"""asyncio fetch engine
+
+Fetcher runs every API request and image download in a greenlet and sends
+them with the synchronous httpx clients of HttpClientManager. AsyncFetcher
+fetches the same data and writes the same FsOutput layout with asyncio:
+
+- AsyncMwApi sends the requests of MwApi with an httpx.AsyncClient per
+  origin. Concurrent requests to a server supporting HTTP/2 are
+  multiplexed over a single connection.
+- AsyncRateLimiter allows the same number of requests in any period as
+  sapi.RateLimiter, but sleeps exactly until the next request is allowed
+  instead of polling.
+- the calls Fetcher schedules run in four stages (api, html, expand and
+  image), each a bounded queue with a fixed number of worker tasks, all
+  in one TaskGroup. A worker waits while a later stage's queue is full
+  before it takes its next call, so parsing html cannot run arbitrarily
+  far ahead of the image downloads. Calls for the same or an earlier
+  stage, e.g. the api requests of get_edits scheduled by an expansion,
+  never wait: the stages feed each other in a cycle, and waiting for
+  both directions would deadlock.
+
+Select it with::
+
+    [fetch]
+    engine = asyncio
+"""
+
+import asyncio
+import contextvars
+import inspect
+import logging
+import os
+import random
+import time
+from collections import deque
+from urllib import parse
+
+import httpx
+
+from mwlib.network import api as network_api
+from mwlib.network import fetch, fetchcache, sapi
+from mwlib.network import transport as network_transport
+from mwlib.network.http_client import HttpClientManager
+from mwlib.utils import conf
+
+logger = logging.getLogger(__name__)
+
+# the stage running the calls of a Fetcher method. all others run in "api"
+STAGES = {
+    "_fetch_html": "html",
+    "expand_templates_from_title": "expand",
+    "expand_revision": "expand",
+    "_download_image": "image",
+}
+
+_current_stage = contextvars.ContextVar("current_stage", default=None)
+_outbox = contextvars.ContextVar("outbox", default=None)
+
+
+def get_origin(url):
+    parsed = parse.urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class AsyncRateLimiter:
+    """allow max_calls calls in any period, like sapi.RateLimiter"""
+
+    def __init__(self, max_calls, period=1.0):
+        self.max_calls = max_calls
+        self.period = period
+        self._timestamps = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """wait until a call is allowed. waiting callers are served in
+        order.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            while self._timestamps and self._timestamps[0] <= now - self.period:
+                self._timestamps.popleft()
+            if len(self._timestamps) >= self.max_calls:
+                await asyncio.sleep(self._timestamps.popleft() + self.period - now)
+            self._timestamps.append(time.monotonic())
+
+
+class AsyncSession:
+    """the httpx.AsyncClients and rate limiters of one event loop
+
+    transport is passed to every client, e.g. an httpx.MockTransport.
+    """
+
+    def __init__(self, transport=None):
+        self.transport = transport
+        self.clients = {}
+        self.rate_limiters = {}
+
+    def _use_http2(self, url):
+        _, use_http2 = network_transport.resolve_base_url_and_http2(
+            url,
+            conf_module=conf,
+            client_manager_factory=HttpClientManager.get_instance,
+            logger=logger,
+        )
+        return use_http2
+
+    async def get_client(self, url, role="download", **kwargs):
+        """return the client used for role requests to the origin of url.
+        kwargs are passed to httpx.AsyncClient if it is created.
+        """
+        key = (get_origin(url), role)
+        client = self.clients.get(key)
+        if client is not None:
+            return client
+
+        # detecting HTTP/2 support sends a request
+        http2 = False
+        if self.transport is None:
+            http2 = await asyncio.to_thread(self._use_http2, url)
+        client = self.clients.get(key)
+        if client is None:
+            max_connections = conf.get("fetch", "max_connections", 20, int)
+            kwargs.setdefault("headers", HttpClientManager.get_instance().get_default_headers())
+            client = self.clients[key] = httpx.AsyncClient(
+                http2=http2,
+                transport=self.transport,
+                timeout=httpx.Timeout(30.0),
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=min(max_connections, 10),
+                    keepalive_expiry=30.0,
+                ),
+                **kwargs,
+            )
+            logger.info(f"Created async client using {'HTTP/2' if http2 else 'HTTP/1.1'} for {url}")
+        return client
+
+    async def acquire_rate_limit(self, url, max_rps, role="api"):
+        if max_rps <= 0:
+            return
+        key = (get_origin(url), role)
+        limiter = self.rate_limiters.get(key)
+        if limiter is None or limiter.max_calls != max_rps:
+            limiter = self.rate_limiters[key] = AsyncRateLimiter(max_rps)
+        await limiter.acquire()
+
+    async def aclose(self):
+        clients = list(self.clients.values())
+        self.clients = {}
+        for client in clients:
+            await client.aclose()
+
+
+class AsyncMwApi(sapi.MwApi):
+    """MwApi sending its requests with the httpx.AsyncClients of an
+    AsyncSession
+
+    It shares the synchronous client of MwApi for the same api url, and
+    with it the login cookies, basic auth and OAuth2 token: log in with
+    MwApi before creating the AsyncMwApi. The methods of MwApi sending a
+    single request return the coroutine of do_request, the ones combining
+    several requests are overridden. login, upload and get_edits are only
+    available on MwApi.
+    """
+
+    def __init__(self, apiurl, session, use_oauth2=None, use_http2=None):
+        sapi.MwApi.__init__(self, apiurl, use_oauth2=use_oauth2, use_http2=use_http2)
+        self.session = session
+        self.request_semaphore = asyncio.Semaphore(self.api_request_limit)
+
+    @classmethod
+    def from_api(cls, api, session):
+        async_api = cls(api.apiurl, session, use_oauth2=api.use_oauth2, use_http2=api.use_http2)
+        async_api.cache_identity = api.cache_identity
+        return async_api
+
+    async def _get_client(self):
+        return await self.session.get_client(
+            self.apiurl,
+            role="api",
+            headers=self.http_client.headers,
+            cookies=self.http_client.cookies,
+            auth=None if self.use_oauth2 else self.http_client.auth,
+        )
+
+    async def _fetch(
+        self,
+        url,
+        max_retries=0,
+        initial_delay=1,
+        backoff_factor=2,
+        method="GET",
+        data=None,
+        headers=None,
+        max_delay=None,
+        jitter=0.0,
+    ):
+        method_normalized = self._normalize_http_method(method)
+        await self.session.acquire_rate_limit(
+            url, conf.get("fetch", "max_requests_per_second", 0, int)
+        )
+
+        request_headers = self._build_request_headers(headers=headers)
+        retry_policy = self._build_retry_policy(max_retries, backoff_factor, jitter, max_delay)
+        retry_state = network_api.FetchRetryState(delay=initial_delay)
+        client = await self._get_client()
+
+        while True:
+            try:
+                response = await client.request(
+                    method_normalized, url, content=data, headers=request_headers
+                )
+                response.raise_for_status()
+                return response.content
+
+            except (
+                httpx.HTTPStatusError,
+                httpx.LocalProtocolError,
+                httpx.ReadTimeout,
+                httpx.RequestError,
+            ) as err:
+                error = self._classify_retryable_fetch_error(url, err)
+                delays = []
+                should_retry, retry_state = network_api.retry_or_raise(
+                    url=url,
+                    error=error,
+                    retry_state=retry_state,
+                    retry_policy=retry_policy,
+                    logger=logger,
+                    sleep_fn=delays.append,
+                    uniform_fn=random.uniform,
+                )
+                if not should_retry:
+                    raise
+                await asyncio.sleep(delays[0])
+
+            except Exception as err:
+                self._log_error(url, "other", err)
+                raise
+
+    async def _request(self, **kwargs):
+        url = self._build_url(**kwargs)
+        return await self._fetch(url, method="GET", max_retries=self.max_retry_count)
+
+    async def _get_cached(self, cache_kind, kwargs, fetch):
+        if cache_kind is None or self.fetch_cache is None:
+            return await fetch()
+        return await self.fetch_cache.get_response_async(
+            self.apiurl, cache_kind, kwargs, fetch, identity=self.cache_identity
+        )
+
+    async def _post(self, cache_kind=None, **kwargs):
+        return await self._get_cached(cache_kind, kwargs, lambda: self._do_post(**kwargs))
+
+    async def _do_post(self, **kwargs):
+        postdata, headers = self._encode_post(kwargs)
+        self._count_request(kwargs)
+        data = await self._fetch(self.apiurl, method="POST", data=postdata, headers=headers)
+        return sapi.loads(data)
+
+    async def do_request(self, use_post=False, **kwargs):
+        async with self.request_semaphore:
+            if self.use_oauth2:
+                await asyncio.to_thread(self._ensure_oauth2_token)
+            if use_post:
+                return await self._post(**kwargs)
+            return await self._do_request(**kwargs)
+
+    async def _handle_request(self, cache_kind=None, **kwargs):
+        return await self._get_cached(cache_kind, kwargs, lambda: self._send_request(**kwargs))
+
+    async def _send_request(self, **kwargs):
+        self._count_request(kwargs)
+        response_data = await self._request(**kwargs)
+        return self._decode_response(response_data, kwargs)
+
+    async def _do_request(self, query_continue=True, merge_data=None, cache_kind=None, **kwargs):
+        action = kwargs["action"]
+        retval = {}
+        last_qc = None
+        while kwargs is not None:
+            data = await self._handle_request(cache_kind=cache_kind, **kwargs)
+            kwargs, last_qc = self._merge_response(
+                retval, action, data, merge_data, query_continue, last_qc, kwargs
+            )
+        return retval
+
+    async def get_siteinfo(self):
+        siprop = [
+            "general",
+            "namespaces",
+            "interwikimap",
+            "namespacealiases",
+            "magicwords",
+            "rightsinfo",
+        ]
+        while len(siprop) >= 3:
+            try:
+                return await self.do_request(
+                    action="query", meta="siteinfo", siprop="|".join(siprop)
+                )
+            except Exception as err:
+                logger.exception(err)
+                siprop.pop()
+        raise RuntimeError("could not get siteinfo")
+
+    async def fetch_pages(self, titles=None, revids=None):
+        rev_kwargs, cat_kwargs = self._get_pages_requests(titles, revids)
+        rev_result, cat_result = await asyncio.gather(
+            self.do_request(action="query", cache_kind="pages", **rev_kwargs),
+            self.do_request(action="query", cache_kind="categories", **cat_kwargs),
+        )
+        sapi.merge_data(rev_result, cat_result)
+        return rev_result
+
+    async def get_contributors(self, titles, rvlimit=None):
+        kwargs, merge_data, contributors_by_title = self._get_contributors_request(titles, rvlimit)
+        await self.do_request(
+            action="query", cache_kind="contributors", merge_data=merge_data, **kwargs
+        )
+        return contributors_by_title
+
+
+class Stage:
+    """a bounded queue of scheduled calls and the number of worker tasks
+    running them
+
+    Calls scheduled before the fetch starts or by the workers of this or
+    a later stage (higher rank) never wait: they are kept in overflow
+    while the queue is full.
+    """
+
+    def __init__(self, name, rank, num_workers, maxsize):
+        self.name = name
+        self.rank = rank
+        self.num_workers = max(1, num_workers)
+        self.queue = asyncio.Queue(maxsize)
+        self.overflow = deque()
+
+    def put_nowait(self, item):
+        if self.overflow or self.queue.full():
+            self.overflow.append(item)
+        else:
+            self.queue.put_nowait(item)
+
+    def refill(self):
+        while self.overflow and not self.queue.full():
+            self.queue.put_nowait(self.overflow.popleft())
+
+
+class AsyncFetcher(fetch.Fetcher):
+    """Fetcher running its requests and downloads with asyncio
+
+    api is a logged in MwApi. It fetches the siteinfo before the event
+    loop starts, all other requests are sent by an AsyncMwApi.
+    """
+
+    def __init__(self, api, fsout, pages, licenses, transport=None, **kwargs):
+        self.session = AsyncSession(transport=transport)
+        api_workers = conf.get("fetch", "api_request_limit", 15, int)
+        html_workers = conf.get("fetch", "parse_request_limit", 5, int)
+        image_workers = conf.get("fetch", "max_connections", 10, int)
+        self.stages = {
+            "api": Stage("api", 0, api_workers, 4 * api_workers),
+            "html": Stage("html", 1, html_workers, 4 * html_workers),
+            "expand": Stage("expand", 2, html_workers, 4 * html_workers),
+            "image": Stage("image", 3, image_workers, 4 * image_workers),
+        }
+        self._outstanding = 0
+        self._finished = asyncio.Event()
+
+        fetch.Fetcher.__init__(self, api, fsout, pages, licenses, **kwargs)
+
+        self.api = AsyncMwApi.from_api(api, self.session)
+        self.api.report = self.report
+        self.api_cache = {self.api.apiurl: self.api}
+
+    def _refcall_noinc(self, fun, *args, **kwargs):
+        stage = self.stages[STAGES.get(fun.__name__, "api")]
+        item = (fun, args, kwargs)
+        self._outstanding += 1
+        outbox = _outbox.get()
+        current = _current_stage.get()
+        if outbox is None or stage.rank <= current.rank:
+            stage.put_nowait(item)
+        else:
+            outbox.append((stage, item))
+
+    async def _work(self, stage):
+        outbox = []
+        _current_stage.set(stage)
+        _outbox.set(outbox)
+        while True:
+            fun, args, kwargs = await stage.queue.get()
+            stage.refill()
+            try:
+                res = fun(*args, **kwargs)
+                if inspect.isawaitable(res):
+                    await res
+            except Exception:
+                logger.exception(f"{fun.__name__} failed")
+            finally:
+                self.count_done += 1
+                self.dispatch()
+                if self._outstanding == 1 and not outbox:
+                    # this was the last call: look up the partially filled
+                    # author batches
+                    self.lookup_contributors_for_remaining_titles()
+
+            # wait for room in the queues of the later stages this call
+            # scheduled work for. the workers of the last stage never wait,
+            # so every wait ends
+            while outbox:
+                target, item = outbox.pop(0)
+                await target.queue.put(item)
+
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._finished.set()
+
+    async def _run(self):
+        try:
+            async with asyncio.TaskGroup() as group:
+                workers = [
+                    group.create_task(self._work(stage))
+                    for stage in self.stages.values()
+                    for _ in range(stage.num_workers)
+                ]
+                if self._outstanding:
+                    await self._finished.wait()
+                for worker in workers:
+                    worker.cancel()
+        finally:
+            await self.session.aclose()
+
+    def _join(self):
+        asyncio.run(self._run())
+
+    async def _fetch_html(self, name, content):
+        kwargs = {name: content}
+        res = await self.api.do_request(action="parse", cache_kind="parse", redirects="1", **kwargs)
+        self._store_html(name, content, res)
+
+    async def expand_templates_from_revids(self, revids):
+        res = await self.api.do_request(
+            action="query",
+            cache_kind="revision",
+            prop="revisions",
+            rvprop="ids|content",
+            revids="|".join(str(x) for x in revids),
+        )
+        for page, revid, text in self._get_revision_texts(res):
+            self._refcall(self.expand_revision, page, revid, text)
+        self._refetch_missing_revids(revids, res)
+
+    async def expand_revision(self, page, revid, text):
+        res = await self.api.do_request(
+            use_post=True,
+            cache_kind="expandtemplates",
+            action="expandtemplates",
+            title=page["title"],
+            text=text,
+            prop="wikitext",
+        )
+        self._store_expanded_revision(page, revid, res.get("expandtemplates", {}).get("wikitext"))
+
+    async def expand_templates_from_title(self, title):
+        nsnum, text = self._get_transclusion(title)
+        res = await self.api.do_request(
+            action="expandtemplates",
+            cache_kind="expandtemplates",
+            title=title,
+            text=text,
+            prop="wikitext",
+        )
+        self._store_expanded_title(title, nsnum, res.get("wikitext"))
+
+    async def fetch_used(self, name, lst, expanded=False):
+        blocks = fetch.split_blocks(lst, self.api.api_request_limit)
+        self.count_total += len(blocks)
+        results = await asyncio.gather(
+            *[self.fetch_used_block(name, block, expanded) for block in blocks],
+            return_exceptions=True,
+        )
+        self.count_done += len(blocks)
+        for res in results:
+            if isinstance(res, Exception):
+                logger.error("fetch_used_block failed", exc_info=res)
+        self._schedule_edits()
+
+    async def fetch_used_block(self, name, lst, expanded):
+        kwargs = {name: lst, "fetch_images": self.fetch_images, "expanded": expanded}
+        self._handle_used(await self.api.fetch_used(**kwargs))
+        self.dispatch()
+
+    async def fetch_imageinfo(self, titles):
+        data = await self.api.fetch_imageinfo(titles=titles, iiurlwidth=self.imagesize)
+        self._handle_imageinfo(data)
+
+    async def _fetch_pages(self, *args, **kwargs):
+        self._handle_pages(await self.api.fetch_pages(**kwargs))
+
+    async def fetch_image_page(self, titles, api):
+        self._store_image_pages(await api.fetch_pages(titles))
+
+    async def handle_new_basepath(self, path):
+        api = await self._get_mwapi_for_path(path)
+        titles = self._get_image_description_titles(path)
+        if not titles:
+            return
+
+        siteinfo = await api.get_siteinfo()
+        self._schedule_image_pages(api, siteinfo, titles)
+
+    async def _get_mwapi_for_path(self, path):
+        urls = sapi.guess_api_urls(path)
+        for url in urls:
+            if url in self.api_cache:
+                return self.api_cache[url]
+        for url in urls:
+            try:
+                # creating the synchronous client may detect HTTP/2 support
+                api = await asyncio.to_thread(AsyncMwApi, url, self.session)
+                await api.ping()
+            except Exception:
+                continue
+            self.api_cache[url] = api
+            return api
+
+        raise RuntimeError(f"cannot guess api url for {path}")
+
+    async def _lookup_contributors(self, api, titles):
+        self._store_contributors(titles, await api.get_contributors(titles))
+
+    async def _download_image(self, url, title):
+        path = self.fsout.get_imagepath(title)
+        await self.download(url, path, path + "\xb7", max_retries=self.img_max_retries)
+
+    async def download(
+        self, url, path, temp_path, max_retries=0, initial_delay=1, backoff_factor=2
+    ):
+        """download url to path like fetch.download_to_file, retrying
+        HTTP 429 responses with exponential backoff"""
+        cache = fetchcache.get_fetch_cache()
+        if cache is not None and cache.fetch_file(url, path):
+            return
+
+        max_rps = conf.get("fetch", "max_requests_per_second", 1, int)
+        await self.session.acquire_rate_limit(url, max_rps, role="download")
+        client = await self.session.get_client(url)
+        retry_policy = network_transport.build_download_retry_policy(
+            max_retries, initial_delay, backoff_factor
+        )
+        retry_state = network_transport.DownloadRetryState(delay=retry_policy.initial_delay)
+        while True:
+            size_read = 0
+            try:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    with open(temp_path, "wb") as out:
+                        async for chunk in response.aiter_bytes(chunk_size=16384):
+                            size_read += len(chunk)
+                            out.write(chunk)
+                os.rename(temp_path, path)
+                break
+            except (httpx.HTTPError, OSError) as err:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                if not network_transport.should_retry_download(
+                    err,
+                    retry_state.retry_count,
+                    retry_policy.max_retries,
+                    http_status_error_cls=httpx.HTTPStatusError,
+                ):
+                    logger.error(f"ERROR DOWNLOADING {url}: {err}")
+                    raise
+                delays = []
+                retry_state = network_transport.retry_download(
+                    url=url,
+                    delay=retry_state.delay,
+                    retry_count=retry_state.retry_count,
+                    max_retries=retry_policy.max_retries,
+                    backoff_factor=retry_policy.backoff_factor,
+                    sleep_fn=delays.append,
+                    logger=logger,
+                )
+                await asyncio.sleep(delays[0])
+        logger.debug(f"read {size_read} bytes from {url}")
+
+        if cache is not None:
+            cache.store_file(url, path)
@@ -25,7 +25,8 @@ from gevent.lock import Semaphore
 from lxml import etree
 from sqlitedict import SqliteDict
 
-from mwlib.core import nshandling
+from mwlib.core import nshandling, revstore
+from mwlib.network import fetchcache
 from mwlib.network import sapi as mwapi
 from mwlib.network import transport as network_transport
 from mwlib.network import workflow as network_workflow
@@ -101,31 +102,89 @@ class SharedProgress:
 
 
 class FsOutput:
-    def __init__(self, path):
+    """write the fetched data to a nuwiki directory
+
+    The authors, html and imageinfo databases are written in WAL mode
+    and committed in batches: after commit_count writes, or with the
+    first write commit_interval seconds after the last commit. close()
+    commits the rest.
+
+    The revisions are written to revisions-1.frames, compressed with
+    compression ("zlib" or "zstd"), or to a plain revisions-1.txt if it is
+    "none".
+    """
+
+    databases = ("authors", "html", "imageinfo")
+
+    def __init__(self, path, commit_count=None, commit_interval=None, compression=None):
         self.path = os.path.abspath(path)
         if os.path.exists(self.path):
             raise ValueError(f"output path exists: {self.path}")
         os.makedirs(os.path.join(self.path, "images"))
-        self.revfile = open(os.path.join(self.path, "revisions-1.txt"), "w", encoding="utf8")  # noqa: SIM115
+
+        if compression is None:
+            compression = conf.get("fetch", "revisions_compression", "zlib")
+        if compression == "zstd" and revstore.zstandard is None:
+            logger.warning("zstandard is not installed, compressing revisions with zlib")
+            compression = "zlib"
+        self.revwriter = revstore.get_writer(os.path.join(self.path, "revisions-1"), compression)
+        self.revisions_path = self.revwriter.path
         self.seen = {}
         self.imgcount = 0
         self.nfo = None
 
-        for storage in ["authors", "html", "imageinfo"]:
+        if commit_count is None:
+            commit_count = conf.get("fetch", "db_commit_count", 200, int)
+        if commit_interval is None:
+            commit_interval = conf.get("fetch", "db_commit_interval", 5.0, float)
+        self.commit_count = max(1, commit_count)
+        self.commit_interval = commit_interval
+        self.uncommitted = 0
+        self.last_commit = time.time()
+
+        for storage in self.databases:
             db_path = os.path.join(self.path, storage + ".db")
             if os.path.exists(db_path):
                 os.remove(db_path)
-            database = SqliteDict(db_path, autocommit=True)
+            database = SqliteDict(db_path, journal_mode="WAL", outer_stack=False)
             setattr(self, storage, database)
 
-    def open_rev_file_for_reading(self):
-        self.revfile = open(os.path.join(self.path, "revisions-1.txt"), encoding="utf8")  # noqa: SIM115
+    def read_revisions(self):
+        """return Page records for the revisions written so far"""
+        if self.revwriter is not None:
+            self.revwriter.flush()
+        with open(self.revisions_path, "rb") as revfile:
+            return revstore.RevisionStore().add(revfile.read())
 
     def set_db_key(self, name, key, value):
         storage = getattr(self, name, None)
         if storage is None:
             raise ValueError(f"storage does not exist {name}")
         storage[key] = json.dumps(value)
+        self.uncommitted += 1
+        if (
+            self.uncommitted >= self.commit_count
+            or time.time() - self.last_commit >= self.commit_interval
+        ):
+            self.commit()
+
+    def commit(self, blocking=False):
+        """commit the writes to the databases. the commit runs in the
+        background unless blocking is set
+        """
+        for name in self.databases:
+            storage = getattr(self, name, None)
+            if storage is not None:
+                storage.commit(blocking=blocking)
+        self.uncommitted = 0
+        self.last_commit = time.time()
+
+    def _close_db(self, name):
+        storage = getattr(self, name, None)
+        if storage is not None:
+            storage.commit()
+            storage.close()
+            setattr(self, name, None)
 
     def get_db_key(self, name, key):
         storage = getattr(self, name, None)
@@ -142,8 +201,13 @@ class FsOutput:
     def close(self):
         if self.nfo is not None:
             self.dump_json(nfo=self.nfo)
-        self.revfile.close()
-        self.revfile = None
+        for name in self.databases:
+            self._close_db(name)
+        self.revwriter.close()
+        self.revwriter = None
+
+    def write_revision(self, rev, txt):
+        self.revwriter.write(rev, txt)
 
     def get_imagepath(self, title):
         path = os.path.join(self.path, "images", f"{unorganized.fs_escape(title)}")
@@ -179,9 +243,7 @@ class FsOutput:
         if revid is not None:
             rev["revid"] = revid
 
-        header = "\n --page-- %s\n" % json.dumps(rev, sort_keys=True)
-        self.revfile.write(header)
-        self.revfile.write(txt)
+        self.write_revision(rev, txt)
         self.seen[title] = rev
 
     def write_pages(self, data):
@@ -207,17 +269,13 @@ class FsOutput:
                         rev["revid"] = revid
                     self.seen[title] = rev
 
-                    header = "\n --page-- %s\n" % json.dumps(rev, sort_keys=True)
-                    self.revfile.write(header)
-                    self.revfile.write(txt)
+                    self.write_revision(rev, txt)
 
     def write_authors(self):
-        if hasattr(self, "authors"):
-            self.authors.close()
+        self._close_db("authors")
 
     def write_html(self):
-        if hasattr(self, "html"):
-            self.html.close()
+        self._close_db("html")
 
     def write_redirects(self, redirects):
         self.dump_json(redirects=redirects)
@@ -306,15 +364,20 @@ def _acquire_download_rate_limit(url):
 
 def download_to_file(url, path, temp_path, max_retries=0, initial_delay=1, backoff_factor=2):
     """Download a file from a URL to a local path with exponential backoff for HTTP 429 errors."""
+    cache = fetchcache.get_fetch_cache()
+    if cache is not None and cache.fetch_file(url, path):
+        logger.debug(f"Using cached download: {url}")
+        return
     logger.debug(f"Starting download: {url}")
     client = _get_download_client(url)
     retry_policy = _build_download_retry_policy(max_retries, initial_delay, backoff_factor)
     _acquire_download_rate_limit(url)
     _download_with_retries(client, url, path, temp_path, retry_policy)
+    if cache is not None:
+        cache.store_file(url, path)
 
 
 class Fetcher:
-    titles_pending_contributor_lookup = defaultdict(list)
     title_mapping = {}
 
     def __init__(
@@ -370,6 +433,7 @@ class Fetcher:
         self.revids_todo = []
         self.imageinfo_todo = []
         self.imagedescription_todo = {}  # base path -> list
+        self.titles_pending_contributor_lookup = defaultdict(list)  # api -> titles
         self._nshandler = None
 
         siteinfo = self.get_siteinfo_for(self.api)
@@ -392,11 +456,10 @@ class Fetcher:
         for title in titles:
             self._refcall(self.expand_templates_from_title, title)
 
-        for rev_id in revids:
-            self._refcall(self.expand_templates_from_revid, int(rev_id))
+        for block in split_blocks([int(x) for x in revids], self.api.api_request_limit):
+            self._refcall(self.expand_templates_from_revids, block)
 
-        # store revisions in memory for later use
-        # KLUDGE: in memory storage might fail for very large collections
+        # Page records of the written revisions, read when first needed
         self.revisions = []
 
     def lower_infobox_parameters(self, text):
@@ -428,21 +491,69 @@ class Fetcher:
 
         return text
 
-    def expand_templates_from_revid(self, revid):
+    def expand_templates_from_revids(self, revids):
+        """fetch the content of revids with one request and schedule the
+        expansion of each revision
+        """
         res = self.api.do_request(
-            action="query", prop="revisions", rvprop="content", revids=str(revid)
+            action="query",
+            cache_kind="revision",
+            prop="revisions",
+            rvprop="ids|content",
+            revids="|".join(str(x) for x in revids),
         )
-        page = list(res["pages"].values())[0]
+        for page, revid, text in self._get_revision_texts(res):
+            self._refcall(self.expand_revision, page, revid, text)
+        self._refetch_missing_revids(revids, res)
 
-        title = page["title"]
-        text = page["revisions"][0]["*"]
-        text = self.lower_infobox_parameters(text)
-        text = self.update_infobox_parameters(text)
+    def expand_revision(self, page, revid, text):
         res = self.api.do_request(
-            use_post=True, action="expandtemplates", title=title, text=text, prop="wikitext"
+            use_post=True,
+            cache_kind="expandtemplates",
+            action="expandtemplates",
+            title=page["title"],
+            text=text,
+            prop="wikitext",
         ).get("expandtemplates", {})
+        self._store_expanded_revision(page, revid, res.get("wikitext"))
 
-        txt = res.get("wikitext")
+    def _get_revision_texts(self, res):
+        """return (page, revid, text) for every revision in the result of a
+        revisions query. revids the wiki does not know and revisions without
+        content, e.g. with a hidden text, are left out.
+        """
+        texts = []
+        for page in res.get("pages", {}).values():
+            for rev in page.get("revisions", []):
+                if "*" not in rev:
+                    logger.warning(f"revision {rev.get('revid')} of {page['title']} has no text")
+                    continue
+                text = self.lower_infobox_parameters(rev["*"])
+                text = self.update_infobox_parameters(text)
+                texts.append((page, rev["revid"], text))
+        return texts
+
+    def _refetch_missing_revids(self, revids, res):
+        """request the revids the answer to a batched revisions query left
+        out once more, one request per revid
+        """
+        returned = {
+            rev.get("revid")
+            for page in res.get("pages", {}).values()
+            for rev in page.get("revisions", [])
+        }
+        returned.update(int(x) for x in res.get("badrevids", {}))
+        missing = [x for x in revids if int(x) not in returned]
+        if not missing:
+            return
+        if len(revids) == 1:
+            logger.warning(f"revision {revids[0]} is missing from the answer of the wiki")
+            return
+        for revid in missing:
+            self._refcall(self.expand_templates_from_revids, [revid])
+
+    def _store_expanded_revision(self, page, revid, txt):
+        title = page["title"]
         if txt:
             redirect = self.nshandler.redirect_matcher(txt)
             if redirect:
@@ -454,34 +565,47 @@ class Fetcher:
             self.get_edits(title)
 
     def expand_templates_from_title(self, title):
-        nsnum, _, _ = self.nshandler.splitname(title)
-
-        text = "{{:%s}}" % title if nsnum == 0 else "{{%s}}" % title
-
+        nsnum, text = self._get_transclusion(title)
         # produces deprecated output format, might have to add prop param and handle output
         # check https://commons.wikimedia.org/w/api.php?action=help&modules=expandtemplates
         res = self.api.do_request(
-            action="expandtemplates", title=title, text=text, prop="wikitext"
+            action="expandtemplates",
+            cache_kind="expandtemplates",
+            title=title,
+            text=text,
+            prop="wikitext",
         )
-        txt = res.get("wikitext")
+        self._store_expanded_title(title, nsnum, res.get("wikitext"))
+
+    def _get_transclusion(self, title):
+        nsnum, _, _ = self.nshandler.splitname(title)
+        text = "{{:%s}}" % title if nsnum == 0 else "{{%s}}" % title
+        return nsnum, text
+
+    def _store_expanded_title(self, title, nsnum, txt):
         if txt:
             self.fsout.write_expanded_page(title, nsnum, txt)
             self.get_edits(title)
 
     def run(self):
         self.report()
+        self._join()
+        self._save_timeline_info()
+        self._save_map_frame_image_info()
+        self.finish()
+        if self.imageinfo_todo or self.revids_todo or self.pages_todo:
+            raise ValueError("not all items processed")
+
+    def _join(self):
+        """run the scheduled calls and the calls they schedule"""
         dispatch_gr = gevent.spawn(call_when, self.dispatch_event, self.dispatch)
         try:
             self.pool.join()
+            while self.lookup_contributors_for_remaining_titles():
+                self.pool.join()
         finally:
             dispatch_gr.kill()
 
-        self.finish()
-        self._save_timeline_info()
-        self._save_map_frame_image_info()
-        if self.imageinfo_todo or self.revids_todo or self.pages_todo:
-            raise ValueError("not all items processed")
-
     def _save_timeline_info(self):
         html_content_pages = self.fsout.get_db_keys("html")
 
@@ -526,18 +650,10 @@ class Fetcher:
     def find_source_by_title_or_revid(self, title_or_revid):
         title = int(title_or_revid) if title_or_revid.isdigit() else title_or_revid
         if not self.revisions:
-            self.fsout.open_rev_file_for_reading()
-            rev_file_content = self.fsout.revfile.read()
-            pages = rev_file_content.split("\n --page-- ")
-            for page in pages[1:]:
-                header, txt = page.split("\n", 1)
-                rev = json.loads(header)
-                rev["text"] = txt
-                self.revisions.append(rev)
-            self.fsout.revfile.close()
-        result = [r for r in self.revisions if r.get("title") == title or r.get("revid") == title]
+            self.revisions = self.fsout.read_revisions()
+        result = [p for p in self.revisions if title in (p.title, p.revid)]
         if result:
-            return result[0]["text"]
+            return result[0].rawtext
 
     def calculate_hash_from_timeline_content(self, timeline_content):
         return sha1(timeline_content.encode("utf-8")).hexdigest()
@@ -633,33 +749,35 @@ class Fetcher:
         return root.xpath(".//a[contains(@class, 'mw-kartographer-map')]/img")
 
     def fetch_html(self, name, lst):
-        def fetch(content):
-            with self.api_semaphore:
-                kwargs = {name: content}
-                res = self.api.do_request(action="parse", redirects="1", **kwargs)
-                res[name] = content
-
-            self.fsout.set_db_key("html", content, res)
-            image_nodes = self._get_image_nodes(res)
-            timeline_nodes = self._get_timeline_image_nodes(res)
-            map_nodes = self._get_map_image_nodes(res)
-            img_urls = self.extension_img_urls(image_nodes)
-            timeline_image_urls = self.timeline_image_urls(timeline_nodes)
-            map_image_urls = self.map_image_urls(map_nodes)
-            all_urls = list(set(list(img_urls) + list(timeline_image_urls)))
-            for url in all_urls:
-                filename = url.rsplit("/", 1)[1]
-                title = self.nshandler.splitname(filename, defaultns=6)[2]
-                self.schedule_download_image(str(url), title)
-            for url in map_image_urls:
-                filename = url.rsplit("/", 1)[1]
-                filename = filename.split("?")[0]
-                title = self.nshandler.splitname(filename, defaultns=6)[2]
-                self.schedule_download_image(str(url), title)
-
         self.count_total += len(lst)
         for item in lst:
-            self._refcall_noinc(fetch, item)
+            self._refcall_noinc(self._fetch_html, name, item)
+
+    def _fetch_html(self, name, content):
+        with self.api_semaphore:
+            kwargs = {name: content}
+            res = self.api.do_request(action="parse", cache_kind="parse", redirects="1", **kwargs)
+        self._store_html(name, content, res)
+
+    def _store_html(self, name, content, res):
+        res[name] = content
+        self.fsout.set_db_key("html", content, res)
+        image_nodes = self._get_image_nodes(res)
+        timeline_nodes = self._get_timeline_image_nodes(res)
+        map_nodes = self._get_map_image_nodes(res)
+        img_urls = self.extension_img_urls(image_nodes)
+        timeline_image_urls = self.timeline_image_urls(timeline_nodes)
+        map_image_urls = self.map_image_urls(map_nodes)
+        all_urls = list(set(list(img_urls) + list(timeline_image_urls)))
+        for url in all_urls:
+            filename = url.rsplit("/", 1)[1]
+            title = self.nshandler.splitname(filename, defaultns=6)[2]
+            self.schedule_download_image(str(url), title)
+        for url in map_image_urls:
+            filename = url.rsplit("/", 1)[1]
+            filename = filename.split("?")[0]
+            title = self.nshandler.splitname(filename, defaultns=6)[2]
+            self.schedule_download_image(str(url), title)
 
     def fetch_used(self, name, lst, expanded=False):
         limit = self.api.api_request_limit
@@ -669,7 +787,9 @@ class Fetcher:
         for block in blocks:
             pool.add(self._refcall_noinc(self.fetch_used_block, name, block, expanded))
         pool.join()
+        self._schedule_edits()
 
+    def _schedule_edits(self):
         if conf.noedits:
             return
 
@@ -682,7 +802,9 @@ class Fetcher:
     def fetch_used_block(self, name, lst, expanded):
         kwargs = {name: lst, "fetch_images": self.fetch_images, "expanded": expanded}
         used = self.api.fetch_used(**kwargs)
+        self._handle_used(used)
 
+    def _handle_used(self, used):
         self._update_redirects(used.get("redirects", []))
         pages = list(used.get("pages", {}).values())
         revids, images, templates = network_workflow.collect_page_data(pages, self.title2latest)
@@ -717,9 +839,9 @@ class Fetcher:
     def get_edits(self, title):
         """Get contributors for a given page title.
 
-        This method is now a wrapper around _add_to_titles_pending_contributor_lookup,
+        This method is a wrapper around _add_to_titles_pending_contributor_lookup,
         which collects titles for batched processing. The actual API request is made
-        when the batch is full or when explicitly flushed.
+        when the batch is full or when no other calls are left.
 
         Args:
             title (str): Title of the page to get edit history for
@@ -731,7 +853,8 @@ class Fetcher:
     def _add_to_titles_pending_contributor_lookup(self, title, api: MwApi):
         """Add a title to the authors batch for processing.
 
-        If the batch reaches the API request limit, it will be processed automatically.
+        If the batch reaches the API request limit, its lookup is scheduled
+        right away.
 
         Args:
             title (str): Title of the page to add to the batch
@@ -741,34 +864,35 @@ class Fetcher:
         if not api:
             api = self.api
 
-        # KLUDGE: doing batched requests for contributors didn't work because of a
-        # race condition or shared status in gevent.
-        # Reverting to looking up individual titles - at least for the time being
-        self._lookup_contributors(api, title)
+        pending = self.titles_pending_contributor_lookup[api]
+        pending.append(title)
+        if len(pending) >= api.api_request_limit:
+            self._schedule_contributors_lookup(api)
 
-    def _lookup_contributors(self, api: MwApi, title: str | None = None) -> None:
-        """Look up authors for one title, or for the entire pending batch.
+    def _schedule_contributors_lookup(self, api: MwApi) -> bool:
+        """Schedule the lookup of the pending batch of ``api``.
 
-        When ``title`` is given, only that title is looked up — the pending
-        batch is left untouched. When ``title`` is None, the pending batch
-        for ``api`` is consumed and cleared.
+        The batch is taken out of ``titles_pending_contributor_lookup``
+        before the request is sent, so titles added while it runs start a
+        new batch instead of being dropped with the old one. Batches used
+        to be shared by all Fetcher instances, which is why contributors
+        were looked up one title at a time.
 
-        The previous version took ``title`` but iterated
-        ``titles_pending_contributor_lookup[api]`` regardless, which —
-        combined with `_add_to_titles_pending_contributor_lookup` no longer
-        appending to the batch in the single-title path — silently dropped
-        author attribution for every page.
+        Returns:
+            bool: True if a lookup was scheduled.
         """
-        if title is not None:
-            titles = [title]
-        else:
-            titles = list(self.titles_pending_contributor_lookup[api])
-
+        titles = self.titles_pending_contributor_lookup.pop(api, None)
         if not titles:
-            return
+            return False
+        self._refcall(self._lookup_contributors, api, titles)
+        return True
 
+    def _lookup_contributors(self, api: MwApi, titles: list[str]) -> None:
+        """Look up the authors of titles with one contributors query."""
         title_to_authors = api.get_contributors(titles)
+        self._store_contributors(titles, title_to_authors)
 
+    def _store_contributors(self, titles, title_to_authors):
         for contributor_title in titles:
             inspect_authors = title_to_authors.get(contributor_title)
             if inspect_authors is None:
@@ -778,9 +902,6 @@ class Fetcher:
             db_title = self.title_mapping.get(contributor_title, contributor_title)
             self.fsout.set_db_key("authors", db_title, authors)
 
-        if title is None:
-            self.titles_pending_contributor_lookup[api] = []
-
     def report(self):
         query_count = self.api.qccount
 
@@ -826,7 +947,7 @@ class Fetcher:
                 continue
 
             for rev in revisions:
-                txt = rev["*"]
+                txt = rev.get("*")
                 if not txt:
                     continue
 
@@ -836,7 +957,10 @@ class Fetcher:
                     targets.append(redirect)
 
         if targets:
-            self.fetch_used("titles", targets)
+            self._fetch_redirect_targets(targets)
+
+    def _fetch_redirect_targets(self, targets):
+        self._refcall(self.fetch_used, "titles", targets)
 
     def _extract_attribute(self, lst, attr):
         res = []
@@ -887,6 +1011,9 @@ class Fetcher:
 
         """
         data = self.api.fetch_imageinfo(titles=titles, iiurlwidth=self.imagesize)
+        self._handle_imageinfo(data)
+
+    def _handle_imageinfo(self, data):
         infos = list(data.get("pages", {}).values())
         new_base_paths = set()
 
@@ -940,7 +1067,9 @@ class Fetcher:
 
     def fetch_image_page(self, titles, api):
         data = api.fetch_pages(titles)
+        self._store_image_pages(data)
 
+    def _store_image_pages(self, data):
         local_nsname = self.nshandler.get_nsname_by_number(6)
 
         pages = list(data.get("pages", {}).values())
@@ -960,6 +1089,14 @@ class Fetcher:
 
     def handle_new_basepath(self, path):
         api = self._get_mwapi_for_path(path)
+        titles = self._get_image_description_titles(path)
+        if not titles:
+            return
+
+        siteinfo = self.get_siteinfo_for(api)
+        self._schedule_image_pages(api, siteinfo, titles)
+
+    def _get_image_description_titles(self, path):
         todo = self.imagedescription_todo[path]
         del self.imagedescription_todo[path]
 
@@ -968,11 +1105,9 @@ class Fetcher:
         # not clash with local names
         titles = [t for t in titles if "-d-" + t not in self.scheduled]
         self.scheduled.update(["-d-" + x for x in titles])
-        if not titles:
-            return
-
-        siteinfo = self.get_siteinfo_for(api)
+        return titles
 
+    def _schedule_image_pages(self, api, siteinfo, titles):
         ns_handler = nshandling.NsHandler(siteinfo)
         nsname = ns_handler.get_nsname_by_number(6)
 
@@ -990,8 +1125,7 @@ class Fetcher:
     def get_image_edits(self, title: str, api: MwApi):
         """Get edit history for an image page.
 
-        Adds ``title`` to the contributor-lookup batch (currently a
-        single-title path that runs the API request immediately).
+        Adds ``title`` to the contributor-lookup batch of ``api``.
 
         Order matters: ``title_mapping`` must be populated **before**
         ``_add_to_titles_pending_contributor_lookup`` so that
@@ -1010,7 +1144,7 @@ class Fetcher:
         local_title = f"{local_nsname}:{partial}"
 
         # Map the original title to the local title FIRST, before the
-        # (immediate) contributor lookup runs.
+        # contributor lookup of its batch runs.
         self.title_mapping[title] = local_title
 
         self._add_to_titles_pending_contributor_lookup(title, api)
@@ -1035,6 +1169,9 @@ class Fetcher:
 
     def _fetch_pages(self, *args, **kwargs):
         data = self.api.fetch_pages(**kwargs)
+        self._handle_pages(data)
+
+    def _handle_pages(self, data):
         self._find_redirect(data)
         redirects = data.get("redirects", [])
         self._update_redirects(redirects)
@@ -1074,21 +1211,24 @@ class Fetcher:
             print(f"WARNING: {title, revid} could not be fetched")
 
     def lookup_contributors_for_remaining_titles(self):
-        """Flush any pending authors batch.
+        """Schedule the lookup of the partially filled authors batches.
 
-        This method should be called at the end of processing to ensure that
-        all authors are processed and stored.
+        Called when no other calls are left, so that all authors are
+        processed and stored. Returns True if lookups were scheduled.
         """
-        for api in self.titles_pending_contributor_lookup:
-            if self.titles_pending_contributor_lookup[api]:
-                self._lookup_contributors(api)
+        scheduled = False
+        for api in list(self.titles_pending_contributor_lookup):
+            scheduled = self._schedule_contributors_lookup(api) or scheduled
+        return scheduled
 
     def finish(self):
         self._sanity_check()
-        # Process any pending authors batch
-        self.lookup_contributors_for_remaining_titles()
-        for api in self.titles_pending_contributor_lookup:
-            logger.info(f"did {api.request_counter} requests to {api.baseurl}")
+        for api in self.api_cache.values():
+            counts = ", ".join(f"{kind}: {n}" for kind, n in sorted(api.request_counts.items()))
+            logger.info(f"did {api.request_counter} requests to {api.baseurl} ({counts})")
+        cache = fetchcache.get_fetch_cache()
+        if cache is not None:
+            logger.info(f"fetch cache: {cache.stats()}")
         self.fsout.write_redirects(self.redirects)
         self.fsout.write_licenses(self.licenses)
         self.fsout.close()
@@ -0,0 +1,174 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.rst for additional licensing information.
+
+"""cache of MediaWiki API responses and downloads shared by all fetch jobs
+on a host
+
+Popular articles are part of many collections, and every fetch job used
+to request their parsed html, expanded wikitext, image info, contributors
+and image files again. A FetchCache stores the decoded API responses and
+the downloaded files in a DiskCache keyed by the api url, the kind of the
+request and its arguments. Downloaded files are hard linked into the
+cache if possible instead of being copied.
+
+Responses of authenticated apis are keyed by their identity as well, so
+that a job logged in to a private wiki does not share them with anonymous
+jobs. Error responses are not stored.
+
+Responses to requests addressing a revision (revids or oldid) are kept
+until they are evicted unless cache_revid_ttl is set, which bounds how
+long the parsed html of a revision may lag behind changed templates.
+Responses to requests addressing a title, and downloaded files, expire
+after cache_title_ttl seconds. The cache is disabled by default. Enable
+it in the [fetch] section of the configuration, e.g.::
+
+    [fetch]
+    cache_dir = /var/cache/mwlib/fetch
+"""
+
+import logging
+import time
+from collections import Counter
+from hashlib import sha256 as digest
+
+from mwlib.utils import conf
+from mwlib.utils.diskcache import DiskCache
+
+log = logging.getLogger(__name__)
+
+# bump this whenever the format of the cached entries changes
+CACHE_VERSION = 2
+
+REVID_ARGS = ("revids", "oldid")
+
+# page properties which change independently of the page's revisions
+PAGE_KINDS = ("categories",)
+
+
+def is_revid_request(kind, args):
+    """return True if the request arguments args address revisions"""
+    if kind in PAGE_KINDS:
+        return False
+    return any(args.get(name) for name in REVID_ARGS)
+
+
+class FetchCache(DiskCache):
+    suffix = ".fetch"
+
+    def __init__(self, path, maxsize=1024 * 1024 * 1024, title_ttl=3600, revid_ttl=0):
+        """title_ttl and revid_ttl are the number of seconds entries for
+        title and revision addressed requests are valid. 0 means entries
+        never expire.
+        """
+        DiskCache.__init__(self, path, maxsize=maxsize)
+        self.title_ttl = title_ttl
+        self.revid_ttl = revid_ttl
+        self.kind_hits = Counter()
+        self.kind_misses = Counter()
+
+    def get_key(self, baseurl, kind, args, identity=""):
+        """identity names the credentials the request is sent with"""
+        hasher = digest()
+        hasher.update(f"{CACHE_VERSION}:{baseurl}:{identity}:{kind}:".encode())
+        hasher.update(repr(sorted((str(k), v) for k, v in args.items())).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def lookup(self, key, kind, by_revid=False):
+        """return the value stored for key or None if there is no entry or
+        it has expired
+        """
+        entry = self.get(key)
+        if entry is not None:
+            stored, value = entry
+            ttl = self.revid_ttl if by_revid else self.title_ttl
+            if not ttl or time.time() - stored < ttl:
+                self.kind_hits[kind] += 1
+                return value
+        self.kind_misses[kind] += 1
+        return None
+
+    def store(self, key, value):
+        self.set(key, (time.time(), value))
+
+    def get_response(self, baseurl, kind, args, fetch, identity=""):
+        """return the cached response to the api request args or call fetch
+        and store its result unless it is an error
+        """
+        key = self.get_key(baseurl, kind, args, identity)
+        data = self.lookup(key, kind, is_revid_request(kind, args))
+        if data is None:
+            data = fetch()
+            self.store_response(key, data)
+        return data
+
+    async def get_response_async(self, baseurl, kind, args, fetch, identity=""):
+        """like get_response for a coroutine function fetch"""
+        key = self.get_key(baseurl, kind, args, identity)
+        data = self.lookup(key, kind, is_revid_request(kind, args))
+        if data is None:
+            data = await fetch()
+            self.store_response(key, data)
+        return data
+
+    def store_response(self, key, data):
+        # errors, e.g. ratelimited, must be retried by the next job
+        if isinstance(data, dict) and "error" in data:
+            return
+        self.store(key, data)
+
+    def fetch_file(self, url, path):
+        """write the cached content of url to path. return False if it is
+        not cached
+        """
+        key = self.get_key("", "download", {"url": url})
+        if self.lookup(key, "download") is None:
+            return False
+        if not self.get_file(key, path):
+            # the file has been evicted before its entry
+            self.kind_hits["download"] -= 1
+            self.kind_misses["download"] += 1
+            return False
+        return True
+
+    def store_file(self, url, path):
+        """store the downloaded file path, which must not be changed in
+        place afterwards
+        """
+        key = self.get_key("", "download", {"url": url})
+        self.set_file(key, path)
+        # the entry holds the time the file was stored for the ttl
+        self.store(key, True)
+
+    def stats(self):
+        res = DiskCache.stats(self)
+        res["kinds"] = {
+            kind: {"hits": self.kind_hits[kind], "misses": self.kind_misses[kind]}
+            for kind in sorted(set(self.kind_hits) | set(self.kind_misses))
+        }
+        return res
+
+
+_fetch_cache = None
+_configured = False
+
+
+def get_fetch_cache():
+    """return the host wide FetchCache or None if it is not configured"""
+    global _fetch_cache, _configured
+    if not _configured:
+        _configured = True
+        path = conf.get("fetch", "cache_dir", None)
+        if path:
+            _fetch_cache = FetchCache(
+                path,
+                maxsize=conf.get("fetch", "cache_size", 1024 * 1024 * 1024, int),
+                title_ttl=conf.get("fetch", "cache_title_ttl", 3600, int),
+                revid_ttl=conf.get("fetch", "cache_revid_ttl", 0, int),
+            )
+    return _fetch_cache
+
+
+def set_fetch_cache(cache):
+    global _fetch_cache, _configured
+    _fetch_cache = cache
+    _configured = True
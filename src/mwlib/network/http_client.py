@@ -58,6 +58,19 @@ class HttpClientManager:
             except Exception:
                 logger.exception("Failed to close http client during invalidation")
 
+    def get_default_headers(self) -> dict:
+        """Get the headers sent with every request.
+
+        Returns:
+            dict: The configured headers and the User-Agent.
+        """
+        headers: dict = {}
+        if hasattr(conf, "headers"):
+            headers.update(getattr(conf, "headers").as_dict())
+
+        headers["User-Agent"] = getattr(conf, "user_agent", "mwlib")
+        return headers
+
     def get_client(
         self, base_url: str, use_oauth2: Optional[bool] = None, use_http2: Optional[bool] = None
     ) -> Union[StandardClient, OAuth2Client]:
@@ -87,12 +100,7 @@ class HttpClientManager:
             use_http2 = self.detect_http2_support(base_url)
 
         origin = self._origin(base_url)
-
-        headers: dict = {}
-        if hasattr(conf, "headers"):
-            headers.update(getattr(conf, "headers").as_dict())
-
-        headers["User-Agent"] = getattr(conf, "user_agent", "mwlib")
+        headers = self.get_default_headers()
 
         # Create a cache key that includes the base URL, authentication and HTTP/2 settings
         cache_key = f"{origin}|oauth2={use_oauth2}|http2={use_http2}"
@@ -7,7 +7,7 @@
 import logging
 import random
 import time
-from collections import deque
+from collections import Counter, deque
 from urllib import parse
 
 try:
@@ -23,6 +23,7 @@ from gevent.lock import Semaphore
 from mwlib.core import authors
 from mwlib.network import api as network_api
 from mwlib.network import auth as network_auth
+from mwlib.network import fetchcache
 from mwlib.network.http_client import HttpClientManager
 from mwlib.utils import conf
 
@@ -120,14 +121,23 @@ class MwApi:
         if username and not self.use_oauth2:
             self.http_client.auth = httpx.BasicAuth(username, password or "")
 
+        # the credentials cached responses are shared by, see _get_cached
+        self.cache_identity = ""
+        if self.use_oauth2:
+            self.cache_identity = "oauth2:" + conf.get("oauth2", "client_id", "")
+        elif username:
+            self.cache_identity = "user:" + username
+
         self.edittoken = None
         self.qccount = 0
+        self.request_counts = Counter()  # action or "query:prop" -> requests sent
         self.api_result_limit = conf.get("fetch", "api_result_limit", 500, int)
         self.api_request_limit = conf.get("fetch", "api_request_limit", 15, int)
         self.max_connections = conf.get("fetch", "max_connections", 20, int)
         self.max_retry_count = conf.get("fetch", "max_retry_count", 2, int)
         self.rvlimit = conf.get("fetch", "rvlimit", 500, int)
         self.limit_fetch_semaphore = None
+        self.fetch_cache = fetchcache.get_fetch_cache()
 
     def report(self):
         """Guarantee compatibility with sapi using this placeholder method."""
@@ -329,7 +339,25 @@ class MwApi:
         data = self._fetch(url, method="GET", max_retries=self.max_retry_count)
         return data
 
-    def _post(self, **kwargs):
+    def _get_cached(self, cache_kind, kwargs, fetch):
+        if cache_kind is None or self.fetch_cache is None:
+            return fetch()
+        return self.fetch_cache.get_response(
+            self.apiurl, cache_kind, kwargs, fetch, identity=self.cache_identity
+        )
+
+    def _post(self, cache_kind=None, **kwargs):
+        return self._get_cached(cache_kind, kwargs, lambda: self._do_post(**kwargs))
+
+    def _do_post(self, **kwargs):
+        postdata, headers = self._encode_post(kwargs)
+        logger.debug("posting to %r", self.apiurl)
+        self._count_request(kwargs)
+        data = self._fetch(self.apiurl, method="POST", data=postdata, headers=headers)
+        res = loads(data)
+        return res
+
+    def _encode_post(self, kwargs):
         args = {"format": "json"}
         args.update(**kwargs)
         for k, val in args.items():
@@ -337,12 +365,7 @@ class MwApi:
                 args[k] = val.encode("utf-8")
 
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        postdata = parse.urlencode(args).encode()
-
-        logger.debug("posting to %r", self.apiurl)
-        data = self._fetch(self.apiurl, method="POST", data=postdata, headers=headers)
-        res = loads(data)
-        return res
+        return parse.urlencode(args).encode(), headers
 
     def _ensure_oauth2_token(self):
         network_auth.ensure_oauth2_token(
@@ -355,6 +378,9 @@ class MwApi:
         )
 
     def do_request(self, use_post=False, **kwargs):
+        """send an api request. requests with a cache_kind keyword argument
+        are answered from the host wide FetchCache if it is configured
+        """
         sem = self.limit_fetch_semaphore
         if sem is not None:
             sem.acquire()
@@ -372,12 +398,28 @@ class MwApi:
         error_info = (error.get("info", ""),)
         raise RuntimeError(f"{error_info}: [fetching {self._build_url(**kwargs)}]")
 
-    def _handle_request(self, **kwargs):
+    def _handle_request(self, cache_kind=None, **kwargs):
+        return self._get_cached(cache_kind, kwargs, lambda: self._send_request(**kwargs))
+
+    def _count_request(self, kwargs):
+        """count a request sent to the server. requests answered from the
+        fetch cache are not counted
+        """
         self.request_counter += 1
+        kind = kwargs.get("action", "")
+        if kind == "query":
+            kind = f"query:{kwargs.get('prop') or kwargs.get('meta') or kwargs.get('list')}"
+        self.request_counts[kind] += 1
+
+    def _send_request(self, **kwargs):
+        self._count_request(kwargs)
         logger.debug(
             f"Request #{self.request_counter}: ACTION:{kwargs.get('action')} PROP:{kwargs.get('prop')}"
         )
         response_data = self._request(**kwargs)
+        return self._decode_response(response_data, kwargs)
+
+    def _decode_response(self, response_data, kwargs):
         # Convert bytes to string if necessary
         if isinstance(response_data, bytes):
             response_data = response_data.decode("utf-8")
@@ -404,31 +446,38 @@ class MwApi:
 
         return new_kw, False
 
-    def _do_request(self, query_continue=True, merge_data=None, **kwargs):
-        last_qc = None
+    def _do_request(self, query_continue=True, merge_data=None, cache_kind=None, **kwargs):
         action = kwargs["action"]
         retval = {}
-        todo = kwargs
-
-        while todo is not None:
-            kwargs = todo
-            todo = None
-
-            data = self._handle_request(**kwargs)
+        last_qc = None
+        while kwargs is not None:
+            data = self._handle_request(cache_kind=cache_kind, **kwargs)
+            kwargs, last_qc = self._merge_response(
+                retval, action, data, merge_data, query_continue, last_qc, kwargs
+            )
+        return retval
 
-            if merge_data:
-                merge_data(retval, data[action])
-            else:
-                self._merge_data(retval, action, data)
+    def _merge_response(self, retval, action, data, merge_data, query_continue, last_qc, kwargs):
+        """merge the response data into retval. return the arguments of the
+        request continuing the query or None and the last query-continue
+        values. both the legacy query-continue and the continue values of
+        current MediaWiki versions are followed.
+        """
+        if merge_data:
+            merge_data(retval, data[action])
+        else:
+            self._merge_data(retval, action, data)
 
+        if "continue" in data:
+            qc_values = [data["continue"]]
+        else:
             qc_values = list(data.get("query-continue", {}).values())
-            if qc_values and query_continue:
-                todo, stop_query = self._handle_query_continue(qc_values, last_qc, kwargs)
-                if stop_query:
-                    return retval
-                last_qc = qc_values
-
-        return retval
+        if not qc_values or not query_continue:
+            return None, last_qc
+        todo, stop_query = self._handle_query_continue(qc_values, last_qc, kwargs)
+        if stop_query:
+            return None, last_qc
+        return todo, qc_values
 
     def ping(self):
         return self.do_request(action="query", meta="siteinfo", siprop="general")
@@ -476,6 +525,7 @@ class MwApi:
         if login_result == "NeedToken" and lgtoken is None:
             return self.login(username, password, domain=domain, lgtoken=res["login"]["token"])
         if login_result == "Success":
+            self.cache_identity = "user:" + username
             return None
 
         raise RuntimeError("login failed: %r" % res)
@@ -531,27 +581,33 @@ class MwApi:
         return not sem.locked()
 
     def fetch_pages(self, titles=None, revids=None):
-        kwargs = {
+        rev_kwargs, cat_kwargs = self._get_pages_requests(titles, revids)
+        rev_result = self.do_request(action="query", cache_kind="pages", **rev_kwargs)
+        cat_result = self.do_request(action="query", cache_kind="categories", **cat_kwargs)
+        merge_data(rev_result, cat_result)
+        return rev_result
+
+    def _get_pages_requests(self, titles, revids):
+        """return the arguments of the revisions and categories queries
+        made by fetch_pages
+        """
+        rev_kwargs = {
             "prop": "revisions",
             "rvprop": "ids|content|timestamp|user",
             "imlimit": self.api_result_limit,
             "tllimit": self.api_result_limit,
         }
         if titles:
-            kwargs["redirects"] = 1
-
-        self._update_kwargs(kwargs, titles, revids)
+            rev_kwargs["redirects"] = 1
 
-        rev_result = self.do_request(action="query", **kwargs)
+        self._update_kwargs(rev_kwargs, titles, revids)
 
-        kwargs = {"prop": "categories", "cllimit": self.api_result_limit}
+        cat_kwargs = {"prop": "categories", "cllimit": self.api_result_limit}
         if titles:
-            kwargs["redirects"] = 1
+            cat_kwargs["redirects"] = 1
 
-        self._update_kwargs(kwargs, titles, revids)
-        cat_result = self.do_request(action="query", **kwargs)
-        merge_data(rev_result, cat_result)
-        return rev_result
+        self._update_kwargs(cat_kwargs, titles, revids)
+        return rev_kwargs, cat_kwargs
 
     def fetch_imageinfo(self, titles, iiurlwidth=800):
         kwargs = {
@@ -562,7 +618,7 @@ class MwApi:
         }
 
         self._update_kwargs(kwargs, titles, [])
-        return self.do_request(action="query", **kwargs)
+        return self.do_request(action="query", cache_kind="imageinfo", **kwargs)
 
     def get_edits(self, title, revision, rvlimit=None):
         """Get edit history for a given page title up to a specific revision.
@@ -597,7 +653,7 @@ class MwApi:
                 revs = edit["revisions"]
                 get_authors.scan_edits(revs)
 
-        self.do_request(action="query", merge_data=merge_data, **kwargs)
+        self.do_request(action="query", cache_kind="edits", merge_data=merge_data, **kwargs)
         return get_authors
 
     def get_contributors(self, titles: list[str], rvlimit=None):
@@ -614,6 +670,14 @@ class MwApi:
         Returns:
             dict: Dictionary mapping titles to their respective InspectAuthors objects
 
+        """
+        kwargs, merge_data, contributors_by_title = self._get_contributors_request(titles, rvlimit)
+        self.do_request(action="query", cache_kind="contributors", merge_data=merge_data, **kwargs)
+        return contributors_by_title
+
+    def _get_contributors_request(self, titles, rvlimit=None):
+        """return the arguments and the merge_data callback of the
+        contributors query and the dictionary filled by the callback
         """
         rvlimit = rvlimit or self.rvlimit
         kwargs = {
@@ -632,6 +696,7 @@ class MwApi:
 
         # Dictionary to store title to pageid mapping
         pageid_to_title = {}
+        anon_counted = set()
 
         def merge_data(_, newdata):
             # Process redirects to update title mapping
@@ -659,9 +724,11 @@ class MwApi:
                         get_authors = authors.InspectAuthors()
                         contributors_by_title[title] = get_authors
 
-                    # Process anonymous contributors
-                    anon_count = page.get("anoncontributors", 0)
-                    get_authors.num_anon += anon_count
+                    # Process anonymous contributors. a continued query may
+                    # repeat the count of a page
+                    if "anoncontributors" in page and pageid not in anon_counted:
+                        anon_counted.add(pageid)
+                        get_authors.num_anon += page["anoncontributors"]
 
                     # Process named contributors
                     contributors = page.get("contributors", [])
@@ -670,8 +737,7 @@ class MwApi:
                         if name and not get_authors.bot_rex.search(name):
                             get_authors.authors.add(name)
 
-        self.do_request(action="query", merge_data=merge_data, **kwargs)
-        return contributors_by_title
+        return kwargs, merge_data, contributors_by_title
 
 
 def _append_unique(values, value):
@@ -4,7 +4,9 @@
 import json
 from pathlib import Path
 
-_cache = {}
+from mwlib.utils import lrucache
+
+_cache = lrucache.get_cache("siteinfo", 100)
 
 
 def _get_path(lang):
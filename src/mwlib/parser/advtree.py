@@ -60,12 +60,28 @@ log = logging.getLogger(__name__)
 
 
 def _id_index(lst, element_to_check):
-    """Return index of first appeareance of element el in list lst"""
+    """Return index of first appeareance of element el in list lst
 
-    for i, element in enumerate(lst):
+    Nodes remember their last known position in _sibling_index. The
+    position is only used if it is still valid, otherwise lst is scanned
+    once and the positions of all of its elements are updated. Walking
+    over the siblings of a node is linear this way, even if the tree is
+    modified directly through the children lists.
+    """
+
+    idx = getattr(element_to_check, "_sibling_index", -1)
+    if 0 <= idx < len(lst) and lst[idx] is element_to_check:
+        return idx
+
+    found = -1
+    for i in range(len(lst) - 1, -1, -1):
+        element = lst[i]
+        element._sibling_index = i
         if element is element_to_check:
-            return i
-    raise ValueError("element %r not found" % element_to_check)
+            found = i
+    if found < 0:
+        raise ValueError("element %r not found" % element_to_check)
+    return found
 
 
 def debug(method):  # use as decorator
@@ -90,6 +106,8 @@ class AdvancedNode:
 
     parent = None  # parent element
     is_block_node = False
+    # verify the results of tree modifications (slow)
+    check_modifications = False
 
     def copy(self):
         "return a copy of this node and all its children"
@@ -144,7 +162,7 @@ class AdvancedNode:
         self.children[idx : idx + 1] = newchildren
 
         child.parent = None
-        if self.has_child(child):
+        if self.check_modifications and self.has_child(child):
             raise ValueError("child not removed")
         for new_child in newchildren:
             new_child.parent = self
@@ -173,7 +191,14 @@ class AdvancedNode:
 
     def get_parent_nodes_by_class(self, klass):
         """returns parents w/ klass"""
-        return [p for p in self.parents if p.__class__ == klass]
+        parents = []
+        node = self.parent
+        while node:
+            if node.__class__ == klass:
+                parents.append(node)
+            node = node.parent
+        parents.reverse()
+        return parents
 
     def get_child_nodes_by_class(self, klass):
         """returns all children  w/ klass"""
@@ -182,9 +207,9 @@ class AdvancedNode:
     def get_all_children(self):
         """don't confuse w/ Node.allchildren()
         which returns allchildren + self"""
-        for child in self.children:
-            yield child
-            yield from child.get_all_children()
+        children = self.allchildren()
+        next(children)  # skip self
+        yield from children
 
     def get_siblings(self):
         """Return all siblings WITHOUT self"""
@@ -14,6 +14,8 @@ import re
 import time
 import traceback
 
+from mwlib.utils import lrucache
+
 try:
     import readline  # do not remove. makes raw_input use readline
 
@@ -229,7 +231,7 @@ class Expr:
         return self.operand_stack[-1]
 
 
-_cache = {}
+_cache = lrucache.get_cache("expr", 5000)
 
 
 def expr(char):
@@ -41,8 +41,17 @@ class Node(utoken.Token):
 
     def allchildren(self):  # name is broken, returns self, which is not a child
         yield self
-        for child in self.children:
-            yield from child.allchildren()
+        # iterative: a recursive generator passes every node through one
+        # generator frame per tree level
+        stack = [iter(self.children)]
+        while stack:
+            for child in stack[-1]:
+                yield child
+                if child.children:
+                    stack.append(iter(child.children))
+                    break
+            else:
+                stack.pop()
 
     def find(self, target_type):
         """find instances of type tp in self.allchildren()"""
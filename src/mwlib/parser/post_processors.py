@@ -3,35 +3,45 @@
 # Copyright (c) 2007-2009 PediaPress GmbH
 # See README.rst for additional licensing information.
 
+"""post processors applied to every parsed article
+
+A post processor is called with the article and the keyword arguments
+title, revision, wikidb and lang. Post processors which only rewrite the
+children list of each node provide that rewrite as their filter_children
+attribute: run_postprocessors applies consecutive ones of them in a
+single walk over the tree.
+"""
 
 from mwlib import parser
 
 
-def simplify(node, **kwargs):
-    "concatenates textnodes in order to reduce the number of objects"
+def _simplify_children(children):
     Text = parser.Text
 
-    last = None
-    toremove = []
-    for i, child in enumerate(node.children):
+    res = []
+    texts = []
+    for child in children:
         if child.__class__ == Text:  # would isinstance be safe?
-            if last:
-                last.caption += child.caption
-                toremove.append(i)
-            else:
-                last = child
-        else:
-            simplify(child)
-            last = None
+            texts.append(child)
+            if len(texts) > 1:
+                continue
+        elif texts:
+            _merge_texts(texts)
+            texts = []
+        res.append(child)
+    if texts:
+        _merge_texts(texts)
+    return res
 
-    for i, index in enumerate(toremove):
-        del node.children[index - i]
 
+def _merge_texts(texts):
+    if len(texts) > 1:
+        texts[0].caption = "".join([text.caption for text in texts])
 
-def remove_boilerplate(node, **kwargs):
-    i = 0
-    while i < len(node.children):
-        child = node.children[i]
+
+def _remove_boilerplate_children(children):
+    res = []
+    for child in children:
         if isinstance(child, parser.TagNode) and child.caption == 'div':
             try:
                 klass = child.values.get('class', '')
@@ -39,13 +49,57 @@ def remove_boilerplate(node, **kwargs):
                 klass = ''
 
             if 'boilerplate' in klass:
-                del node.children[i]
                 continue
+        res.append(child)
+    return res
+
+
+def _filter_tree(node, filters):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        children = node.children
+        if not children:
+            continue
+        num_children = len(children)
+        for filter_children in filters:
+            children = filter_children(children)
+        if len(children) != num_children:
+            node.children[:] = children
+        stack.extend(children)
 
-        i += 1
 
-    for child_node in node.children:
-        remove_boilerplate(child_node)
+def simplify(node, **kwargs):
+    "concatenates textnodes in order to reduce the number of objects"
+    _filter_tree(node, [_simplify_children])
+
+
+simplify.filter_children = _simplify_children
+
+
+def remove_boilerplate(node, **kwargs):
+    _filter_tree(node, [_remove_boilerplate_children])
+
+
+remove_boilerplate.filter_children = _remove_boilerplate_children
 
 
 postprocessors = [remove_boilerplate, simplify]
+
+
+def run_postprocessors(node, processors=None, **kwargs):
+    """apply the post processors (default: postprocessors) in order"""
+    if processors is None:
+        processors = postprocessors
+    filters = []
+    for processor in processors:
+        filter_children = getattr(processor, "filter_children", None)
+        if filter_children is not None:
+            filters.append(filter_children)
+            continue
+        if filters:
+            _filter_tree(node, filters)
+            filters = []
+        processor(node, **kwargs)
+    if filters:
+        _filter_tree(node, filters)
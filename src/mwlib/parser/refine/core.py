@@ -12,6 +12,7 @@ from mwlib.parser import styleanalyzer, tagext
 from mwlib.parser.refine import util
 from mwlib.parser.refine.parse_table import TableFixer, TableGarbageRemover, TableParser
 from mwlib.parser.refine.tagparser import TagParser
+from mwlib.parser.sitecontext import get_site_context
 from mwlib.parser.token.utoken import Token, tokenize
 from mwlib.utils import uniq
 
@@ -1257,6 +1258,42 @@ def process_li_tokens(tokens):
 fix_li_tags.need_walker = False
 
 
+def _get_inline_tag_parser():
+    tag_parser = TagParser()
+    tag_parser.add("code", 10)
+    tag_parser.add("span", 20)
+    tag_parser.add("li", 25, blocknode=True, nested=False)
+    tag_parser.add("dl", 28, blocknode=True)
+    tag_parser.add("dt", 26, blocknode=True, nested=False)
+    tag_parser.add("dd", 26, blocknode=True, nested=True)
+    return tag_parser
+
+
+def _get_block_tag_parser():
+    tag_parser = TagParser()
+    tag_parser.add("blockquote", 5)
+    tag_parser.add("references", 15)
+    tag_parser.add("p", 30, blocknode=True, nested=False)
+    tag_parser.add("ul", 35, blocknode=True)
+    tag_parser.add("ol", 40, blocknode=True)
+    tag_parser.add("center", 45, blocknode=True)
+    return tag_parser
+
+
+def _get_heading_tag_parser():
+    tag_parser = TagParser()
+    for i in range(1, 7):
+        tag_parser.add("h%s" % i, i)
+    return tag_parser
+
+
+# TagParser resets its stack on every call, so these can be shared like
+# parse_div
+parse_inline_tags = _get_inline_tag_parser()
+parse_block_tags = _get_block_tag_parser()
+parse_headings = _get_heading_tag_parser()
+
+
 def parse_txt(txt, xopts=None, **kwargs):
     if xopts is None:
         xopts = XBunch(**kwargs)
@@ -1271,7 +1308,8 @@ def parse_txt(txt, xopts=None, **kwargs):
     if xopts.nshandler is None:
         xopts.nshandler = nshandling.get_nshandler_for_lang(xopts.lang or "en")
 
-    xopts.imagemod = util.ImageMod(xopts.magicwords)
+    site_context = get_site_context(xopts.nshandler.siteinfo)
+    xopts.imagemod = site_context.get_imagemod(xopts.magicwords)
 
     uniquifier = xopts.uniquifier
     if uniquifier is None:
@@ -1284,45 +1322,20 @@ def parse_txt(txt, xopts=None, **kwargs):
         return []
     tokens = tokenize(txt, uniquifier=uniquifier)
 
-    td2 = TagParser()
-    add_tag_2 = td2.add
-
-    add_tag_2("code", 10)
-    add_tag_2("span", 20)
-
-    add_tag_2("li", 25, blocknode=True, nested=False)
-    add_tag_2("dl", 28, blocknode=True)
-    add_tag_2("dt", 26, blocknode=True, nested=False)
-    add_tag_2("dd", 26, blocknode=True, nested=True)
-
-    td1 = TagParser()
-    add_tag_1 = td1.add
-    add_tag_1("blockquote", 5)
-    add_tag_1("references", 15)
-
-    add_tag_1("p", 30, blocknode=True, nested=False)
-    add_tag_1("ul", 35, blocknode=True)
-    add_tag_1("ol", 40, blocknode=True)
-    add_tag_1("center", 45, blocknode=True)
-
-    td_parse_h = TagParser()
-    for i in range(1, 7):
-        td_parse_h.add("h%s" % i, i)
-
     parsers = [
         fix_li_tags,
         mark_style_tags,
         ParseSingleQuote,
         ParsePreformatted,
-        td2,
+        parse_inline_tags,
         ParseParagraphs,
-        td1,
+        parse_block_tags,
         ParseLines,
         parse_div,
         ParseLinks,
         ParseUrls,
         parse_inputbox,
-        td_parse_h,
+        parse_headings,
         ParseSections,
         TableGarbageRemover,
         TableFixer,
@@ -5,8 +5,9 @@ import logging
 
 from mwlib.core import metabook, nshandling
 from mwlib.parser import expander
-from mwlib.parser.post_processors import postprocessors
+from mwlib.parser.post_processors import postprocessors, run_postprocessors
 from mwlib.parser.refine import compat
+from mwlib.parser.sitecontext import get_site_context
 from mwlib.parser.token.utoken import show
 
 log = logging.getLogger(__name__)
@@ -83,7 +84,7 @@ def parse_string(
     if siteinfo is None:
         nshandler = nshandling.get_nshandler_for_lang(lang)
     else:
-        nshandler = nshandling.NsHandler(siteinfo)
+        nshandler = get_site_context(siteinfo).nshandler
     article = compat.parse_txt(
         _input,
         title=title,
@@ -99,10 +100,9 @@ def parse_string(
     if template_expander and template_expander.magic_displaytitle:
         article.caption = template_expander.magic_displaytitle
 
-    for post_processor in postprocessors:
-        post_processor(
-            article, title=title, revision=revision, wikidb=wikidb, lang=lang
-        )
+    run_postprocessors(
+        article, postprocessors, title=title, revision=revision, wikidb=wikidb, lang=lang
+    )
 
     return article
 
@@ -91,6 +91,7 @@ class ImageMod:
 
     def __init__(self, magicwords=None):
         self.alias_map = {}
+        self._alias_rx = {}
         self.init_alias_map(self.default_magicwords)
         if magicwords is not None:
             self.init_alias_map(magicwords)
@@ -111,11 +112,11 @@ class ImageMod:
             elif name in ["img_alt", "img_link"]:
                 aliases_regexp = aliases_regexp.replace("\\$1", "(.*)")
             self.alias_map[name] = aliases_regexp
+            self._alias_rx[name] = re.compile(aliases_regexp, re.IGNORECASE)
 
     def parse(self, mod):
         mod = mod.lower().strip()
-        for mod_type, mod_reg in self.alias_map.items():
-            compiled_regex = re.compile(mod_reg, re.IGNORECASE)
+        for mod_type, compiled_regex in self._alias_rx.items():
             regex_match = compiled_regex.match(mod)
             if regex_match:
                 for match in regex_match.groups()[::-1]:
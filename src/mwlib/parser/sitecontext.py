@@ -0,0 +1,109 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.rst for additional licensing information.
+
+"""structures derived from a siteinfo, shared by all parsers of a process
+
+The namespace handler, the magic word aliases, the regular expressions
+for #if/#switch and the image modifiers only depend on the siteinfo of
+a wiki. get_site_context builds them once per siteinfo and every
+Expander, template Parser and parse_txt call of the process reuses
+them. A SiteContext is read-only after construction.
+"""
+
+import json
+import re
+from hashlib import sha256 as digest
+
+from mwlib.core import nshandling
+from mwlib.parser.refine.util import ImageMod
+from mwlib.parser.templ import mwlocals
+
+MAX_SITE_CONTEXTS = 50
+LOCALS_CACHE_SIZE = 200
+
+
+class AliasMap:
+    def __init__(self, siteinfo):
+        _map = {}
+        _name2aliases = {}
+
+        for magic_word_data in siteinfo.get("magicwords", []):
+            name = magic_word_data["name"]
+            aliases = magic_word_data["aliases"]
+            _name2aliases[name] = aliases
+            hashname = "#" + name
+            for alias in aliases:
+                _map[alias] = name
+                _map["#" + alias] = hashname
+
+        self._map = _map
+        self._name2aliases = _name2aliases
+
+    def resolve_magic_alias(self, name):
+        if name.startswith("#"):
+            resolved_name = self._map.get(name[1:])
+            if resolved_name:
+                return "#" + resolved_name
+        else:
+            return self._map.get(name)
+
+    def get_aliases(self, name):
+        return self._name2aliases.get(name) or []
+
+
+def get_branch_regexes(magicwords):
+    """return a dict mapping 'if' and 'switch' to regular expressions
+    matching the localized parser function names
+    """
+    name2rx = {"if": re.compile("^#if:"), "switch": re.compile("^#switch:")}
+    for magic_word_data in magicwords:
+        name = magic_word_data["name"]
+        if name in ("if", "switch"):
+            aliases = [re.escape(alias) for alias in magic_word_data["aliases"]]
+            name2rx[name] = re.compile("^#({}):".format("|".join(aliases)))
+    return name2rx
+
+
+class SiteContext:
+    def __init__(self, siteinfo):
+        self.siteinfo = siteinfo
+        self.magicwords = siteinfo.get("magicwords")
+        self.nshandler = nshandling.NsHandler(siteinfo)
+        self.aliasmap = AliasMap(siteinfo)
+        self.name2rx = get_branch_regexes(self.magicwords or [])
+        self.imagemod = ImageMod(self.magicwords)
+        self._locals = {}
+        # only the magic words change how templates are parsed
+        magicwords = json.dumps(self.magicwords or [], sort_keys=True)
+        self.parse_fingerprint = digest(magicwords.encode("utf-8")).hexdigest()
+
+    def get_imagemod(self, magicwords):
+        if magicwords is self.magicwords:
+            return self.imagemod
+        return ImageMod(magicwords)
+
+    def parse_locals(self, local_str):
+        try:
+            return self._locals[local_str]
+        except KeyError:
+            pass
+        if len(self._locals) >= LOCALS_CACHE_SIZE:
+            self._locals.clear()
+        res = self._locals[local_str] = mwlocals.parse_locals(local_str)
+        return res
+
+
+_contexts = {}
+
+
+def get_site_context(siteinfo):
+    """return the SiteContext for siteinfo. contexts are cached by the
+    identity of the siteinfo dict, which must not be modified afterwards.
+    """
+    # the context keeps a reference to siteinfo, so its id is not reused
+    ctx = _contexts.get(id(siteinfo))
+    if ctx is None:
+        if len(_contexts) >= MAX_SITE_CONTEXTS:
+            _contexts.clear()
+        ctx = _contexts[id(siteinfo)] = SiteContext(siteinfo)
+    return ctx
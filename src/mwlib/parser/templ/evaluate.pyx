@@ -1,10 +1,12 @@
 # Copyright (c) 2007-2009 PediaPress GmbH
 # See README.md for additional licensing information.
 
-from mwlib.core import metabook, nshandling
+from mwlib.core import metabook
+from mwlib.utils import conf
 from mwlib.utils.uniq import Uniquifier
 from mwlib.network import siteinfo
-from mwlib.parser.templ import log, magics, mwlocals, parser
+from mwlib.parser.sitecontext import get_site_context
+from mwlib.parser.templ import log, magics, parser, parsecache
 from mwlib.parser.templ.marks import Mark, dummy_mark, eqmark, maybe_newline
 
 
@@ -34,6 +36,8 @@ def flatten(node: Any, expander: Any, variables: Any, res: list[str]) -> bool:
         except TemplateRecursion:
             if expander.recursion_count > 2:
                 raise
+            # the result depends on the recursion depth
+            expander.volatile_count += 1
             del res[old_len:]
             log.warning("template recursion error ignored")
         after = variables.count
@@ -72,9 +76,14 @@ class ArgumentList:
 
         self.named_args = {}
         self.count = 0
+        # argument -> value of the arguments accessed, if set to a dict.
+        # the number of arguments is recorded as argument None.
+        self.accessed = None
 
     def __len__(self):
         self.count += 1
+        if self.accessed is not None and None not in self.accessed:
+            self.accessed[None] = len(self.args)
         return len(self.args)
 
     def __getitem__(self, n):
@@ -87,11 +96,24 @@ class ArgumentList:
 
     def get(self, n, default):
         self.count += 1
+        val = self.lookup(n)
+        if self.accessed is not None and n not in self.accessed:
+            self.accessed[n] = val
+        if val is None:
+            return default
+        return val
+
+    def lookup(self, n):
+        """return the value of argument n or None if it is missing. None
+        returns the number of arguments.
+        """
+        if n is None:
+            return len(self.args)
         if isinstance(n, int):
             try:
                 a = self.args[n]
             except IndexError:
-                return default
+                return None
             if isinstance(a, str):
                 return a.strip()
             tmp = []
@@ -107,26 +129,7 @@ class ArgumentList:
 
         if n not in self.named_args:
             while self.var_num < len(self.args):
-                arg = self.args[self.var_num]
-                self.var_num += 1
-
-                name, val = equal_split(arg)
-                if name is not None:
-                    tmp = []
-                    flatten(name, self.expander, self.variables, tmp)
-                    insert_implicit_newlines(tmp)
-                    name = "".join(tmp).strip()
-                    do_strip = True
-                else:
-                    name = str(self.var_count)
-                    self.var_count += 1
-                    do_strip = False
-
-                if do_strip and isinstance(val, str):
-                    val = val.strip()
-                self.named_args[name] = (do_strip, val)
-
-                if n == name:
+                if self._add_next_named_arg() == n:
                     break
 
         try:
@@ -134,7 +137,7 @@ class ArgumentList:
             if isinstance(val, str):
                 return val
         except KeyError:
-            return default
+            return None
 
         tmp = []
         flatten(val, self.expander, self.variables, tmp)
@@ -146,6 +149,27 @@ class ArgumentList:
         self.named_args[n] = (do_strip, tmp)
         return tmp
 
+    def _add_next_named_arg(self):
+        arg = self.args[self.var_num]
+        self.var_num += 1
+
+        name, val = equal_split(arg)
+        if name is not None:
+            tmp = []
+            flatten(name, self.expander, self.variables, tmp)
+            insert_implicit_newlines(tmp)
+            name = "".join(tmp).strip()
+            do_strip = True
+        else:
+            name = str(self.var_count)
+            self.var_count += 1
+            do_strip = False
+
+        if do_strip and isinstance(val, str):
+            val = val.strip()
+        self.named_args[name] = (do_strip, val)
+        return name
+
 
 def is_implicit_newline(raw):
     """should we add a newline to templates starting with *, #, :, ;, {|
@@ -178,8 +202,72 @@ def insert_implicit_newlines(res, maybe_newline=maybe_newline):
     del res[-2:]
 
 
+class TemplateCache:
+    """results of template expansions, keyed by template name and the
+    values of the arguments the expansion accessed. size is the number of
+    characters stored, new results are dropped once it reaches maxsize.
+
+    An expansion accesses its arguments in an order which only depends on
+    the values of the arguments accessed before. The results of a template
+    are stored in a tree: each branch is a list of the argument accessed
+    next and a dict mapping its values to the next branch or the result.
+    A lookup only expands the arguments the expansion itself would expand.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = {}
+
+    def get(self, name, args):
+        """return the cached expansion of template name for the
+        ArgumentList args or None
+        """
+        node = self._cache.get(name)
+        while node is not None:
+            if type(node) is tuple:
+                self.hits += 1
+                return node
+            n, values = node
+            node = values.get(args.lookup(n))
+        self.misses += 1
+        return None
+
+    def set(self, name, accessed, res):
+        """store res, the expansion of template name which accessed the
+        arguments in the dict accessed
+        """
+        size = len(name) + sum([len(val) for val in accessed.values() if isinstance(val, str)])
+        size += sum([len(x) for x in res])
+        if self.size + size > self.maxsize:
+            return
+        parent, slot = self._cache, name
+        for n, val in accessed.items():
+            node = parent.get(slot)
+            if node is None:
+                node = parent[slot] = [n, {}]
+            elif type(node) is tuple or node[0] != n:
+                return
+            parent, slot = node[1], val
+        if slot not in parent:
+            self.size += size
+            parent[slot] = tuple(res)
+
+
+def get_template_cache():
+    maxsize = conf.get("templ", "expansion_cache_size", 4 * 1024 * 1024, int)
+    if maxsize > 0:
+        return TemplateCache(maxsize)
+    return None
+
+
 class Expander:
     magic_displaytitle = None  # set via {{DISPLAYTITLE:...}}
+    # incremented whenever the expansion depends on more than the
+    # template arguments, e.g. on the page name or the current time
+    volatile_count = 0
 
     def __init__(self, txt, pagename="", wikidb=None, recursion_limit=100):
         assert wikidb is not None, "must supply wikidb argument in Expander.__init__"
@@ -197,13 +285,14 @@ class Expander:
             print(f"WARNING: failed to get siteinfo from {self.db!r}")
             si = siteinfo.get_siteinfo("de")
 
-        self.nshandler = nshandler = nshandling.NsHandler(si)
+        site_context = get_site_context(si)
+        self.nshandler = nshandler = site_context.nshandler
         self.siteinfo = si
 
         if self.db and hasattr(self.db, "get_source"):
             source = self.db.get_source(pagename) or metabook.source()
             local_values = source.locals or ""
-            local_values = mwlocals.parse_locals(local_values)
+            local_values = site_context.parse_locals(local_values)
         else:
             local_values = None
             source = {}
@@ -225,13 +314,14 @@ class Expander:
 
         self.recursion_limit = recursion_limit
         self.recursion_count = 0
-        self.aliasmap = parser.AliasMap(self.siteinfo)
+        self.aliasmap = site_context.aliasmap
 
         self.parsed = parser.parse(
             txt, included=False, replace_tags=self.replace_tags, siteinfo=self.siteinfo
         )
         # show(self.parsed)
         self.parsedTemplateCache = {}
+        self.template_cache = get_template_cache()
 
     def resolve_magic_alias(self, name):
         return self.aliasmap.resolve_magic_alias(name)
@@ -263,6 +353,9 @@ class Expander:
         return res
 
     def _parse_raw_template(self, name, raw):
+        cache = parsecache.get_parse_cache()
+        if cache is not None:
+            return cache.parse(raw, self.uniquifier)
         return parser.parse(raw, replace_tags=self.replace_tags)
 
     def _expand(self, parsed, keep_uniq=False):
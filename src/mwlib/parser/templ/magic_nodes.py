@@ -31,6 +31,7 @@ class Time(nodes.Node):
         else:
             date_elements = None
 
+        expander.volatile_count += 1
         res.append(magic_time.time(formats, date_elements))
 
 
@@ -80,6 +81,7 @@ class RelativeToAbsolute(nodes.Node):
             evaluate.flatten(self[1], expander, variables, arg2)
         arg2 = "".join(arg2).strip()
         if not arg2:
+            expander.volatile_count += 1
             arg2 = expander.pagename
 
         res.append(_rel2abs(arg, arg2))
@@ -130,6 +132,7 @@ class DisplayTitle(nodes.Node):
         name = []
         evaluate.flatten(self[0], expander, variables, name)
         name = "".join(name).strip()
+        expander.volatile_count += 1
         expander.magic_displaytitle = name
 
 
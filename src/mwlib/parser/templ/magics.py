@@ -365,6 +365,19 @@ class PageMagic:
         return parsed_url.netloc
 
 
+# magic words whose value depends on the page being expanded or on the
+# current time. template expansions using them are not memoized.
+VOLATILE_MAGICS = frozenset(
+    [name for name in vars(TimeMagic) if name.isupper()]
+    + [name for name in vars(LocaltimeMagic) if name.isupper()]
+    + """PAGENAME PAGENAMEE FULLPAGENAME FULLPAGENAMEE SUBPAGENAME SUBPAGENAMEE
+    BASEPAGENAME BASEPAGENAMEE NAMESPACE NAMESPACEE TALKSPACE TALKSPACEE
+    SUBJECTSPACE SUBJECTSPACEE ARTICLESPACE ARTICLESPACEE TALKPAGENAME
+    TALKPAGENAMEE SUBJECTPAGENAME SUBJECTPAGENAMEE ARTICLEPAGENAME
+    ARTICLEPAGENAMEE REVISIONID""".split()
+)
+
+
 class NumberMagic:
     def NUMBEROFARTICLES(self):
         """A variable which returns the total
@@ -29,5 +29,9 @@ class _EqMark(str):
     def __eq__(self, other):
         return self is other
 
+    def __reduce__(self):
+        # keep the singleton when unpickling cached parse trees
+        return "eqmark"
+
 
 eqmark = _EqMark("=")
@@ -260,20 +260,35 @@ class Template(Node):
         rep = expander.resolver(name, var)
 
         if rep is not None:
+            if name.upper() in magics.VOLATILE_MAGICS:
+                expander.volatile_count += 1
             res.append(maybe_newline)
             res.append(rep)
             res.append(dummy_mark)
         else:
             p = expander.get_parsed_template(name)
             if p:
+                cache = expander.template_cache
+                if cache is not None:
+                    cached = cache.get(name, var)
+                    if cached is not None:
+                        res.extend(cached)
+                        return
+                    # the arguments expanded by the lookup are part of the key
+                    volatile_count = expander.volatile_count
+                    var.accessed = {}
+
+                old_idx = len(res)
                 if DEBUG:
                     msg = f"EXPANDING {name!r} {var!r}  ===> "
-                    old_idx = len(res)
                 res.append(MarkStart(repr(name)))
                 res.append(maybe_newline)
                 flatten(p, expander, var, res)
                 res.append(MarkEnd(repr(name)))
 
+                if cache is not None and expander.volatile_count == volatile_count:
+                    cache.set(name, var.accessed, res[old_idx:])
+
                 if DEBUG:
                     msg += repr("".join(res[old_idx:]))
                     print(msg)
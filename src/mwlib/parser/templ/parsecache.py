@@ -0,0 +1,152 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.md for additional licensing information.
+
+"""persistent cache of parsed templates shared by all processes on a host
+
+The cache is disabled by default. Enable it by setting the cache directory
+in the [templ] section of the configuration, e.g.::
+
+    [templ]
+    parse_cache_dir = /var/cache/mwlib/templ
+    parse_cache_size = 268435456
+
+or via the environment variable MWLIB_TEMPL_PARSE_CACHE_DIR. Without a
+cache directory, long running workers can keep a number of parse trees in
+memory instead::
+
+    [templ]
+    parse_cache_entries = 2000
+
+Parsing replaces tags like <ref> or <nowiki> with unique markers that are
+resolved through the expander's Uniquifier. Cached parse trees therefore
+carry the replacements they depend on and use markers derived from the
+cache key, which are registered with the Uniquifier of the expander using
+the tree.
+"""
+
+import io
+import pickle
+from hashlib import sha256 as digest
+
+from mwlib.parser.sitecontext import get_site_context
+from mwlib.parser.templ import parser
+from mwlib.parser.templ.node import Node
+from mwlib.utils import conf, lrucache
+from mwlib.utils.diskcache import DiskCache
+from mwlib.utils.uniq import Uniquifier
+
+# bump this whenever the structure of the parse tree changes
+CACHE_VERSION = 1
+
+
+def _get_node_classes():
+    from mwlib.parser.templ import magic_nodes, nodes  # noqa: F401 -- register subclasses
+
+    classes = {}
+    todo = [Node]
+    while todo:
+        klass = todo.pop()
+        classes[klass.__name__] = klass
+        todo.extend(klass.__subclasses__())
+    return classes
+
+
+_node_classes = {}
+
+
+def _make_node(name, children):
+    try:
+        klass = _node_classes[name]
+    except KeyError:
+        _node_classes.update(_get_node_classes())
+        klass = _node_classes[name]
+    return klass(children)
+
+
+class _TreePickler(pickle.Pickler):
+    # the cython compiled node classes cannot be located by their
+    # __module__, so nodes are pickled by class name
+    def reducer_override(self, obj):
+        if isinstance(obj, Node):
+            return _make_node, (obj.__class__.__name__, tuple(obj))
+        return NotImplemented
+
+
+class _TreeStore(DiskCache):
+    def dumps(self, value):
+        out = io.BytesIO()
+        _TreePickler(out, pickle.HIGHEST_PROTOCOL).dump(value)
+        return out.getvalue()
+
+
+class _RecordingUniquifier(Uniquifier):
+    def __init__(self, random_string):
+        Uniquifier.__init__(self)
+        self.random_string = random_string
+
+
+class ParseCache:
+    def __init__(self, path, maxsize=256 * 1024 * 1024):
+        self.store = _TreeStore(path, maxsize=maxsize)
+
+    def get_key(self, raw, included=True, siteinfo=None):
+        if siteinfo is None:
+            from mwlib.network.siteinfo import get_siteinfo
+
+            siteinfo = get_siteinfo("en")
+        hasher = digest()
+        hasher.update(f"{CACHE_VERSION}:{int(included)}:".encode())
+        hasher.update(get_site_context(siteinfo).parse_fingerprint.encode())
+        hasher.update(raw.encode("utf-8"))
+        return hasher.hexdigest()
+
+    def parse(self, raw, uniquifier, included=True, siteinfo=None):
+        key = self.get_key(raw, included=included, siteinfo=siteinfo)
+        entry = self.store.get(key)
+        if entry is None:
+            recorder = _RecordingUniquifier(key[:16])
+            parsed = parser.parse(
+                raw, included=included, replace_tags=recorder.replace_tags, siteinfo=siteinfo
+            )
+            entry = (parsed, recorder.uniq2repl)
+            self.store[key] = entry
+
+        parsed, uniq2repl = entry
+        uniquifier.uniq2repl.update(uniq2repl)
+        return parsed
+
+    def stats(self):
+        return self.store.stats()
+
+
+class MemoryParseCache(ParseCache):
+    """ParseCache keeping the parse trees in the memory of the process"""
+
+    def __init__(self, maxsize=2000):
+        self.store = lrucache.get_cache("templ_parse", maxsize)
+
+
+_parse_cache = None
+_configured = False
+
+
+def get_parse_cache():
+    """return the host wide ParseCache or None if it is not configured"""
+    global _parse_cache, _configured
+    if not _configured:
+        _configured = True
+        path = conf.get("templ", "parse_cache_dir", None)
+        if path:
+            maxsize = conf.get("templ", "parse_cache_size", 256 * 1024 * 1024, int)
+            _parse_cache = ParseCache(path, maxsize=maxsize)
+        else:
+            entries = conf.get("templ", "parse_cache_entries", 0, int)
+            if entries > 0:
+                _parse_cache = MemoryParseCache(entries)
+    return _parse_cache
+
+
+def set_parse_cache(cache):
+    global _parse_cache, _configured
+    _parse_cache = cache
+    _configured = True
@@ -2,9 +2,9 @@
 # See README.md for additional licensing information.
 
 
-import re
 from hashlib import sha256 as digest
 
+from mwlib.parser.sitecontext import AliasMap, get_site_context  # noqa: F401
 from mwlib.parser.templ.marks import eqmark
 from mwlib.parser.templ.nodes import IfNode, Node, SwitchNode, Template, Variable
 from mwlib.parser.templ.optimization import optimize
@@ -12,38 +12,12 @@ from mwlib.parser.templ.scanner import Symbols, tokenize
 from mwlib.utils import lrucache
 
 
-class AliasMap:
-    def __init__(self, siteinfo):
-        _map = {}
-        _name2aliases = {}
-
-        for magic_word_data in siteinfo.get("magicwords", []):
-            name = magic_word_data["name"]
-            aliases = magic_word_data["aliases"]
-            _name2aliases[name] = aliases
-            hashname = "#" + name
-            for alias in aliases:
-                _map[alias] = name
-                _map["#" + alias] = hashname
-
-        self._map = _map
-        self._name2aliases = _name2aliases
-
-    def resolve_magic_alias(self, name):
-        if name.startswith("#"):
-            resolved_name = self._map.get(name[1:])
-            if resolved_name:
-                return "#" + resolved_name
-        else:
-            return self._map.get(name)
-
-    def get_aliases(self, name):
-        return self._name2aliases.get(name) or []
-
-
 class Parser:
+    # parse trees of texts without replaced tags. trees with tags replaced
+    # by unique markers belong to the Uniquifier of the caller and are
+    # cached by parsecache instead.
     use_cache = False
-    _cache = lrucache.MTLRUCache(2000)
+    _cache = lrucache.get_cache("templ_parser", 2000)
 
     def __init__(self, txt, included=True, replace_tags=None, siteinfo=None):
 
@@ -55,18 +29,9 @@ class Parser:
 
             siteinfo = get_siteinfo("en")
         self.siteinfo = siteinfo
-        self.name2rx = {"if": re.compile("^#if:"),
-                        "switch": re.compile("^#switch:")}
-
-        magicwords = self.siteinfo.get("magicwords", [])
-        for magic_word_data in magicwords:
-            name = magic_word_data["name"]
-            if name in ("if", "switch"):
-                aliases = [re.escape(alias) for alias in magic_word_data["aliases"]]
-                regex_pattern = "^#({}):".format("|".join(aliases))
-                self.name2rx[name] = re.compile(regex_pattern)
-
-        self.aliasmap = AliasMap(self.siteinfo)
+        self.site_context = site_context = get_site_context(siteinfo)
+        self.name2rx = site_context.name2rx
+        self.aliasmap = site_context.aliasmap
 
     def get_token(self):
         return self.tokens[self.pos]
@@ -282,8 +247,13 @@ class Parser:
         return parsed_nodes
 
     def parse(self):
-        if self.use_cache:
-            fingerprint = digest(self.txt.encode("utf-8")).digest()
+        use_cache = self.use_cache and self.replace_tags is None
+        if use_cache:
+            fingerprint = (
+                digest(self.txt.encode("utf-8")).digest(),
+                self.included,
+                self.site_context,
+            )
             try:
                 return self._cache[fingerprint]
             except KeyError:
@@ -309,7 +279,7 @@ class Parser:
 
         parsed_nodes = optimize(parsed_nodes)
 
-        if self.use_cache:
+        if use_cache:
             self._cache[fingerprint] = parsed_nodes
 
         return parsed_nodes
@@ -147,6 +147,69 @@ class TreeCleaner:
 
     skip_methods = []
 
+    # node classes a cleaner acts on. A cleaner can not change an article which
+    # contains no node of any of these classes (or their subclasses) and is
+    # skipped for it. Cleaners not listed here may act on any node.
+    # Cleaners depending on configurable class lists are added in
+    # _get_cleaner_node_classes.
+    cleaner_node_classes = {
+        "mark_infoboxes": (Table,),
+        "remove_edit_links": (NamedURL,),
+        "remove_empty_text_nodes": (Text,),
+        "remove_invisible_links": (CategoryLink, LangLink),
+        "clean_section_captions": (Section,),
+        "remove_list_only_paragraphs": (Paragraph,),
+        "remove_invalid_file_types": (ImageLink,),
+        "fix_paragraphs": (Section,),
+        "simplify_block_nodes": (Paragraph,),
+        "gallery_fix": (Gallery,),
+        "fix_region_list_tables": (Div,),
+        "remove_train_templates": (ImageLink,),
+        "unnest_ending_cell_content": (Table,),
+        "remove_critical_tables": (Table,),
+        "fix_table_colspans": (Table,),
+        "remove_empty_training_table_rows": (Table,),
+        "split_table_lists": (Row,),
+        "transform_single_col_tables": (Table,),
+        "split_table_to_columns": (Table,),
+        "linearize_wide_nested_tables": (Table,),
+        "remove_breaking_returns": (BreakingReturn,),
+        "remove_empty_ref_lists": (ReferenceList,),
+        "remove_big_sections_from_cells": (Cell,),
+        "transform_nested_tables": (Table,),
+        "split_big_table_cells": (Row,),
+        "limit_image_caption_size": (ImageLink,),
+        "remove_dup_links_in_refs": (Reference,),
+        "fix_item_lists": (ItemList,),
+        "fix_sub_sup": (Sup, Sub),
+        "remove_leading_para_in_list": (Item, Reference),
+        "remove_new_lines": (Text,),
+        "remove_see_also": (Section,),
+        "build_def_lists": (DefinitionTerm, DefinitionDescription),
+        "fix_reference_nodes": (Reference,),
+        "fix_math_dir": (Math,),
+        "fix_preformatted": (PreFormatted,),
+        "fix_list_nesting": (ItemList,),
+        "handle_only_in_print": (URL, NamedURL, ArticleLink, NamespaceLink, InterwikiLink, SpecialLink),
+        "remove_empty_sections": (Section,),
+        "mark_short_paragraph": (Paragraph,),
+    }
+
+    # node classes a cleaner may insert into the tree, apart from copies of
+    # existing nodes. All other cleaners only move, copy or remove nodes.
+    cleaner_new_classes = {
+        "clean_section_captions": (BreakingReturn,),
+        "fix_region_list_tables": (Table,),
+        "transform_single_col_tables": (Div,),
+        "unnest_ending_cell_content": (Div,),
+        "split_table_lists": (ItemList,),
+        "split_big_table_cells": (Cell,),
+        "fix_item_lists": (Item,),
+        "build_def_lists": (DefinitionList,),
+        "fix_preformatted": (Text, BreakingReturn),
+        "fix_list_nesting": (DefinitionDescription,),
+    }
+
     def __init__(
         self,
         tree,
@@ -354,15 +417,41 @@ class TreeCleaner:
         self.content_without_text_classes = [Gallery, ImageLink]
         self.content_without_text_classes = [Gallery, ImageLink, Timeline]
 
+    def _get_cleaner_node_classes(self):
+        node_classes = dict(self.cleaner_node_classes)
+        node_classes["remove_textless_styles"] = tuple(self.style_nodes)
+        node_classes["swap_nodes"] = tuple(self.swap_nodes_map)
+        node_classes["restrict_children"] = tuple(self.allowed_children)
+        # these act on nodes nested in a parent of the listed classes
+        node_classes["remove_broken_children"] = tuple(
+            {klass for parents in self.remove_nodes.values() for klass in parents}
+        )
+        if self.nesting_strictness == "loose":
+            node_classes["fix_nesting"] = tuple(
+                {klass for parents in self.forbidden_parents.values() for klass in parents}
+            )
+        return node_classes
+
+    def _get_node_classes(self, node):
+        """return the set of classes of node and all its descendants"""
+        classes = set()
+        todo = [node]
+        while todo:
+            node = todo.pop()
+            classes.add(node.__class__)
+            todo.extend(node.children)
+        return classes
+
     def clean(self, cleaner_methods):
         """Clean parse tree using cleaner methods in the methodList."""
         cleaner_list = []
         for method in cleaner_methods:
             cleaner_foo = getattr(self, method, None)
             if cleaner_foo:
-                cleaner_list.append(cleaner_foo)
+                cleaner_list.append((method, cleaner_foo))
             else:
                 raise "TreeCleaner has no method: %r" % method
+        cleaner_node_classes = self._get_cleaner_node_classes()
 
         # FIXME: performance could be improved, if individual articles would be cleaned
         # the algorithm below splits on the first level, if a book is found
@@ -372,7 +461,13 @@ class TreeCleaner:
 
         total_children = len(children)
         for i, child in enumerate(children):
-            for cleaner in cleaner_list:
+            # superset of the node classes in child: cleaners remove and move
+            # nodes, newly created classes are added after each cleaner
+            node_classes = self._get_node_classes(child)
+            for method, cleaner in cleaner_list:
+                acts_on = cleaner_node_classes.get(method)
+                if acts_on is not None and not any(issubclass(klass, acts_on) for klass in node_classes):
+                    continue
                 try:
                     cleaner(child)
                 except Exception as exc:
@@ -386,6 +481,7 @@ class TreeCleaner:
                     import traceback
 
                     traceback.print_exc()
+                node_classes.update(self.cleaner_new_classes.get(method, ()))
             if self.status_cb:
                 self.status_cb(progress=100 * i / total_children)
 
@@ -668,15 +764,11 @@ class TreeCleaner:
         # tables like this should be detected and marked in
         # a separate module probably
         single_col = node.__class__ == Table and node.numcols == 1
-        is_long = len(node.get_all_display_text()) > 2500
-
-        contains_gallery = len(node.get_child_nodes_by_class(Gallery)) > 0
-        many_cells = False
         if single_col:
+            is_long = len(node.get_all_display_text()) > 2500
+            contains_gallery = len(node.get_child_nodes_by_class(Gallery)) > 0
             all_images, many_cells = self._check_node_for_all_images_and_many_cells(node)
-        else:
-            all_images = False
-        many_nested_rows = self._has_many_nested_rows_in_table(node)
+            many_nested_rows = self._has_many_nested_rows_in_table(node)
         if single_col and (
             (not getattr(node, "isInfobox", False) and (is_long or many_cells))
             or ((is_long or many_nested_rows) and many_cells)
@@ -847,7 +939,7 @@ class TreeCleaner:
         else:
             return True
 
-    def _fix_nesting(self, node):
+    def _fix_nesting(self, node, bad_parent):
         """Nesting of nodes is corrected.
 
         The strictness depends on nesting_strictness which
@@ -868,14 +960,9 @@ class TreeCleaner:
         bn_3
         bn_1.2
          nbn_4
-        """
 
-        if self._is_exception(node):
-            return
-
-        bad_parent = self._nesting_broken(node)
-        if not bad_parent:
-            return any(self._fix_nesting(c) for c in node.children)
+        bad_parent is replaced by the three parts, which are returned.
+        """
 
         divide = node.get_parents()
         divide.append(node)
@@ -897,11 +984,39 @@ class TreeCleaner:
         parent = bad_parent.parent
         parent.replace_child(bad_parent, new_tree)
         self._clean_up_marks(parent)
-        return True
+        return new_tree
 
     def fix_nesting(self, node):
-        while self._fix_nesting(node):
-            pass
+        """Walk the tree in document order and fix broken nesting.
+
+        After a fix, the nodes in front of the fixed node are left as they
+        were and are still correctly nested, so the walk continues with the
+        moved node instead of starting over.
+        """
+
+        def is_descendant(child, ancestor):
+            while child is not None:
+                if child is ancestor:
+                    return True
+                child = child.parent
+            return False
+
+        todo = [node]
+        while todo:
+            node = todo.pop()
+            if self._is_exception(node):
+                continue
+
+            bad_parent = self._nesting_broken(node)
+            if not bad_parent:
+                todo.extend(reversed(node.children))
+                continue
+
+            new_tree = self._fix_nesting(node, bad_parent)
+            # drop pending nodes of the replaced subtree, continue with its copies
+            while todo and is_descendant(todo[-1], bad_parent):
+                todo.pop()
+            todo.extend(reversed(new_tree[1:]))
 
     # ex: some tags need to be swapped: center nodes have
     # to be pulled out of underline nodes
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import bisect
 import re
 from pathlib import Path
 
@@ -10,6 +11,8 @@ class Scripts:
         self.script2code_block = {}
         self.code_block2scripts = []
         self.read_script_file(scripts_filename)
+        self.code_block2scripts.sort()
+        self._block_starts = [block[0] for block in self.code_block2scripts]
 
     def read_script_file(self, file_name):
         if not file_name.exists():
@@ -52,16 +55,21 @@ class Scripts:
                 self.get_scripts_for_code_block(code_block))
         return the_scripts
 
+    def get_script(self, ord_char):
+        idx = bisect.bisect_right(self._block_starts, ord_char) - 1
+        if idx >= 0:
+            _, block_end, the_script = self.code_block2scripts[idx]
+            if ord_char <= block_end:
+                return the_script
+        return None
+
     def get_scripts(self, txt):
         the_scripts = set()
-        idx = 0
-        txt_len = len(txt)
-        while idx < txt_len:
-            for block_start, block_end, the_script in self.code_block2scripts:
-                while idx < txt_len and block_start <= ord(txt[idx]) <= block_end:
-                    if txt[idx] != " ":
-                        the_scripts.add(the_script)
-                    idx += 1
+        for char in set(txt):
+            if char != " ":
+                the_script = self.get_script(ord(char))
+                if the_script is not None:
+                    the_scripts.add(the_script)
         return list(the_scripts)
 
 
@@ -83,6 +91,14 @@ class FontSwitcher:
         self.cjk_fonts = []  # list of font names for cjk scripts
         self.space_cjk = False  # when switching fonts, indicate that cjk text is present
 
+        # compiled from code_points2font and the character lists above,
+        # rebuilt whenever fonts are (un)registered
+        self._font_starts = None
+        self._fonts = None
+        self._run_patterns = {}
+        self._switchless_chars = None
+        self._translation = None
+
     @staticmethod
     def read_char_blacklist(char_blacklist_file):
         if not char_blacklist_file:
@@ -104,6 +120,7 @@ class FontSwitcher:
         registered_entries.reverse()
         for entry in registered_entries:
             self.code_points2font.pop(entry)
+        self._invalidate()
 
     def register_font(self, font_name, code_points: list):
         """Register a font to certain scripts
@@ -116,15 +133,72 @@ class FontSwitcher:
             block_start, block_end = block
             self.code_points2font.insert(0, (block_start,
                                              block_end, font_name))
+        self._invalidate()
 
     def register_default_font(self, font_name=None):
         self.default_font = font_name
 
+    def _invalidate(self):
+        self._font_starts = None
+        self._run_patterns = {}
+
+    def _compile(self):
+        """flatten code_points2font into sorted, non-overlapping intervals
+
+        _font_starts[i] is the first code point of the i-th interval,
+        _fonts[i] the font registered for it or None for the default font.
+        Earlier entries of code_points2font take precedence.
+        """
+        blocks = [block for block in self.code_points2font if block[0] <= block[1]]
+        points = {0}
+        for block_start, block_end, _ in blocks:
+            points.add(block_start)
+            points.add(block_end + 1)
+
+        font_starts = []
+        fonts = []
+        for point in sorted(points):
+            font = None
+            for block_start, block_end, font_name in blocks:
+                if block_start <= point <= block_end:
+                    font = font_name
+                    break
+            if fonts and fonts[-1] == font:
+                continue
+            font_starts.append(point)
+            fonts.append(font)
+
+        self._fonts = fonts
+        self._font_starts = font_starts
+        self._switchless_chars = set(self.no_switch_chars) | set(self.char_blacklist)
+        translation = dict.fromkeys(self.remove_chars, "")
+        translation.update(dict.fromkeys(self.space_like_chars, " "))
+        translation.update(dict.fromkeys(self.char_blacklist, chr(9633)))  # U+25A1 WHITE SQUARE
+        self._translation = translation
+
     def get_font(self, ord_char):
-        for block_start, block_end, font_name in self.code_points2font:
-            if block_start <= ord_char <= block_end:
-                return font_name
-        return self.default_font
+        if self._font_starts is None:
+            self._compile()
+        idx = bisect.bisect_right(self._font_starts, ord_char) - 1
+        font = self._fonts[idx] if idx >= 0 else None
+        return self.default_font if font is None else font
+
+    def _get_run_pattern(self, font):
+        """regular expression matching a run of characters set in font"""
+        patterns = self._run_patterns.setdefault(self.default_font, {})
+        pattern = patterns.get(font)
+        if pattern is None:
+            max_char = 0x10FFFF
+            ranges = []
+            bounds = self._font_starts[1:] + [max_char + 1]
+            for start, stop, font_name in zip(self._font_starts, bounds, self._fonts):
+                if font_name is None:
+                    font_name = self.default_font
+                if font_name == font and start <= max_char:
+                    ranges.append(f"{re.escape(chr(start))}-{re.escape(chr(min(stop - 1, max_char)))}")
+            ranges.extend(re.escape(chr(ord_c)) for ord_c in sorted(self._switchless_chars))
+            pattern = patterns[font] = re.compile("[{}]+".format("".join(ranges)))
+        return pattern
 
     def _append_text_and_font_to_list(self, font, txt, new_txt_list):
         if font != self.default_font:
@@ -158,37 +232,35 @@ class FontSwitcher:
             return txt_list, False
         return txt_list
 
-    def _get_processed_char_and_font(self, ord_c, blacklisted, last_font, text_char):
-        if ord_c in self.remove_chars:
-            text_char = ""
-        if ord_c in self.space_like_chars:
-            text_char = " "
-        if blacklisted:
-            text_char = chr(9633)  # U+25A1 WHITE SQUARE
-        font = last_font if last_font else self.default_font
-        return text_char, font
-
     def extract_last_font_last_text_and_text_list(self, txt: str | bytes):
+        """split txt into runs of text set in the same font
+
+        Space like, ignored and blacklisted characters never switch the
+        font. Instead of looking up the font of every single character,
+        each run is consumed with one match of a per font character class.
+        """
         txt_list = []
         last_font = None
         last_txt = []
         if isinstance(txt, bytes):
             txt = txt.decode("utf-8")
-        for text_char in txt:
-            try:
-                ord_c = ord(text_char)
-            except TypeError:
-                raise TypeError(f"Invalid character in text: {text_char!r}")
-            blacklisted = self.char_blacklist.get(ord_c, False)
-            if ord_c in self.no_switch_chars or blacklisted:
-                text_char, font = self._get_processed_char_and_font(ord_c, blacklisted, last_font, text_char)
+        if self._font_starts is None:
+            self._compile()
+
+        idx = 0
+        txt_len = len(txt)
+        while idx < txt_len:
+            ord_c = ord(txt[idx])
+            if ord_c in self._switchless_chars:
+                font = last_font if last_font else self.default_font
             else:
                 font = self.get_font(ord_c)
-            if font != last_font and last_txt:
+            end = self._get_run_pattern(font).match(txt, idx).end()
+            if last_txt:
                 txt_list.append(("".join(last_txt), last_font))
-                last_txt = []
-            last_txt.append(text_char)
+            last_txt = [txt[idx:end].translate(self._translation)]
             last_font = font
+            idx = end
         return last_font, last_txt, txt_list
 
 
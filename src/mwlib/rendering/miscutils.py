@@ -36,16 +36,15 @@ def text_before_infobox(
     node: advtree.Node, infobox: advtree.Node,
     txt_list: list[tuple[int, bool]] = None
 ) -> int:
-    if not txt_list:
-        txt_list = []
-    txt_list.append((text_in_node(node), node == infobox))
-    for child in node:
-        text_before_infobox(child, infobox, txt_list)
     sum_txt = 0
-    for len_txt, is_infobox in txt_list:
+    for len_txt, is_infobox in txt_list or ():
         sum_txt += len_txt
         if is_infobox:
             return sum_txt
+    for child in node.allchildren():
+        sum_txt += text_in_node(child)
+        if child == infobox:
+            break
     return sum_txt
 
 
@@ -4,6 +4,7 @@
 # See README.rst for additional licensing information.
 
 import logging
+from collections import Counter
 from collections.abc import Callable
 from typing import Optional
 
@@ -16,6 +17,51 @@ class WriterError(RuntimeError):
     pass
 
 
+_handler_tables = {}
+
+
+class NodeDispatcher:
+    """find the handler methods of a writer for the nodes of a tree
+
+    The handler of a node is the writer method named prefix followed by
+    the name of the node's class. The lookups are done once per node class
+    and writer class; the resulting table is shared by all writers of that
+    class. With fallback set, node classes without a handler use the
+    handler of the nearest base class in their MRO. counts holds the
+    number of lookups per node class.
+    """
+
+    def __init__(self, writer, prefix, fallback=False):
+        self.writer_class = writer.__class__
+        self.prefix = prefix
+        self.fallback = fallback
+        key = (self.writer_class, prefix, fallback)
+        self.table = _handler_tables.setdefault(key, {})
+        self.counts = Counter()
+
+    def _find_handler(self, node_class):
+        classes = node_class.__mro__ if self.fallback else (node_class,)
+        for klass in classes:
+            handler = getattr(self.writer_class, self.prefix + klass.__name__, None)
+            if handler is not None:
+                return handler
+        return None
+
+    def get_handler(self, node):
+        """return the unbound handler method for node or None"""
+        node_class = node.__class__
+        self.counts[node_class] += 1
+        try:
+            return self.table[node_class]
+        except KeyError:
+            handler = self.table[node_class] = self._find_handler(node_class)
+            return handler
+
+    def get_stats(self):
+        """return (node class name, count) tuples, most frequent first"""
+        return [(klass.__name__, count) for klass, count in self.counts.most_common()]
+
+
 def handle_chapter(item, book):
     chapter = parser.Chapter(item.title.strip())
     book.append_child(chapter)
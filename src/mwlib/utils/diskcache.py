@@ -0,0 +1,254 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.md for additional licensing information.
+
+"""size bounded cache of pickled values stored on the local filesystem
+
+The cache is content addressed: callers pass hexdigest keys. Entries are
+written atomically (tempfile + rename), so several processes on the same
+host can share one cache directory without any locking.
+
+The total size of the entries is kept in the file "size" in the cache
+directory. Each process adds the size of the entries it wrote every
+purge_interval writes and purges the cache when the total exceeds
+maxsize. Updates of concurrent processes may get lost, so the size is
+approximate. Purging scans the whole cache and writes the exact size.
+"""
+
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+
+log = logging.getLogger(__name__)
+
+
+class DiskCache:
+    suffix = ".pickle"
+    file_suffix = ".data"
+
+    def __init__(self, path, maxsize=256 * 1024 * 1024, purge_interval=200):
+        self.path = os.path.abspath(path)
+        self.maxsize = maxsize
+        self.purge_interval = purge_interval
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.unaccounted = 0  # size of the entries written since the last update of "size"
+        os.makedirs(self.path, exist_ok=True)
+
+    def dumps(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+    def _get_path(self, key, suffix=None):
+        return os.path.join(self.path, key[:2], key + (suffix or self.suffix))
+
+    def get(self, key, default=None):
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                value = self.loads(cache_file.read())
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except Exception as exc:
+            log.warning(f"removing unreadable cache entry {path}: {exc}")
+            self._remove(path)
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._get_path(key)
+        try:
+            data = self.dumps(value)
+        except Exception as exc:
+            log.warning(f"could not pickle cache entry {key}: {exc}")
+            return
+
+        dirname = os.path.dirname(path)
+        try:
+            os.makedirs(dirname, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            log.warning(f"could not write cache entry {path}: {exc}")
+            return
+
+        self._written(len(data))
+
+    def get_file(self, key, path):
+        """write the file stored under key to path. return False if there
+        is none
+        """
+        cache_path = self._get_path(key, self.file_suffix)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            _link_or_copy(cache_path, tmp_path)
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        except OSError as exc:
+            log.warning(f"could not read cache entry {cache_path}: {exc}")
+            self._remove(tmp_path)
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return True
+
+    def set_file(self, key, path):
+        """store the file path under key. the cache shares it by a hard link
+        if possible, it must not be changed in place afterwards.
+        """
+        cache_path = self._get_path(key, self.file_suffix)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            _link_or_copy(path, tmp_path)
+            os.replace(tmp_path, cache_path)
+            size = os.stat(cache_path).st_size
+        except OSError as exc:
+            log.warning(f"could not write cache entry {cache_path}: {exc}")
+            self._remove(tmp_path)
+            return
+
+        self._written(size)
+
+    def _written(self, size):
+        self.writes += 1
+        self.unaccounted += size
+        if self.purge_interval and self.writes % self.purge_interval == 0:
+            self._update_size()
+
+    def _get_size_path(self):
+        return os.path.join(self.path, "size")
+
+    def _read_size(self):
+        try:
+            with open(self._get_size_path()) as size_file:
+                return int(size_file.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_size(self, size):
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "w") as tmp_file:
+                tmp_file.write(str(size))
+            os.replace(tmp_path, self._get_size_path())
+        except OSError as exc:
+            log.warning(f"could not write the size of {self.path}: {exc}")
+
+    def _update_size(self):
+        """add the size of the entries written by this process to the size
+        of the cache and purge it if it has grown too big
+        """
+        size = self._read_size()
+        if size is None or size + self.unaccounted > self.maxsize:
+            self.purge()
+            return
+        self._write_size(size + self.unaccounted)
+        self.unaccounted = 0
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __contains__(self, key):
+        return os.path.exists(self._get_path(key))
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return False
+        return True
+
+    def _list_entries(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.path):
+            if dirpath == self.path:
+                continue  # the entries are stored in subdirectories
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._list_entries())
+
+    def purge(self, maxsize=None):
+        """remove least recently used entries until the total size of the
+        cache is below 90% of maxsize.
+        """
+        if maxsize is None:
+            maxsize = self.maxsize
+        entries = self._list_entries()
+        total = sum(size for _, size, _ in entries)
+        self.unaccounted = 0
+        if total <= maxsize:
+            self._write_size(total)
+            return 0
+
+        entries.sort()
+        target = int(maxsize * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                removed += 1
+        self._write_size(total)
+        self.evictions += removed
+        log.info(f"purged {removed} entries from {self.path}")
+        return removed
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # another filesystem or no hard links
+        shutil.copyfile(src, dst)
+
+
+_missing = object()
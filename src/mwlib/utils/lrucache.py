@@ -2,9 +2,12 @@
 # see http://code.activestate.com/recipes/498245/
 
 
+import sys
 import threading
 from collections import deque
 
+from mwlib.utils import conf
+
 
 class LRUCache:
     def __init__(self, maxsize):
@@ -30,6 +33,34 @@ class LRUCache:
         self.cache[key] = value
         self._record_key(key)
 
+    def __contains__(self, key):
+        return key in self.cache
+
+    def __len__(self):
+        return len(self.cache)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def clear(self):
+        self.cache.clear()
+        self.queue.clear()
+        self.refcount.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.cache),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory": _sizeof(self.cache),
+        }
+
     def _record_key(self, key):
         # localize variable access (ugly but fast)
         queue = self.queue
@@ -80,3 +111,57 @@ class MTLRUCache(LRUCache):
             LRUCache.__setitem__(self, key, val)
         finally:
             self.lock.release()
+
+    def clear(self):
+        with self.lock:
+            LRUCache.clear(self)
+
+    def stats(self):
+        with self.lock:
+            return LRUCache.stats(self)
+
+
+def _sizeof(obj):
+    """return an estimate of the memory used by obj and the containers,
+    strings and numbers it references
+    """
+    seen = set()
+    size = 0
+    todo = [obj]
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            todo.extend(obj.keys())
+            todo.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            todo.extend(obj)
+    return size
+
+
+# named caches of long running processes. their capacity can be set in
+# the [caches] section of the configuration.
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(name, maxsize):
+    """return the thread safe LRU cache registered as name, creating it
+    with a capacity of maxsize entries unless configured otherwise
+    """
+    with _registry_lock:
+        cache = _registry.get(name)
+        if cache is None:
+            maxsize = conf.get("caches", name, maxsize, int)
+            cache = _registry[name] = MTLRUCache(maxsize)
+        return cache
+
+
+def stats():
+    """return the statistics of all registered caches by name"""
+    with _registry_lock:
+        caches = list(_registry.items())
+    return {name: cache.stats() for name, cache in caches}
@@ -2,12 +2,28 @@
 # Copyright (c) 2007-2009 PediaPress GmbH
 # See README.rst for additional licensing information.
 
+import atexit
 import logging
 import os
 import sys
 
 from qs import rpcclient
 
+from mwlib.utils import conf
+
+try:
+    from gevent.monkey import get_original
+except ImportError:
+    from _thread import allocate_lock, start_new_thread
+    from time import monotonic
+else:
+    # publish from a real thread even if gevent monkey patched the
+    # process: greenlets don't run while a writer lays out a book
+    allocate_lock, start_new_thread = get_original(
+        "_thread", ["allocate_lock", "start_new_thread"]
+    )
+    monotonic = get_original("time", "monotonic")
+
 try:
     import simplejson as json
 except ImportError:
@@ -16,9 +32,199 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# statuses after which no more updates are expected. they are published
+# immediately.
+FINAL_STATUSES = ("finished", "error")
+
+
+class StatusPublisher:
+    """publish status updates to a sink from a background thread
+
+    Updates are coalesced: the sink gets the latest status, at most once
+    every interval seconds. A slow sink only delays the background thread.
+    The sink is only called from that thread, flush waits for it: a sink
+    may keep a connection, which gevent binds to the thread creating it.
+    """
+
+    def __init__(self, sink, interval):
+        self.sink = sink
+        self.interval = interval
+        self._lock = allocate_lock()  # protects the attributes below
+        self._send_lock = allocate_lock()  # serializes calls to sink without thread
+        self._wakeup = allocate_lock()  # released to wake the background thread
+        self._wakeup.acquire()
+        self._pending = None
+        self._waiters = []  # locks of flush calls, released after sending
+        self._running = False
+        self._closed = False
+        self._last_sent = None
+
+    def publish(self, status):
+        with self._lock:
+            self._pending = dict(status)
+        if self.interval <= 0:
+            self.flush()
+        else:
+            self._wake()
+
+    def flush(self):
+        """send the pending status before returning"""
+        done = allocate_lock()
+        done.acquire()
+        with self._lock:
+            threaded = self.interval > 0 and not self._closed
+            if threaded:
+                if self._pending is None and not self._running:
+                    return
+                self._waiters.append(done)
+        if threaded:
+            self._wake()
+            done.acquire()
+            return
+        with self._send_lock:
+            with self._lock:
+                status, self._pending = self._pending, None
+            if status is not None:
+                self._send(status)
+
+    def close(self):
+        """flush and stop the background thread"""
+        self.flush()
+        with self._lock:
+            self._closed = True
+        self._wake()
+
+    def _wake(self):
+        with self._lock:
+            if not self._running and not self._closed:
+                self._running = True
+                start_new_thread(self._run, ())
+            if self._wakeup.locked():
+                self._wakeup.release()
+
+    def _run(self):
+        closed = False
+        while not closed:
+            self._wakeup.acquire()
+            while True:
+                with self._lock:
+                    closed = self._closed
+                    flushing = bool(self._waiters)
+                delay = 0
+                if not (closed or flushing) and self._last_sent is not None:
+                    delay = self._last_sent + self.interval - monotonic()
+                if delay <= 0:
+                    break
+                # flush wakes the thread before the interval is over
+                self._wakeup.acquire(timeout=delay)
+            with self._lock:
+                status, self._pending = self._pending, None
+                waiters, self._waiters = self._waiters, []
+                if closed:
+                    self._running = False
+            if status is not None:
+                self._send(status)
+            for waiter in waiters:
+                waiter.release()
+
+    def _send(self, status):
+        self._last_sent = monotonic()
+        try:
+            self.sink(status)
+        except Exception as exc:
+            log.error(f"could not publish status to {self.sink!r}: {exc}")
+
+
+class FileSink:
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __repr__(self):
+        return f"<FileSink {self.filename!r}>"
+
+    def __call__(self, status):
+        try:
+            with open(self.filename + '.tmp', 'w') as tmp_file:
+                tmp_file.write(json.dumps(status))
+            os.rename(self.filename + '.tmp', self.filename)
+        except FileNotFoundError:
+            log.info(f'Could not write status file {self.filename!r}: {json.dumps(status)}')
+
+
+class QserveSink:
+    def __init__(self, url):
+        file_name = url[len("qserve://"):]
+        host, jobid = file_name.split("/")
+        try:
+            self.jobid = int(jobid)
+        except ValueError:
+            self.jobid = jobid.strip('"')
+
+        if ":" in host:
+            host, port = host.split(":")
+            port = int(port)
+        else:
+            port = 14311
+        self.host = host
+        self.port = port
+        self.qproxy = None
+
+    def __repr__(self):
+        return f"<QserveSink {self.host}:{self.port}/{self.jobid}>"
+
+    def __call__(self, status):
+        if self.qproxy is None:
+            self.qproxy = rpcclient.ServerProxy(host=self.host, port=self.port)
+        self.qproxy.qsetinfo(jobid=self.jobid, info=status)
+
+
+class PODSink:
+    def __init__(self, podclient):
+        self.podclient = podclient
+
+    def __repr__(self):
+        return f"<PODSink {self.podclient.posturl!r}>"
+
+    def __call__(self, status):
+        self.podclient.post_status(
+            **{k: v for k, v in status.items() if k in ("status", "progress", "article", "error")}
+        )
+
+
+# all Status objects writing to the same sink share its publisher
+_publishers = {}
+
+
+def get_publisher(key, make_sink, interval=None):
+    """return the StatusPublisher for the sink identified by key"""
+    try:
+        return _publishers[key]
+    except KeyError:
+        pass
+    if interval is None:
+        interval = conf.get("status", "publish_interval", 1.0, float)
+    publisher = _publishers[key] = StatusPublisher(make_sink(), interval)
+    return publisher
+
+
+def close_publisher(key):
+    """flush the publisher for key and forget about it"""
+    publisher = _publishers.pop(key, None)
+    if publisher is not None:
+        publisher.close()
+
+
+def flush_all():
+    for publisher in list(_publishers.values()):
+        publisher.flush()
+
+
+atexit.register(flush_all)
+# the publisher threads don't survive a fork
+os.register_at_fork(after_in_child=_publishers.clear)
+
 
 class Status:
-    qproxy = None
     stdout = sys.stdout
 
     def __init__(self,
@@ -26,6 +232,7 @@ class Status:
                  podclient=None,
                  progress_range=(0, 100),
                  status=None,
+                 interval=None,
                  ):
         self.filename = filename
         self.podclient = podclient
@@ -34,12 +241,32 @@ class Status:
         else:
             self.status = {}
         self.progress_range = progress_range
-        self.jobid = None
+        self.interval = interval
 
     def get_sub_range(self, start, end):
         progress_range = (self.scale_progress(start), self.scale_progress(end))
         return Status(filename=self.filename, podclient=self.podclient,
-                      status=self.status, progress_range=progress_range)
+                      status=self.status, progress_range=progress_range,
+                      interval=self.interval)
+
+    def _get_sink_keys(self):
+        keys = []
+        if self.podclient is not None:
+            # the publisher keeps the podclient alive, so its id is not reused
+            keys.append(("pod", id(self.podclient)))
+        if self.filename:
+            keys.append(("file", self.filename))
+        return keys
+
+    def _make_sink(self, key):
+        if key[0] == "pod":
+            return PODSink(self.podclient)
+        if self.filename.startswith("qserve://"):
+            return QserveSink(self.filename)
+        return FileSink(self.filename)
+
+    def _publish(self, key):
+        get_publisher(key, lambda: self._make_sink(key), self.interval).publish(self.status)
 
     def scale_progress(self, progress):
         return (
@@ -69,7 +296,7 @@ class Status:
         self._update_status_with_progress_and_article(progress, article)
 
         if self.podclient is not None:
-            self.podclient.post_status(**self.status)
+            self._publish(("pod", id(self.podclient)))
 
         msg = []
         progress = self.status.get("progress", self.progress_range[0])
@@ -91,37 +318,15 @@ class Status:
         if auto_dump:
             self.dump()
 
+        if self.status.get("status") in FINAL_STATUSES:
+            self.close()
+
     def dump(self):
         if not self.filename:
             return
+        self._publish(("file", self.filename))
 
-        if not self.qproxy and self.filename.startswith("qserve://"):
-            file_name = self.filename[len("qserve://"):]
-            host, jobid = file_name.split("/")
-            try:
-                jobid = int(jobid)
-            except ValueError:
-                jobid = jobid.strip('"')
-
-            if ":" in host:
-                host, port = host.split(":")
-                port = int(port)
-            else:
-                port = 14311
-
-            self.qproxy = rpcclient.ServerProxy(host=host, port=port)
-            self.jobid = jobid
-
-        if self.qproxy:
-            self.qproxy.qsetinfo(jobid=self.jobid, info=self.status)
-            return
-
-        try:
-            with open(self.filename + '.tmp', 'w') as tmp_file:
-                tmp_file.write(json.dumps(self.status))
-            os.rename(self.filename + '.tmp', self.filename)
-        except FileNotFoundError as exc:
-            log.info(f'Could not write status file {self.filename!r}: {json.dumps(self.status)}')
-        except Exception as exc:
-            log.error(f'Unknown exception {self.filename!r}: {exc}')
-            raise
+    def close(self):
+        """publish pending updates to all sinks before returning"""
+        for key in self._get_sink_keys():
+            close_publisher(key)
@@ -5,6 +5,8 @@
 import os
 import re
 
+uniq_rex = re.compile("\x7fUNIQ-[a-z0-9]+-\\d+-[a-f0-9]+-QINU\x7f")
+
 
 class Uniquifier:
     random_string = None
@@ -33,8 +35,7 @@ class Uniquifier:
         return replacement_data["complete"]
 
     def replace_uniq(self, txt):
-        compiled_regex = re.compile("\x7fUNIQ-[a-z0-9]+-\\d+-[a-f0-9]+-QINU\x7f")
-        txt = compiled_regex.sub(self._repl_from_uniq, txt)
+        txt = uniq_rex.sub(self._repl_from_uniq, txt)
         return txt
 
     def _repl_to_uniq(self, matched_pattern):
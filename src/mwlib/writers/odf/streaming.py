@@ -0,0 +1,135 @@
+# Copyright (c) 2008-2009, PediaPress GmbH
+# See README.rst for additional licensing information.
+
+"""save OpenDocument text documents without keeping the whole body in memory
+
+odfpy can only serialize a complete element tree, which for large books
+needs several gigabytes. A ContentStream serializes the elements written
+to the office:text element of a document to a temporary file whenever
+flush is called and removes them from the tree. save writes the package
+in the same layout as odfpy's OpenDocument.save: the content is copied
+into content.xml after the automatic styles used by the flushed elements.
+"""
+
+import io
+import shutil
+import tempfile
+import time
+import zipfile
+
+from odf import manifest
+from odf.namespaces import STYLENS
+from odf.office import AutomaticStyles, DocumentContent
+from odf.opendocument import IS_FILENAME
+
+XML_PROLOGUE = "<?xml version='1.0' encoding='UTF-8'?>\n"
+UNIXPERMS = 0o100644 << 16
+
+
+class ContentStream:
+    def __init__(self, doc):
+        self.doc = doc
+        self.stylenames = []
+        # odfpy's element cache references every element of the document.
+        # it is reset to its initial state after each flush
+        self.element_dict = {qname: list(elts) for qname, elts in doc.element_dict.items()}
+        self.body_file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        doc.body.write_open_tag(1, self.body_file)
+        doc.text.write_open_tag(2, self.body_file)
+
+    def flush(self):
+        """serialize the children of the document's office:text element
+        and remove them from the document
+        """
+        doc = self.doc
+        children = doc.text.childNodes
+        if not children:
+            return
+        self.stylenames = doc._parseoneelement(doc.text, self.stylenames)
+        for child in children:
+            child.toXml(3, self.body_file)
+            child.parentNode = None
+        doc.text.childNodes = []
+        doc.element_dict = {qname: list(elts) for qname, elts in self.element_dict.items()}
+
+    def _get_auto_styles(self):
+        doc = self.doc
+        stylenames = self.stylenames
+        for top in (doc.styles, doc.automaticstyles):
+            stylenames = doc._parseoneelement(top, stylenames)
+        return [
+            style
+            for style in doc.automaticstyles.childNodes
+            if style.getAttrNS(STYLENS, "name") in stylenames
+        ]
+
+    def _write_content(self, content_file):
+        doc = self.doc
+        content_file.write(XML_PROLOGUE)
+        document_content = DocumentContent()
+        document_content.write_open_tag(0, content_file)
+        if doc.scripts.hasChildNodes():
+            doc.scripts.toXml(1, content_file)
+        if doc.fontfacedecls.hasChildNodes():
+            doc.fontfacedecls.toXml(1, content_file)
+        auto_styles = AutomaticStyles()
+        stylelist = self._get_auto_styles()
+        if stylelist:
+            auto_styles.write_open_tag(1, content_file)
+            for style in stylelist:
+                style.toXml(2, content_file)
+            auto_styles.write_close_tag(1, content_file)
+        else:
+            auto_styles.toXml(1, content_file)
+        self.body_file.seek(0)
+        shutil.copyfileobj(self.body_file, content_file)
+        doc.text.write_close_tag(2, content_file)
+        doc.body.write_close_tag(1, content_file)
+        document_content.write_close_tag(0, content_file)
+
+    def save(self, output):
+        """flush the remaining elements and write the document to the file
+        output
+        """
+        self.flush()
+        doc = self.doc
+        now = time.localtime()[:6]
+        manifest_root = manifest.Manifest()
+        manifest_root.addElement(manifest.FileEntry(fullpath="/", mediatype=doc.mimetype))
+
+        def get_info(name, compress_type=zipfile.ZIP_DEFLATED, mediatype="text/xml"):
+            if mediatype is not None:
+                manifest_root.addElement(manifest.FileEntry(fullpath=name, mediatype=mediatype))
+            info = zipfile.ZipInfo(name, now)
+            info.compress_type = compress_type
+            info.external_attr = UNIXPERMS
+            return info
+
+        with zipfile.ZipFile(output, "w") as package:
+            package.writestr(
+                get_info("mimetype", zipfile.ZIP_STORED, None), doc.mimetype.encode("utf-8")
+            )
+            package.writestr(get_info("styles.xml"), doc.stylesxml().encode("utf-8"))
+            raw_file = package.open(get_info("content.xml"), "w")
+            with io.TextIOWrapper(raw_file, encoding="utf-8") as content_file:
+                self._write_content(content_file)
+            if doc.settings.hasChildNodes():
+                package.writestr(get_info("settings.xml"), doc.settingsxml().encode("utf-8"))
+            package.writestr(get_info("meta.xml"), doc.metaxml().encode("utf-8"))
+
+            for arcname, (what_it_is, fileobj, mediatype) in doc.Pictures.items():
+                info = get_info(arcname, zipfile.ZIP_STORED, mediatype)
+                if what_it_is == IS_FILENAME:
+                    with open(fileobj, "rb") as picture, package.open(info, "w") as dest:
+                        shutil.copyfileobj(picture, dest)
+                else:
+                    package.writestr(info, fileobj)
+
+            manifest_file = io.StringIO()
+            manifest_file.write(XML_PROLOGUE)
+            manifest_root.toXml(0, manifest_file)
+            package.writestr(
+                get_info("META-INF/manifest.xml", mediatype=None),
+                manifest_file.getvalue().encode("utf-8"),
+            )
+        self.body_file.close()
@@ -28,6 +28,7 @@ from mwlib.rendering import writerbase
 from mwlib.rendering.mathutils import render_math
 from mwlib.writers.odf import odfconf
 from mwlib.writers.odf import odfstyles as style
+from mwlib.writers.odf.streaming import ContentStream
 
 log = logging.getLogger("odfwriter")
 
@@ -156,6 +157,7 @@ class ODFWriter:
         self.text = self.doc.text
         self.named_link_count = 0
         self.conf = odfconf.OdfConf
+        self.dispatcher = writerbase.NodeDispatcher(self, "owrite")
 
         if creator:
             self.doc.meta.addElement(meta.InitialCreator(text=creator))
@@ -171,15 +173,20 @@ class ODFWriter:
     def writeBook(self, book, output):
         """
         bookParseTree must be advtree and sent through preprocess()
+
+        the elements of each article are serialized to a temporary file
+        and discarded as soon as the article is written. getDoc() does not
+        return the book's content afterwards.
         """
 
         if self.env and self.env.metabook:
             self.doc.meta.addElement(dc.Title(text=self.env.metabook.get("title", "")))
 
+        content = ContentStream(self.doc)
         for child in book.children:
             self.write(child, self.doc.text)
-        doc = self.getDoc()
-        doc.save(output, addsuffix=False)
+            content.flush()
+        content.save(output)
         log.info(f"writing to {output}")
 
     def getDoc(self, _=""):
@@ -246,11 +253,10 @@ class ODFWriter:
     def _handle_object_and_determine_child_processing(self, obj, parent):
         should_return = False
         # check for method
-        method_name = "owrite" + obj.__class__.__name__
-        method_name = getattr(self, method_name, None)
+        method = self.dispatcher.get_handler(obj)
 
-        if method_name:  # find handler
-            handler = method_name(obj)
+        if method:  # find handler
+            handler = method(self, obj)
 
         elif self.ignoreUnknownNodes:
             log.info("Handler for node %s not found! SKIPPED" % obj.__class__.__name__)
@@ -276,19 +282,24 @@ class ODFWriter:
         if parent is None:
             raise ValueError("parent is None")
 
-        while hasattr(parent, "writeto"):
-            parent = parent.writeto  # SPECIAL HANDLING
+        # the tree is walked with an explicit stack: deeply nested tables
+        # would exceed the recursion limit otherwise
+        stack = [(obj, parent)]
+        while stack:
+            obj, parent = stack.pop()
+            while hasattr(parent, "writeto"):
+                parent = parent.writeto  # SPECIAL HANDLING
+
+            # if its text, append to last node
+            if isinstance(obj, parser.Text):
+                self.writeText(obj, parent)
+                continue
 
-        # if its text, append to last node
-        if isinstance(obj, parser.Text):
-            self.writeText(obj, parent)
-        else:
             handler, should_return = self._handle_object_and_determine_child_processing(obj, parent)
             if should_return:
-                return
+                continue
 
-            for child in obj.children[:]:
-                self.write(child, handler)
+            stack.extend((child, handler) for child in reversed(obj.children))
 
     def writeChildren(self, obj, parent):  # use this to avoid bugs!
         "writes only the children of a node"
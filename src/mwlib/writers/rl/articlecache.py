@@ -0,0 +1,76 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.md for additional licensing information.
+
+"""cache of built articles for the ReportLab writer
+
+Building an article (parsing, building the advanced tree and cleaning it)
+is the most expensive part of laying out a book. Built articles are pickled
+to a DiskCache keyed by article revision and the writer options that change
+the built tree. The articles can then be built by a pool of forked worker
+processes, and the fail safe rendering pass does not build them again.
+"""
+
+import logging
+import multiprocessing
+import sys
+from hashlib import sha256 as digest
+
+from mwlib.utils.diskcache import DiskCache
+
+log = logging.getLogger(__name__)
+
+# bump this whenever buildArticle changes the built tree
+CACHE_VERSION = 1
+
+
+class ArticleCache(DiskCache):
+    def __init__(self, path, options=()):
+        DiskCache.__init__(self, path, maxsize=sys.maxsize, purge_interval=0)
+        self.options = repr(options)
+
+    def get_key(self, item):
+        hasher = digest()
+        hasher.update(f"{CACHE_VERSION}:{self.options}:".encode())
+        ident = (item.wikiident, item.title, item.revision, item.displaytitle)
+        hasher.update(repr(ident).encode("utf-8"))
+        return hasher.hexdigest()
+
+
+_build_state = None
+
+
+def _build_article(idx):
+    rl_writer, items = _build_state
+    item = items[idx]
+    try:
+        art = rl_writer.buildArticle(item)
+    except Exception as exc:
+        # the article is built again in the main process, which
+        # reports the error
+        log.error(f"building {item.title!r} failed: {exc!r}")
+        return idx
+    if art is not None:
+        cache = rl_writer.article_cache
+        cache.set(cache.get_key(item), art)
+    return idx
+
+
+def prebuild_articles(rl_writer, items, workers):
+    """build the articles in items in a pool of forked worker processes
+    and store them in rl_writer.article_cache. the workers share the
+    writer of the parent process, the nuwiki databases open a connection
+    of their own in each worker.
+    """
+    global _build_state
+    cache = rl_writer.article_cache
+    todo = [item for item in items if cache.get_key(item) not in cache]
+    if not todo:
+        return
+    log.info(f"building {len(todo)} articles in {workers} processes")
+    _build_state = (rl_writer, todo)
+    try:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            for _ in pool.imap_unordered(_build_article, range(len(todo))):
+                pass
+    finally:
+        _build_state = None
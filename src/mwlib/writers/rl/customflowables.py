@@ -423,6 +423,19 @@ class TocEntry(Flowable):
         pass
 
 
+class ArticleMarker(Flowable):
+    """Invisible flowable placed in front of the flowables of an article.
+    Lets the doc template tell which article was laid out when
+    rendering failed. article_idx is None outside of articles."""
+
+    def __init__(self, article_idx):
+        Flowable.__init__(self)
+        self.article_idx = article_idx
+
+    def draw(self):
+        pass
+
+
 class DummyTable(Flowable):
     def __init__(self, min_widths, max_widths):
         self.min_widths = min_widths
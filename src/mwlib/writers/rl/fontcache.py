@@ -0,0 +1,123 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.md for additional licensing information.
+
+"""cache of parsed TrueType font metrics shared by all processes on a host
+
+Registering a TrueType font with reportlab parses the whole font file to
+extract glyph widths and the tables needed for subsetting, which takes a
+noticeable time for large CJK fonts. The parsed metrics only depend on
+the content of the font file, so they are stored in a DiskCache keyed by
+its hash. Only the raw font data, which is needed to embed subsets into
+the PDF, is read from the font file again. The cache is disabled by
+default. Enable it in the [rl] section of the configuration, e.g.::
+
+    [rl]
+    font_cache_dir = /var/cache/mwlib/fonts
+"""
+
+import copy
+import logging
+import weakref
+from hashlib import sha256 as digest
+
+import reportlab
+from reportlab import rl_config
+from reportlab.pdfbase.ttfonts import TTEncoding, TTFont
+
+from mwlib.utils import conf
+from mwlib.utils.diskcache import DiskCache
+
+log = logging.getLogger(__name__)
+
+# bump this whenever the cached attributes change
+CACHE_VERSION = 1
+
+
+def _get_pdf_scale(units_per_em):
+    if units_per_em == 1000:
+        return lambda x: x
+    mult = 1000 / units_per_em
+    return lambda x: x * mult
+
+
+class FontCache(DiskCache):
+    suffix = ".font"
+
+    def __init__(self, path, maxsize=256 * 1024 * 1024):
+        DiskCache.__init__(self, path, maxsize=maxsize)
+
+    def get_key(self, data):
+        hasher = digest()
+        hasher.update(f"{CACHE_VERSION}:{reportlab.Version}:".encode())
+        hasher.update(data)
+        return hasher.hexdigest()
+
+    def dump_font(self, font):
+        """return the picklable state of the TTFont font without its raw
+        font data
+        """
+        face = copy.copy(font.face)
+        del face._ttf_data
+        del face._pdfScale
+        state = dict(font.__dict__, face=face)
+        del state["state"]
+        return state
+
+    def load_font(self, name, state, data):
+        font = TTFont.__new__(TTFont)
+        font.__dict__.update(state)
+        font.fontName = name
+        font.encoding = TTEncoding()
+        font.state = weakref.WeakKeyDictionary()
+        font._asciiReadable = rl_config.ttfAsciiReadable
+        face = font.face
+        face._ttf_data = data
+        face._pdfScale = _get_pdf_scale(face.unitsPerEm)
+        return font
+
+    def get_font(self, name, path):
+        """return a TTFont for the font file at path, parsing it only if its
+        metrics are not cached
+        """
+        with open(path, "rb") as font_file:
+            data = font_file.read()
+        key = self.get_key(data)
+        state = self.get(key)
+        if state is not None:
+            return self.load_font(name, state, data)
+        font = TTFont(name, path)
+        try:
+            self.set(key, self.dump_font(font))
+        except Exception as exc:
+            log.warning(f"could not cache metrics of {path}: {exc}")
+        return font
+
+
+_font_cache = None
+_configured = False
+
+
+def get_font_cache():
+    """return the host wide FontCache or None if it is not configured"""
+    global _font_cache, _configured
+    if not _configured:
+        _configured = True
+        path = conf.get("rl", "font_cache_dir", None)
+        if path:
+            maxsize = conf.get("rl", "font_cache_size", 256 * 1024 * 1024, int)
+            _font_cache = FontCache(path, maxsize=maxsize)
+    return _font_cache
+
+
+def set_font_cache(cache):
+    global _font_cache, _configured
+    _font_cache = cache
+    _configured = True
+
+
+def load_ttfont(name, path):
+    """return a TTFont named name for the font file at path"""
+    cache = get_font_cache()
+    if cache is None:
+        return TTFont(name, path)
+    return cache.get_font(name, path)
@@ -10,10 +10,10 @@ import re
 from reportlab.lib.fonts import addMapping
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-from reportlab.pdfbase.ttfonts import TTFont
 
 from mwlib import rendering
 from mwlib.rendering.fontswitcher import FontSwitcher
+from mwlib.writers.rl import fontcache
 
 font_paths = [os.path.dirname(rendering.__file__),
               os.path.expanduser("~/mwlibfonts/")]
@@ -255,6 +255,16 @@ try:
 except ImportError:
     pass
 
+# resolved font file paths and registered reportlab fonts are shared by
+# all RLFontSwitcher instances of a process
+_font_path_cache = {}
+_registered_fonts = {}
+
+
+def clear_font_path_cache():
+    """forget resolved font paths, e.g. after installing fonts"""
+    _font_path_cache.clear()
+
 
 class RLFontSwitcher(FontSwitcher):
     warn_on_missing_fonts = True
@@ -334,29 +344,51 @@ class RLFontSwitcher(FontSwitcher):
         )
 
     def get_abs_font_path(self, file_name):
+        key = (tuple(self.font_paths), file_name)
+        try:
+            return _font_path_cache[key]
+        except KeyError:
+            pass
+        res = None
         for base_dir in self.font_paths:
             full_path = os.path.join(base_dir, file_name)
             if os.path.exists(full_path):
-                return full_path
-        return None
+                res = full_path
+                break
+        _font_path_cache[key] = res
+        return res
+
+    def _register_font(self, name, ident, registered_names, make_font, *args):
+        # reportlab fonts are registered once per process. registered_names
+        # detects fonts dropped by a reset of reportlab's font registry
+        if _registered_fonts.get(name) == ident and name in registered_names:
+            return
+        pdfmetrics.registerFont(make_font(*args))
+        _registered_fonts[name] = ident
 
     def register_reportlab_fonts(self, font_list):
         font_variants = ["", "bold", "italic", "bolditalic"]
+        registered_names = set(pdfmetrics.getRegisteredFontNames())
         for font in font_list:
             if not font.get("name"):
                 continue
             if font.get("type") == "cid":
-                pdfmetrics.registerFont(UnicodeCIDFont(font["name"]))
+                self._register_font(
+                    font["name"], "cid", registered_names, UnicodeCIDFont, font["name"]
+                )
             else:
                 for i, font_variant in enumerate(font_variants):
                     if i == len(font.get("file_names")) or not self.font_installed(font):
                         break
                     full_font_name = font["name"] + font_variant
-                    pdfmetrics.registerFont(
-                        TTFont(
-                            full_font_name,
-                            self.get_abs_font_path(font.get("file_names")[i]),
-                        )
+                    path = self.get_abs_font_path(font.get("file_names")[i])
+                    self._register_font(
+                        full_font_name,
+                        path,
+                        registered_names,
+                        fontcache.load_ttfont,
+                        full_font_name,
+                        path,
                     )
                     italic = font_variant in ["italic", "bolditalic"]
                     bold = font_variant in ["bold", "bolditalic"]
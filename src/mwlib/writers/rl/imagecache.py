@@ -0,0 +1,86 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.md for additional licensing information.
+
+"""cache of converted and sanitized images shared by all processes on a host
+
+The ReportLab writer converts svg images to png and repairs images
+reportlab can't handle with ImageMagick. The results only depend on the
+content of the source image and the conversion, so they are stored in a
+DiskCache keyed by both. The cache is disabled by default. Enable it in
+the [rl] section of the configuration, e.g.::
+
+    [rl]
+    image_cache_dir = /var/cache/mwlib/images
+    image_cache_size = 1073741824
+
+Cached images are copied to the place where the writer expects them:
+reportlab reads the images when the book is rendered, which is long after
+another process might have purged the cache entry.
+"""
+
+import os
+import tempfile
+from hashlib import sha256 as digest
+
+from mwlib.utils import conf
+from mwlib.utils.diskcache import DiskCache
+
+# bump this whenever the conversions change
+CACHE_VERSION = 1
+
+
+class ImageCache(DiskCache):
+    suffix = ".img"
+
+    def dumps(self, value):
+        return value
+
+    def loads(self, data):
+        return data
+
+    def get_key(self, img_path, conversion):
+        hasher = digest()
+        hasher.update(f"{CACHE_VERSION}:{conversion}:".encode())
+        with open(img_path, "rb") as img_file:
+            for block in iter(lambda: img_file.read(64 * 1024), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def fetch(self, key, dest_path):
+        """write the cached image for key to dest_path. return False if
+        there is no such image.
+        """
+        data = self.get(key)
+        if data is None:
+            return False
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, dest_path)
+        return True
+
+    def store(self, key, img_path):
+        with open(img_path, "rb") as img_file:
+            self.set(key, img_file.read())
+
+
+_image_cache = None
+_configured = False
+
+
+def get_image_cache():
+    """return the host wide ImageCache or None if it is not configured"""
+    global _image_cache, _configured
+    if not _configured:
+        _configured = True
+        path = conf.get("rl", "image_cache_dir", None)
+        if path:
+            maxsize = conf.get("rl", "image_cache_size", 1024 * 1024 * 1024, int)
+            _image_cache = ImageCache(path, maxsize=maxsize)
+    return _image_cache
+
+
+def set_image_cache(cache):
+    global _image_cache, _configured
+    _image_cache = cache
+    _configured = True
@@ -0,0 +1,95 @@
+# Copyright (c) 2007-2009 PediaPress GmbH
+# See README.md for additional licensing information.
+
+"""width measurements of paragraphs for sizing table columns
+
+The maximum width of a table cell is the width of its paragraphs laid out
+without automatic line breaks. Getting it from reportlab requires
+breaking the paragraph into lines. Paragraphs consisting of a single plain
+text fragment which fits on one line are measured with stringWidth
+instead, and all measurements are memoized by text, style and width:
+data-heavy tables repeat the same cell contents over and over.
+"""
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus.paragraph import split
+
+from mwlib.utils import lrucache
+from mwlib.writers.rl import pdfstyles
+
+_cache = lrucache.get_cache("rl_paragraph_widths", 20000)
+
+
+def _get_style_key(style):
+    return (
+        style.fontName,
+        style.fontSize,
+        style.leftIndent,
+        style.rightIndent,
+        style.firstLineIndent,
+        style.wordWrap,
+        getattr(style, "splitLongWords", 1),
+        getattr(style, "hyphenationLang", ""),
+        getattr(style, "uriWasteReduce", 0),
+    )
+
+
+def get_plain_text_width(paragraph, avail_width):
+    """return the width of a paragraph consisting of a single plain text
+    fragment that fits on one line of avail_width. return None for all
+    other paragraphs.
+    """
+    style = paragraph.style
+    frags = paragraph.frags
+    if len(frags) != 1 or style.wordWrap == "CJK":
+        return None
+    frag = frags[0]
+    if getattr(frag, "cbDefn", None) is not None or getattr(frag, "lineBreak", False):
+        return None
+    if "\xad" in frag.text:  # reportlab drops soft hyphens when measuring
+        return None
+    words = split(frag.text)
+    if not words:
+        return None
+
+    font_name, font_size = frag.fontName, frag.fontSize
+    space_width = stringWidth(" ", font_name, font_size)
+    text_width = sum([stringWidth(word, font_name, font_size) for word in words])
+    text_width += (len(words) - 1) * space_width
+    indent = style.leftIndent + style.firstLineIndent + style.rightIndent
+    if text_width >= avail_width - indent:
+        return None
+    return text_width + indent
+
+
+def get_wrapped_width(paragraph, avail_width):
+    """wrap paragraph to avail_width and return the width of its longest
+    line if only explicit line breaks were used
+    """
+    paragraph.wrap(avail_width, pdfstyles.PRINT_HEIGHT)
+    kind = paragraph.blPara.kind
+    space_width = stringWidth(" ", paragraph.style.fontName, paragraph.style.fontSize)
+    total_width = 0
+    current_width = 0
+    for line in paragraph.blPara.lines:
+        extraspace = line[0] if kind == 0 else line.extraSpace
+        line_width = avail_width - extraspace
+        current_width += line_width
+        if getattr(line, "lineBreak", False):
+            total_width = max(total_width, current_width)
+            current_width = 0
+        else:
+            current_width += space_width
+    total_width = max(total_width, current_width)
+    return total_width - space_width
+
+
+def get_max_para_width(paragraph, avail_width):
+    key = (paragraph.text, _get_style_key(paragraph.style), avail_width)
+    width = _cache.get(key)
+    if width is None:
+        width = get_plain_text_width(paragraph, avail_width)
+        if width is None:
+            width = get_wrapped_width(paragraph, avail_width)
+        _cache[key] = width
+    return width
@@ -16,7 +16,7 @@ from reportlab.platypus.frames import Frame
 from reportlab.platypus.paragraph import Paragraph
 
 from mwlib.writers.rl import fontconfig, pdfstyles
-from mwlib.writers.rl.customflowables import TocEntry
+from mwlib.writers.rl.customflowables import ArticleMarker, TocEntry
 from mwlib.writers.rl.formatter import RLFormatter
 from mwlib.writers.rl.pdfstyles import (
     FOOTER_MARGIN_HOR,
@@ -248,6 +248,7 @@ class PPDocTemplate(BaseDocTemplate):
         self.toc_callback = toc_callback
         self.title = kwargs["title"]
         self.page = 0
+        self.current_article = None
 
     def progress_callback(self, typ, value):
         if typ == "SIZE_EST":
@@ -290,6 +291,9 @@ class PPDocTemplate(BaseDocTemplate):
         the text of H1, H2 and H3 elements. We broadcast a
         notification to the DocTemplate, which should inform
         the TOC and let it pull them out."""
+        if flowable.__class__ == ArticleMarker:
+            self.current_article = flowable.article_idx
+            return
         if not self.toc_callback:
             return
         if flowable.__class__ == TocEntry:
@@ -29,7 +29,6 @@ from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
 from reportlab.lib.units import cm
-from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus.doctemplate import (
     BaseDocTemplate,
     NextPageTemplate,
@@ -50,9 +49,11 @@ from mwlib.rendering.imageutils import ImageUtils
 from mwlib.rendering.licensechecker import LicenseChecker
 from mwlib.rendering.mathutils import render_math
 from mwlib.utils._version import version as mwlibversion
-from mwlib.writers.rl import fontconfig, pdfstyles, rltables
+from mwlib.writers.rl import fontconfig, measure, pdfstyles, rltables
 from mwlib.writers.rl._version import VERSION as rlwriterversion
+from mwlib.writers.rl.articlecache import ArticleCache, prebuild_articles
 from mwlib.writers.rl.customflowables import (
+    ArticleMarker,
     DummyTable,
     Figure,
     FiguresAndParagraphs,
@@ -61,6 +62,7 @@ from mwlib.writers.rl.customflowables import (
 )
 from mwlib.writers.rl.customnodetransformer import CustomNodeTransformer
 from mwlib.writers.rl.formatter import RLFormatter
+from mwlib.writers.rl.imagecache import get_image_cache
 from mwlib.writers.rl.pagetemplates import PPDocTemplate, TitlePage, WikiPage
 from mwlib.writers.rl.pdfstyles import (
     PRINT_HEIGHT,
@@ -106,6 +108,7 @@ class RlWriter:
         mathcache=None,
         lang=None,
         test_mode=False,
+        workers=None,
     ):
         localedir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "locale")
         translation = gettext.NullTranslations()
@@ -117,6 +120,7 @@ class RlWriter:
         translation.install()
 
         self.font_switcher = fontconfig.RLFontSwitcher()
+        self.dispatcher = writerbase.NodeDispatcher(self, "write")
 
         self.rtl = False
         pdfstyles.DEFAULT_LATIN_FONT = pdfstyles.DEFAULT_FONT
@@ -231,10 +235,20 @@ class RlWriter:
         self.link_list = []
         self.disable_group_elements = False
         self.fail_safe_rendering = False
+        self.failed_articles = set()
+        self.check_articles = False
 
         self.current_col_count = 0
         self.math_cache_dir = mathcache or os.environ.get("MWLIBRL_MATHCACHE")
         self.tmpdir = tempfile.mkdtemp()
+        self.workers = workers
+        if workers:
+            self.article_cache = ArticleCache(
+                os.path.join(self.tmpdir, "articles"),
+                options=(lang, strict, debug, self.rtl, pdfstyles.TREECLEANER_SKIP_METHODS),
+            )
+        else:
+            self.article_cache = None
         self.bookmarks = []
         self.colwidth = 0
 
@@ -360,16 +374,15 @@ class RlWriter:
         return None
 
     def write(self, obj):
-        method_name = "write" + obj.__class__.__name__
-        if not hasattr(self, method_name):
+        method = self.dispatcher.get_handler(obj)
+        if method is None:
             log.error("unknown node: %s", repr(obj.__class__.__name__))
             if self.strict:
                 raise writerbase.WriterError("Unkown Node: %s " % obj.__class__.__name__)
             return []
-        method = getattr(self, method_name)
         styles = self.formatter.set_style(obj)
         original = self.check_direction(obj)
-        res = method(obj)
+        res = method(self, obj)
         self.set_rtl(original)
         self.formatter.reset_style(styles)
         pb_before = self.handle_page_break(obj, "before")
@@ -432,6 +445,17 @@ class RlWriter:
             log.info("\n".join([repr(r) for r in self.tree_cleaner.get_reports()]))
         return art
 
+    def getArticle(self, item):
+        if self.article_cache is None:
+            return self.buildArticle(item)
+        key = self.article_cache.get_key(item)
+        art = self.article_cache.get(key)
+        if art is None:
+            art = self.buildArticle(item)
+            if art is not None:
+                self.article_cache.set(key, art)
+        return art
+
     def initReportlabDoc(self, output):
         version = self.getVersion()
         toc_callback = self.toc_callback if pdfstyles.RENDER_TOC else None
@@ -500,10 +524,16 @@ class RlWriter:
             elements.append(self.addDummyPage())
         got_chapter = False
         item_list = self.env.metabook.walk()
+        if self.workers and self.workers > 1:
+            prebuild_articles(
+                self, [item for item in item_list if item.type == "Article"], self.workers
+            )
         if not self.fail_safe_rendering:
             elements.append(TocEntry(txt=_("Articles"), lvl="group"))
+        article_idx = -1
         for i, item in enumerate(item_list):
             if item.type == "Chapter":
+                elements.append(ArticleMarker(None))
                 chapter = parser.Chapter(item.title.strip())
                 if len(item_list) > i + 1 and item_list[i + 1].type == "article":
                     chapter.next_article_title = item_list[i + 1].title
@@ -512,7 +542,8 @@ class RlWriter:
                 elements.extend(self.writeChapter(chapter))
                 got_chapter = True
             elif item.type == "Article":
-                art = self.buildArticle(item)
+                article_idx += 1
+                art = self.getArticle(item)
                 self.img_db = item.images
                 self.license_checker.image_db = self.img_db
                 if not art:
@@ -520,13 +551,16 @@ class RlWriter:
                 if got_chapter:
                     art.has_preceeding_chapter = True
                     got_chapter = False
-                if self.fail_safe_rendering and not self.articleRenderingOK(
-                    copy.deepcopy(art), output
+                if article_idx in self.failed_articles or (
+                    self.check_articles
+                    and not self.articleRenderingOK(copy.deepcopy(art), output)
                 ):
                     art.renderFailed = True
                 art_elements = self.writeArticle(art)
                 del art
+                elements.append(ArticleMarker(article_idx))
                 elements.extend(self.groupElements(art_elements))
+        elements.append(ArticleMarker(None))
 
         try:
             self.renderBook(elements, output)
@@ -539,7 +573,18 @@ class RlWriter:
         except Exception as err:
             traceback.print_exc()
             log.error("RENDERING FAILED: %r" % err)
-            if self.fail_safe_rendering:
+            failed = self.doc.current_article
+            if failed is not None and failed not in self.failed_articles:
+                # the article which broke the book is rendered as plain text.
+                # further broken articles are found by checking all of them
+                # in the next pass instead of one full render per article
+                log.error("article %d failed" % failed)
+                self.failed_articles.add(failed)
+                self.check_articles = True
+            elif not self.check_articles:
+                # the failure can't be attributed to an article: check all of them
+                self.check_articles = True
+            else:
                 log.error("GIVING UP")
                 shutil.rmtree(self.tmpdir, ignore_errors=True)
                 raise RuntimeError("Giving up.") from err
@@ -1570,14 +1615,14 @@ class RlWriter:
         return ["".join(txt)]  # FIXME use writelink to generate clickable-link
 
     def svg2png(self, img_path):
-        cmd = [
-            "magick",
-            img_path,
-            "-flatten",
-            "-coalesce",
-            "-strip",
-            img_path + ".png",
-        ]
+        options = ["-flatten", "-coalesce", "-strip"]
+        png_path = f"{img_path}.png"
+        image_cache = get_image_cache()
+        if image_cache is not None:
+            key = image_cache.get_key(img_path, repr(["svg2png"] + options))
+            if image_cache.fetch(key, png_path):
+                return png_path
+        cmd = ["magick", img_path] + options + [png_path]
         try:
             process = subprocess.Popen(cmd, shell=False)
             _, status = os.waitpid(process.pid, 0)
@@ -1587,10 +1632,12 @@ class RlWriter:
                     repr(cmd),
                 )
                 return ""
-            return f"{img_path}.png"
         except OSError:
             log.warning("img could not be converted. cmd failed: %s", repr(cmd))
             return ""
+        if image_cache is not None:
+            image_cache.store(key, png_path)
+        return png_path
 
     def getImgPath(self, target):
         log.info("getImgPath target: %s", target)
@@ -1628,13 +1675,23 @@ class RlWriter:
             except OSError:
                 log.warning(f"converting broken image failed (OSError): {img_path}")
                 raise
+        return 0
+
+    def _clean_transparent_pixels(self, img, img_path):
+        # set fully transparent pixels to white
+        luminance, alpha = img.split()
+        luminance.paste(255, mask=alpha.point(lambda value: 255 if value == 0 else 0))
+        PilImage.merge("LA", (luminance, alpha)).save(img_path)
 
     def _fix_broken_images(self, _, img_path):
         if img_path in self.fixed_images:
             return self.fixed_images[img_path]
         self.fixed_images[img_path] = -1
-        img_path = str(img_path, 'utf-8')
+        ret = self._fix_broken_image(str(img_path, "utf-8"))
+        self.fixed_images[img_path] = ret
+        return ret
 
+    def _fix_broken_image(self, img_path):
         try:
             img = PilImage.open(img_path)
         except OSError:
@@ -1643,6 +1700,14 @@ class RlWriter:
         if not isinstance(img.info.get("transparency", 0), int):
             log.warning("image contains invalid transparency info - skipping")
             return -1
+        interlaced = img.info.get("interlace", 0) == 1
+        if not interlaced and img.mode not in ("P", "LA", "RGBA"):
+            return 0
+        image_cache = get_image_cache()
+        if image_cache is not None:
+            key = image_cache.get_key(img_path, "fix_broken_images")
+            if image_cache.fetch(key, img_path):
+                return 0
         cmds = []
         base_cmd = [
             "magick",
@@ -1659,22 +1724,14 @@ class RlWriter:
             "area",
             "64000000",
         ]
-        if img.info.get("interlace", 0) == 1:
+        if interlaced:
             cmds.append(base_cmd + [img_path, "-interlace", "none", img_path])
         if img.mode == "P":  # ticket 324
             cmds.append(
                 base_cmd + [img_path, img_path]
             )  # we esentially do nothing...but this seems to fix the problems
         if img.mode == "LA":  # ticket 429
-            cleaned = PilImage.new("LA", img.size)
-            new_data = []
-            for pixel in img.getdata():
-                if pixel[1] == 0:
-                    new_data.append((255, 0))
-                else:
-                    new_data.append(pixel)
-            cleaned.putdata(new_data)
-            cleaned.save(img_path)
+            self._clean_transparent_pixels(img, img_path)
             img = PilImage.open(img_path)
         if img.mode == "RGBA":
             # ticket 901, image:
@@ -1696,13 +1753,14 @@ class RlWriter:
                 ]
             )
 
-        self._execute_image_conversion_commands(cmds, img_path)
+        ret = self._execute_image_conversion_commands(cmds, img_path)
         try:
             del img
         except:
             log.warning("image can not be opened by PIL: %r" % img_path)
             raise
-        self.fixed_images[img_path] = 0
+        if image_cache is not None and ret == 0:
+            image_cache.store(key, img_path)
         return 0
 
     def set_svg_default_size(self, img_node):
@@ -2381,27 +2439,10 @@ class RlWriter:
         return min_width, h_min
 
     def getMaxParaWidth(self, paragraph, print_width):
-        kind = paragraph.blPara.kind
-        space_width = stringWidth(
-            " ", paragraph.style.fontName, paragraph.style.fontSize
-        )
-        total_width = 0
-        current_width = 0
-        for line in paragraph.blPara.lines:
-            extraspace = line[0] if kind == 0 else line.extraSpace
-            line_width = print_width - extraspace
-            current_width += line_width
-            if getattr(line, "lineBreak", False):
-                total_width = max(total_width, current_width)
-                current_width = 0
-            else:
-                current_width += space_width
-        total_width = max(total_width, current_width)
-        return total_width - space_width
+        return measure.get_max_para_width(paragraph, print_width)
 
     def getMaxElementSize(self, element, w_min, h_min):
         if element.__class__ == Paragraph:
-            element.wrap(PRINT_WIDTH, PRINT_HEIGHT)
             pad = 2 * pdfstyles.CELL_PADDING
             width = self.getMaxParaWidth(element, PRINT_WIDTH)
             return width + pad, 0
@@ -2686,9 +2727,17 @@ def writer(
     mathcache=None,
     lang=None,
     profile=None,
+    workers=None,
 ):
+    if workers is not None:
+        workers = int(workers)
     rl_writer = RlWriter(
-        env, strict=strict, debug=debug, mathcache=mathcache, lang=lang
+        env,
+        strict=strict,
+        debug=debug,
+        mathcache=mathcache,
+        lang=lang,
+        workers=workers,
     )
     if coverimage is None and env.configparser.has_section("pdf"):
         coverimage = env.configparser.get("pdf", "coverimage", None)
@@ -2732,4 +2781,8 @@ writer.options = {
         "param": "PROFILEFN",
         "help": "profile run time. ONLY for debugging purposes",
     },
+    "workers": {
+        "param": "NUM",
+        "help": "build articles in NUM processes and cache them for fail safe rendering",
+    },
 }
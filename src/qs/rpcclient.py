@@ -3,13 +3,33 @@ try:
 except ImportError:
     import json
 
+import itertools
 import socket
 
+import gevent
+from gevent import event, lock
+from gevent import socket as gsocket
+
 from qs.log import root_logger
 
 logger = root_logger.getChild(__name__)
 
 
+def _get_batch_results(data):
+    err = data.get("error")
+    if err:
+        logger.error(f"error: {err}")
+        raise RuntimeError(err)
+    results = []
+    for res in data["results"]:
+        err = res.get("error")
+        if err:
+            logger.error(f"error: {err}")
+            raise RuntimeError(err)
+        results.append(res["result"])
+    return results
+
+
 class RpcClient:
     def __init__(self, host=None, port=None):
         if host is None:
@@ -62,6 +82,147 @@ class RpcClient:
             raise RuntimeError(err)
         return data["result"]
 
+    def send_batch(self, calls):
+        """send calls, a list of (name, kwargs) tuples, in one request
+
+        qserve executes the calls in order. Returns the list of results.
+        """
+        if self.socket is None:
+            self._get_socket()
+
+        d = json.dumps({"id": 1, "calls": [[name, kwargs] for name, kwargs in calls]}) + "\n"
+        logger.info(f"sending {d!r}")
+        try:
+            self.writer.write(d)
+            self.writer.flush()
+            line = self.reader.readline()
+        except:
+            self._closesocket()
+            raise
+        return _get_batch_results(json.loads(line))
+
+
+class SendError(ConnectionError):
+    """the request could not be sent, the server has not seen it"""
+
+
+class _Connection:
+    def __init__(self, host, port):
+        self.socket = gsocket.create_connection((host, port))
+        self.reader = self.socket.makefile("r")
+        self.writer = self.socket.makefile("w")
+        self.pending = {}  # request id -> AsyncResult
+        self.closed = False
+        self.read_greenlet = gevent.spawn(self._read_responses)
+
+    def _read_responses(self):
+        err = None
+        try:
+            while True:
+                line = self.reader.readline()
+                if not line:
+                    break
+                data = json.loads(line)
+                result = self.pending.pop(data.get("id"), None)
+                if result is not None:
+                    result.set(data)
+        except Exception as exc:
+            err = exc
+        self.close(ConnectionError(f"connection closed: {err or 'eof'}"))
+
+    def close(self, exc):
+        self.closed = True
+        pending, self.pending = self.pending, {}
+        for result in pending.values():
+            result.set_exception(exc)
+        self.socket.close()
+
+
+class MultiplexClient:
+    """RpcClient sending requests with an id over one persistent connection
+
+    Several greenlets can have calls in flight at the same time, qserve
+    answers them in the order they complete.
+    """
+
+    def __init__(self, host=None, port=None):
+        if host is None:
+            host = "localhost"
+        if port is None:
+            port = 14311
+
+        self.host = host
+        self.port = port
+        self.connection = None
+        self._ids = itertools.count(1)
+        self._connect_lock = lock.Semaphore()
+        self._write_lock = lock.Semaphore()
+
+    def _get_connection(self):
+        with self._connect_lock:
+            if self.connection is None or self.connection.closed:
+                logger.info(f"connecting to {self.host}:{self.port}")
+                self.connection = _Connection(self.host, self.port)
+            return self.connection
+
+    def close(self):
+        """close the connection, calls in flight fail"""
+        connection, self.connection = self.connection, None
+        if connection is not None and not connection.closed:
+            connection.close(ConnectionError("connection closed by client"))
+            connection.read_greenlet.kill(block=False)
+
+    def _call(self, calls):
+        connection = self._get_connection()
+        request_id = next(self._ids)
+        result = connection.pending[request_id] = event.AsyncResult()
+        d = json.dumps({"id": request_id, "calls": calls}) + "\n"
+        logger.info(f"sending {d!r}")
+        try:
+            with self._write_lock:
+                connection.writer.write(d)
+                connection.writer.flush()
+        except Exception as exc:
+            connection.pending.pop(request_id, None)
+            connection.close(ConnectionError(f"error sending request: {exc}"))
+            raise SendError(f"error sending request: {exc}") from exc
+        try:
+            return result.get()
+        finally:
+            connection.pending.pop(request_id, None)
+
+    def _call_with_retry(self, calls):
+        # only a request which could not be sent is repeated. once it is
+        # sent, qserve may have executed it, e.g. queued a job
+        try:
+            return self._call(calls)
+        except SendError:
+            return self._call(calls)
+
+    def send(self, name, **kwargs):
+        assert isinstance(name, str)
+        return _get_batch_results(self._call_with_retry([[name, kwargs]]))[0]
+
+    def send_batch(self, calls):
+        """send calls, a list of (name, kwargs) tuples, in one request
+
+        qserve executes the calls in order. Returns the list of results.
+        """
+        calls = [[name, kwargs] for name, kwargs in calls]
+        return _get_batch_results(self._call_with_retry(calls))
+
+
+_multiplex_clients = {}
+
+
+def get_proxy(host=None, port=None):
+    """return a ServerProxy using the persistent MultiplexClient for host:port"""
+    key = (host or "localhost", port or 14311)
+    client = _multiplex_clients.get(key)
+    if client is None:
+        client = _multiplex_clients[key] = MultiplexClient(host=key[0], port=key[1])
+    return ServerProxy(rpc_client=client)
+
 
 class ServerProxy:
     _make_client = RpcClient
@@ -82,5 +243,12 @@ class ServerProxy:
     def get_client(self):
         return self._rpc_client
 
+    def batch(self, calls):
+        """call several methods in one round trip
+
+        calls is a list of (name, kwargs) tuples. Returns the list of results.
+        """
+        return self._rpc_client.send_batch(calls)
+
     def __str__(self):
         return f"ServerProxy({self._rpc_client.host}, {self._rpc_client.port})"
@@ -11,6 +11,7 @@ from gevent import (
     Greenlet,
     GreenletExit,
     getcurrent,
+    lock,
     pool,
     queue,
     spawn,
@@ -101,6 +102,9 @@ class Server:
             return
         sock_file = None
         current = getcurrent()
+        # requests with an id are handled concurrently, see handle_calls
+        requests = pool.Group()
+        write_lock = lock.Semaphore()
         try:
             self.client_count += 1
             clientid = "<%s %s:%s>" % (self.client_count, addr[0], addr[1])
@@ -128,6 +132,25 @@ class Server:
 
             self.log("+connect: %s" % (clientid,))
 
+            def send(response):
+                with write_lock:
+                    sock_file.write(json.dumps(response) + "\n")
+                    sock_file.flush()
+
+            def dispatch(req):
+                try:
+                    return {"result": handle_request(req)}
+                except GreenletExit:
+                    raise
+                except Exception as err:
+                    logger.exception(err)
+                    return {"error": str(err)}
+
+            def handle_calls(req):
+                # a list of calls, which are executed in order
+                results = [dispatch(call) for call in req["calls"]]
+                send({"id": req["id"], "results": results})
+
             while 1:
                 current.status = "idle"
                 line = lineq.get()
@@ -140,19 +163,14 @@ class Server:
                     self.log(f"+protocol error {clientid}: {err}")
                     break
 
-                current.status = "dispatching: %s" % line[:-1]
-                try:
-                    d = handle_request(req)
-                    response = json.dumps({"result": d}) + "\n"
-                except GreenletExit:
-                    raise
-                except Exception as err:
-                    response = json.dumps({"error": str(err)}) + "\n"
-                    logger.exception(err)
+                if isinstance(req, dict):
+                    requests.spawn(handle_calls, req)
+                    continue
 
-                current.status = "sending response: %s" % response[:-1]
-                sock_file.write(response)
-                sock_file.flush()
+                current.status = "dispatching: %s" % line[:-1]
+                response = dispatch(req)
+                current.status = "sending response: %s" % response
+                send(response)
         except GreenletExit:
             raise
         except Exception:
@@ -161,6 +179,7 @@ class Server:
         finally:
             current.status = "dead"
             # self.log("-disconnect: %s" % (clientid,))
+            requests.kill()
             sock.close()
             if sock_file is not None:
                 sock_file.close()
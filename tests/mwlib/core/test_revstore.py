@@ -0,0 +1,112 @@
+#! /usr/bin/env py.test
+
+import os
+
+import pytest
+
+from mwlib.core import revstore
+from mwlib.core.nuwiki import NuWiki
+from mwlib.core.revstore import RevisionStore, index_filename, scan_frames, scan_revisions
+from mwlib.network.fetch import FsOutput
+from mwlib.network.siteinfo import get_siteinfo
+
+
+def make_nuwiki_dir(path, compression="none"):
+    fsout = FsOutput(path, compression=compression)
+    fsout.write_siteinfo(get_siteinfo("en"))
+    fsout.write_pages(
+        {
+            "pages": {
+                "1": {
+                    "title": "Monty Python",
+                    "ns": 0,
+                    "revisions": [
+                        {"revid": 10, "*": "old revision"},
+                        {"revid": 12, "*": "Monty Python is a British comedy troupe. ünïcödé"},
+                        {"revid": 11, "*": "middle revision"},
+                    ],
+                }
+            }
+        }
+    )
+    fsout.write_expanded_page("Template:Spam", 10, "spam, spam, eggs")
+    fsout.close()
+    return fsout
+
+
+def test_scan_revisions():
+    buf = b"ignored\n\f --page-- {\"title\": \"A\"}\nfirst\n\f --page-- {\"title\": \"B\", \"revid\": 3}\nsecond"
+    entries = scan_revisions(buf)
+    assert [meta for meta, _, _ in entries] == [{"title": "A"}, {"title": "B", "revid": 3}]
+    assert [buf[offset : offset + length] for _, offset, length in entries] == [b"first", b"second"]
+
+
+def test_index_matches_scan(tmpdir):
+    path = str(tmpdir.join("nuwiki"))
+    make_nuwiki_dir(path)
+    rev_fn = os.path.join(path, "revisions-1.txt")
+    assert os.path.exists(index_filename(rev_fn))
+    with open(rev_fn, "rb") as f:
+        scanned = scan_revisions(f.read())
+    fsout_index = NuWiki(path)._loadjson(index_filename(rev_fn))
+    assert [list(entry) for entry in scanned] == fsout_index
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_nuwiki_pages(tmpdir, compression):
+    path = str(tmpdir.join("nuwiki"))
+    fsout = make_nuwiki_dir(path, compression)
+    wiki = NuWiki(path)
+    page = wiki.get_page("Monty Python")
+    assert page.revid == 12
+    assert page.rawtext == "Monty Python is a British comedy troupe. ünïcödé"
+    assert wiki.get_page(None, 10).rawtext == "old revision"
+    template = wiki.get_page("Template:Spam")
+    assert template.expanded == 1
+    assert template.rawtext == "spam, spam, eggs"
+
+    # without an index file the revisions are scanned
+    os.unlink(index_filename(fsout.revisions_path))
+    assert NuWiki(path).get_page("Monty Python").rawtext == page.rawtext
+
+
+def test_frames_index_matches_scan(tmpdir):
+    path = str(tmpdir.join("nuwiki"))
+    fsout = make_nuwiki_dir(path, "zlib")
+    assert fsout.revisions_path == os.path.join(path, "revisions-1.frames")
+    with open(fsout.revisions_path, "rb") as f:
+        scanned = scan_frames(f.read())
+    fsout_index = NuWiki(path)._loadjson(index_filename(fsout.revisions_path))
+    assert [list(entry) for entry in scanned] == fsout_index
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [
+        "zlib",
+        pytest.param(
+            "zstd",
+            marks=pytest.mark.skipif(revstore.zstandard is None, reason="zstandard not installed"),
+        ),
+    ],
+)
+def test_frame_writer_compresses(tmpdir, compression):
+    path = str(tmpdir.join("revisions-1"))
+    text = "{{Infobox}} [[Monty Python]] were a British comedy troupe. " * 50
+    writer = revstore.get_writer(path, compression)
+    writer.write({"title": "Monty Python", "ns": 0}, text)
+    writer.write({"title": "Spam", "ns": 0}, "spam")
+    writer.close()
+
+    with open(writer.path, "rb") as f:
+        buf = f.read()
+    assert len(buf) < len(text) // 4
+    pages = RevisionStore().add(buf)
+    assert [(p.title, p.rawtext) for p in pages] == [("Monty Python", text), ("Spam", "spam")]
+
+
+def test_bounded_text_cache():
+    store = RevisionStore(cache_size=2)
+    pages = store.add(b"".join(b"\n\f --page-- {\"title\": \"%d\"}\ntext %d" % (i, i) for i in range(5)))
+    assert [p.rawtext for p in pages] == [f"text {i}" for i in range(5)]
+    assert len(store._cache.cache) == 2
@@ -0,0 +1,116 @@
+#! /usr/bin/env py.test
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pytest
+
+from mwlib.core import workerpool
+
+
+def echo(args):
+    print(" ".join(args))
+
+
+def fail(args):
+    raise RuntimeError("failed with %r" % (args,))
+
+
+def exit_with(args):
+    sys.exit(int(args[0]))
+
+
+def sleep(args):
+    time.sleep(float(args[0]))
+
+
+def getpid(args):
+    print(os.getpid())
+
+
+def mktempdir(args):
+    tempfile.tempdir = tempfile.mkdtemp(dir=args[0])
+    workerpool.at_job_exit(shutil.rmtree, tempfile.tempdir)
+    os.environ["TMPDIR"] = tempfile.tempdir
+    print(tempfile.tempdir)
+
+
+def gettempdir(args):
+    print(tempfile.tempdir, os.environ.get("TMPDIR"))
+
+
+COMMANDS = {
+    "echo": echo,
+    "fail": fail,
+    "exit": exit_with,
+    "sleep": sleep,
+    "getpid": getpid,
+    "mktempdir": mktempdir,
+    "gettempdir": gettempdir,
+}
+
+
+@pytest.fixture
+def pool():
+    pool = workerpool.WorkerPool(COMMANDS, size=1, max_jobs=3)
+    pool.start()
+    yield pool
+    pool.stop()
+
+
+def test_run_cmd(pool):
+    assert pool.run_cmd(["echo", "hello", "world"]) == (0, "hello world\n")
+
+
+def test_run_cmd_error(pool):
+    st, out = pool.run_cmd(["fail", "x"])
+    assert st != 0
+    assert "RuntimeError: failed with ['x']" in out
+    assert pool.run_cmd(["echo", "ok"]) == (0, "ok\n")
+
+
+def test_run_cmd_exit_code(pool):
+    assert pool.run_cmd(["exit", "3"]) == (3 << 8, "")
+    assert pool.run_cmd(["exit", "0"]) == (0, "")
+
+
+def test_run_cmd_timeout(pool):
+    stime = time.time()
+    st, out = pool.run_cmd(["sleep", "10"], timeout=0.2)
+    assert (st, out) == (9, "")
+    assert time.time() - stime < 2
+    assert pool.run_cmd(["echo", "ok"]) == (0, "ok\n")
+
+
+def test_worker_recycled_after_max_jobs(pool):
+    pids = [pool.run_cmd(["getpid"])[1] for _ in range(6)]
+    assert len(set(pids)) == 2
+    assert pids[:3] == [pids[0]] * 3
+    assert str(os.getpid()) not in pids
+
+
+def test_preload_runs_in_zygote(tmpdir):
+    marker = tmpdir.join("preloaded")
+
+    def preload():
+        marker.write(str(os.getpid()))
+
+    pool = workerpool.WorkerPool(COMMANDS, preload=preload)
+    pool.start()
+    try:
+        assert pool.run_cmd(["echo", "x"]) == (0, "x\n")
+        assert int(marker.read()) != os.getpid()
+    finally:
+        pool.stop()
+
+
+def test_job_state_is_reset(pool, tmpdir):
+    before = pool.run_cmd(["gettempdir"])
+    st, out = pool.run_cmd(["mktempdir", str(tmpdir)])
+    assert st == 0
+    assert out.strip().startswith(str(tmpdir))
+    assert not os.path.exists(out.strip())
+    assert pool.run_cmd(["gettempdir"]) == before
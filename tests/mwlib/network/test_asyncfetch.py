@@ -0,0 +1,303 @@
+#!/usr/bin/env pytest
+
+"""Tests for the asyncio fetch engine in mwlib.network.asyncfetch."""
+
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from unittest.mock import patch
+from urllib import parse
+
+import httpx
+import pytest
+from sqlitedict import SqliteDict
+
+from mwlib.core.revstore import RevisionStore
+from mwlib.network import fetch
+from mwlib.network.asyncfetch import AsyncFetcher, AsyncRateLimiter
+from mwlib.network.http_client import HttpClientManager
+from mwlib.network.sapi import MwApi
+from mwlib.network.siteinfo import get_siteinfo
+from mwlib.utils import conf
+
+APIURL = "https://wiki.test/w/api.php"
+IMAGE_URL = "https://upload.test/thumb/Example.png"
+
+
+def fake_wiki(request):
+    """answer the requests of a fetch for the articles Foo and Bar and the
+    revisions 7 and 8
+    """
+    args = dict(parse.parse_qsl(request.url.query.decode()))
+    if request.method == "POST":
+        args.update(parse.parse_qsl(request.content.decode()))
+    if request.url.host == "upload.test":
+        return httpx.Response(200, content=b"\x89PNG fake image")
+
+    action = args["action"]
+    if action == "query" and args.get("meta") == "siteinfo":
+        return httpx.Response(200, json={"query": get_siteinfo("en")})
+    if action == "parse":
+        name = args.get("page") or args["oldid"]
+        return httpx.Response(200, json={"parse": {"title": name, "text": {"*": f"<p>{name}</p>"}}})
+    if action == "expandtemplates":
+        text = f"expanded {args['title']}"
+        return httpx.Response(200, json={"expandtemplates": {"wikitext": text}})
+
+    if args.get("revids"):
+        titles = [f"Page {revid}" for revid in args["revids"].split("|")]
+    else:
+        titles = args.get("titles", "").split("|")
+    prop = args.get("prop", "")
+    pages = {}
+    for pageid, title in enumerate(titles, 1):
+        page = {"pageid": pageid, "ns": 0, "title": title}
+        if prop == "revisions":
+            revid = int(title.split()[1])
+            page["revisions"] = [{"revid": revid, "*": f"text of {revid}"}]
+        elif prop == "images":
+            page["images"] = [{"ns": 6, "title": "File:Example.png"}]
+        elif prop == "imageinfo|info":
+            page.update(ns=6, imageinfo=[{"thumburl": IMAGE_URL, "descriptionurl": ""}])
+        elif prop == "contributors":
+            page.update(contributors=[{"name": "Alice"}, {"name": "Bob"}], anoncontributors=2)
+        pages[str(pageid)] = page
+    return httpx.Response(200, json={"query": {"pages": pages}})
+
+
+@pytest.fixture
+def transport():
+    HttpClientManager._instance = None
+    HttpClientManager._clients = {}
+    yield httpx.MockTransport(fake_wiki)
+    HttpClientManager._instance = None
+    HttpClientManager._clients = {}
+
+
+def make_api(transport):
+    api = MwApi(APIURL, use_oauth2=False, use_http2=False)
+    api.http_client = httpx.Client(transport=transport)
+    return api
+
+
+def read_output(path):
+    """return the content of a FsOutput directory independent of the order
+    the pages were fetched in
+    """
+    res = {}
+    for name in ("siteinfo", "redirects", "licenses"):
+        with open(os.path.join(path, name + ".json")) as json_file:
+            res[name] = json.load(json_file)
+    for name in ("authors", "html", "imageinfo"):
+        with SqliteDict(os.path.join(path, name + ".db")) as database:
+            res[name] = dict(database.items())
+    with open(os.path.join(path, "revisions-1.frames"), "rb") as revfile:
+        pages = RevisionStore().add(revfile.read())
+    res["revisions"] = sorted((p.title, p.revid, p.rawtext) for p in pages)
+    res["images"] = {}
+    for name in os.listdir(os.path.join(path, "images")):
+        with open(os.path.join(path, "images", name), "rb") as image:
+            res["images"][name] = image.read()
+    return res
+
+
+def run_fetcher(fetcher_cls, api, path, pages=None, **kwargs):
+    fsout = fetch.FsOutput(path)
+    if pages is None:
+        pages = [("Foo", None), ("Bar", None), ("Page 7", 7), ("Page 8", 8)]
+    fetcher = fetcher_cls(api, fsout, pages, licenses=[], **kwargs)
+    fetcher.run()
+    return fetcher
+
+
+def test_async_fetcher_writes_same_output(transport, tmp_path):
+    download_client = httpx.Client(transport=transport)
+    with patch("mwlib.network.fetch._get_download_client", return_value=download_client):
+        run_fetcher(fetch.Fetcher, make_api(transport), str(tmp_path / "gevent"))
+    run_fetcher(AsyncFetcher, make_api(transport), str(tmp_path / "asyncio"), transport=transport)
+
+    expected = read_output(str(tmp_path / "gevent"))
+    result = read_output(str(tmp_path / "asyncio"))
+    assert result == expected
+    assert list(result["images"].values()) == [b"\x89PNG fake image"]
+    assert sorted(result["authors"]) == ["Bar", "Foo", "Page 7", "Page 8"]
+    assert len(result["revisions"]) == 4
+
+
+def test_fetchers_batch_requests(transport, tmp_path):
+    download_client = httpx.Client(transport=transport)
+    with patch("mwlib.network.fetch._get_download_client", return_value=download_client):
+        fetcher = run_fetcher(fetch.Fetcher, make_api(transport), str(tmp_path / "gevent"))
+    async_fetcher = run_fetcher(
+        AsyncFetcher, make_api(transport), str(tmp_path / "asyncio"), transport=transport
+    )
+
+    # parse and expandtemplates take a single page, the other requests are
+    # sent once for all four pages
+    assert fetcher.api.request_counts == {
+        "query:siteinfo": 1,
+        "parse": 4,
+        "expandtemplates": 4,
+        "query:revisions": 1,
+        "query:images": 2,
+        "query:imageinfo|info": 1,
+        "query:contributors": 1,
+    }
+    # AsyncFetcher gets the siteinfo with the synchronous MwApi
+    assert async_fetcher.api.request_counts == fetcher.api.request_counts - Counter(
+        {"query:siteinfo": 1}
+    )
+
+
+def flaky_revisions_wiki(request):
+    """answer revisions queries like a busy wiki: continue after the first
+    revision, leave revision 9 out of answers for several revids and hide
+    the text of revision 10
+    """
+    args = dict(parse.parse_qsl(request.url.query.decode()))
+    if args.get("prop") != "revisions" or not args.get("revids"):
+        return fake_wiki(request)
+    requested = args["revids"].split("|")
+    data = {"query": {"pages": {}}}
+    if "rvcontinue" in args:
+        revids = requested[requested.index(args["rvcontinue"]) :]
+    elif len(requested) > 1:
+        revids = requested[:1]
+        data["continue"] = {"rvcontinue": requested[1], "continue": "||"}
+    else:
+        revids = requested
+    for revid in revids:
+        if revid == "9" and len(requested) > 1:
+            continue
+        rev = {"revid": int(revid), "*": f"text of {revid}"}
+        if revid == "10":
+            rev = {"revid": 10, "texthidden": ""}
+        page = {"pageid": int(revid), "ns": 0, "title": f"Page {revid}", "revisions": [rev]}
+        data["query"]["pages"][revid] = page
+    return httpx.Response(200, json=data)
+
+
+@pytest.mark.parametrize("fetcher_cls", [fetch.Fetcher, AsyncFetcher])
+def test_fetchers_complete_revision_batches(fetcher_cls, tmp_path):
+    transport = httpx.MockTransport(flaky_revisions_wiki)
+    pages = [(f"Page {revid}", revid) for revid in (7, 8, 9, 10)]
+    kwargs = {"transport": transport} if fetcher_cls is AsyncFetcher else {}
+    download_client = httpx.Client(transport=transport)
+    with patch("mwlib.network.fetch._get_download_client", return_value=download_client):
+        fetcher = run_fetcher(
+            fetcher_cls, make_api(transport), str(tmp_path / "out"), pages=pages, **kwargs
+        )
+
+    result = read_output(str(tmp_path / "out"))
+    assert [revid for _, revid, _ in result["revisions"]] == [7, 8, 9]
+    # the batch, its continuation and the single request for revision 9
+    assert fetcher.api.request_counts["query:revisions"] == 3
+
+
+def test_async_fetcher_does_not_deadlock(transport, tmp_path):
+    # the expansions schedule api requests (get_edits) and the api
+    # requests schedule expansions: with more calls than fit into the
+    # queues of all stages neither may wait for the other
+    conf_get = conf.get
+
+    def get(section, name, default=None, type_=str):
+        if (section, name) == ("fetch", "api_request_limit"):
+            return 2
+        return conf_get(section, name, default, type_)
+
+    pages = [(f"Page {revid}", revid) for revid in range(1, 201)]
+    with patch("mwlib.network.asyncfetch.conf.get", side_effect=get):
+        api = make_api(transport)
+        fetcher = run_fetcher(
+            AsyncFetcher, api, str(tmp_path / "out"), pages=pages, transport=transport
+        )
+        assert sum(stage.queue.maxsize for stage in fetcher.stages.values()) < len(pages)
+
+    result = read_output(str(tmp_path / "out"))
+    assert len(result["revisions"]) == 200
+    # the parse and expandtemplates requests have their own limit
+    assert fetcher.stages["api"].num_workers == 2
+    assert fetcher.stages["html"].num_workers == fetcher.stages["expand"].num_workers == 5
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b"\x89PNG"
+        raise httpx.ReadError("connection lost")
+
+
+def make_download(tmp_path, statuses):
+    """return a download coroutine function for a server answering with
+    statuses and the list of the statuses it sent. the body of a
+    "broken" response breaks off after the first chunk
+    """
+    statuses = list(statuses)
+    sent = []
+
+    def handler(request):
+        if request.url.host != "upload.test":
+            return fake_wiki(request)
+        sent.append(statuses.pop(0))
+        if sent[-1] == "broken":
+            return httpx.Response(200, stream=BrokenStream())
+        return httpx.Response(sent[-1], content=b"\x89PNG fake image")
+
+    transport = httpx.MockTransport(handler)
+    fetcher = AsyncFetcher(
+        make_api(transport), fetch.FsOutput(str(tmp_path / "out")), [], [], transport=transport
+    )
+
+    async def download(path, **kwargs):
+        try:
+            await fetcher.download(IMAGE_URL, path, path + "\xb7", **kwargs)
+        finally:
+            await fetcher.session.aclose()
+
+    return download, sent
+
+
+def test_download_retries_too_many_requests(transport, tmp_path):
+    download, sent = make_download(tmp_path, [429, 429, 200])
+    path = str(tmp_path / "image.png")
+    asyncio.run(download(path, max_retries=2, initial_delay=0.01))
+    assert sent == [429, 429, 200]
+    with open(path, "rb") as image:
+        assert image.read() == b"\x89PNG fake image"
+    assert not os.path.exists(path + "\xb7")
+
+
+@pytest.mark.parametrize(
+    "statuses, error",
+    [
+        ([404], httpx.HTTPStatusError),
+        ([429, 429, 429], httpx.HTTPStatusError),
+        ([429, "broken"], httpx.ReadError),
+    ],
+)
+def test_download_failure_removes_temp_file(transport, tmp_path, statuses, error):
+    download, sent = make_download(tmp_path, statuses)
+    path = str(tmp_path / "image.png")
+    with pytest.raises(error):
+        asyncio.run(download(path, max_retries=2, initial_delay=0.01))
+    assert sent == statuses
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + "\xb7")
+
+
+def test_rate_limiter_allows_max_calls_per_period():
+    async def acquire_all(limiter, count):
+        times = []
+        for _ in range(count):
+            await limiter.acquire()
+            times.append(time.monotonic())
+        return times
+
+    limiter = AsyncRateLimiter(max_calls=10, period=0.5)
+    times = asyncio.run(acquire_all(limiter, 25))
+    # like sapi.RateLimiter, at most 10 calls start in any 0.5s: the 11th
+    # and the 21st call wait for the window of the first ten to pass
+    assert times[9] - times[0] < 0.1
+    assert all(later - earlier > 0.49 for earlier, later in zip(times, times[10:]))
+    assert times[-1] - times[0] < 1.4
@@ -0,0 +1,159 @@
+#!/usr/bin/env pytest
+
+"""Unit tests for mwlib.network.fetchcache module."""
+
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from mwlib.network import fetch, fetchcache
+from mwlib.network.fetchcache import FetchCache
+from mwlib.network.http_client import HttpClientManager
+from mwlib.network.sapi import MwApi
+
+APIURL = "https://test.wikipedia.org/w/api.php"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FetchCache(str(tmp_path / "fetchcache"), title_ttl=60)
+    fetchcache.set_fetch_cache(cache)
+    yield cache
+    fetchcache.set_fetch_cache(None)
+
+
+@pytest.fixture
+def mw_api(cache):
+    HttpClientManager._instance = None
+    HttpClientManager._clients = {}
+    yield MwApi(APIURL, use_oauth2=False)
+    HttpClientManager._instance = None
+    HttpClientManager._clients = {}
+
+
+def test_get_response_is_cached(cache):
+    calls = []
+
+    def fetch_response():
+        calls.append(1)
+        return {"parse": {"text": {"*": "<p>x</p>"}}}
+
+    args = {"action": "parse", "page": "Foo"}
+    first = cache.get_response(APIURL, "parse", args, fetch_response)
+    second = cache.get_response(APIURL, "parse", dict(args), fetch_response)
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()["kinds"] == {"parse": {"hits": 1, "misses": 1}}
+
+
+def test_key_depends_on_kind_and_url(cache):
+    args = {"titles": "Foo"}
+    keys = {
+        cache.get_key(APIURL, "pages", args),
+        cache.get_key(APIURL, "imageinfo", args),
+        cache.get_key("https://de.wikipedia.org/w/api.php", "pages", args),
+    }
+    assert len(keys) == 3
+
+
+def test_title_entries_expire(cache):
+    key = cache.get_key(APIURL, "parse", {"page": "Foo"})
+    cache.store(key, "old")
+    with patch("mwlib.network.fetchcache.time.time", return_value=time.time() + 120):
+        assert cache.lookup(key, "parse") is None
+        assert cache.lookup(key, "parse", by_revid=True) == "old"
+
+
+def test_categories_are_title_addressed():
+    assert fetchcache.is_revid_request("pages", {"revids": "1|2"})
+    assert fetchcache.is_revid_request("parse", {"oldid": 5})
+    assert not fetchcache.is_revid_request("parse", {"page": "Foo"})
+    assert not fetchcache.is_revid_request("categories", {"revids": "1|2"})
+
+
+def test_mwapi_uses_cache(mw_api):
+    response = json.dumps({"query": {"pages": {"1": {"title": "File:Foo.jpg"}}}})
+    with patch.object(mw_api, "_request", return_value=response) as request:
+        first = mw_api.fetch_imageinfo(["File:Foo.jpg"])
+        second = mw_api.fetch_imageinfo(["File:Foo.jpg"])
+    assert first == second
+    assert request.call_count == 1
+    assert mw_api.request_counter == 1
+
+
+def test_mwapi_does_not_cache_errors(mw_api):
+    response = json.dumps({"error": {"info": "bad title"}})
+    with patch.object(mw_api, "_request", return_value=response) as request:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                mw_api.fetch_imageinfo(["File:Foo.jpg"])
+    assert request.call_count == 2
+
+
+def test_mwapi_does_not_cache_post_errors(mw_api):
+    error = json.dumps({"error": {"code": "ratelimited"}}).encode()
+    expanded = json.dumps({"expandtemplates": {"wikitext": "expanded"}}).encode()
+    kwargs = dict(
+        use_post=True, cache_kind="expandtemplates", action="expandtemplates", title="Foo", text="{{x}}"
+    )
+    with patch.object(mw_api, "_fetch", side_effect=[error, expanded]) as fetch_post:
+        assert "error" in mw_api.do_request(**kwargs)
+        assert mw_api.do_request(**kwargs) == {"expandtemplates": {"wikitext": "expanded"}}
+        assert mw_api.do_request(**kwargs) == {"expandtemplates": {"wikitext": "expanded"}}
+    assert fetch_post.call_count == 2
+
+
+def test_authenticated_responses_are_not_shared(cache):
+    HttpClientManager._instance = None
+    HttpClientManager._clients = {}
+    anonymous = MwApi(APIURL, use_oauth2=False)
+    private = MwApi(APIURL, username="alice", password="secret", use_oauth2=False)
+    HttpClientManager._instance = None
+    HttpClientManager._clients = {}
+    assert private.cache_identity == "user:alice"
+
+    response = json.dumps({"query": {"pages": {"1": {"title": "File:Secret.jpg"}}}})
+    with patch.object(private, "_request", return_value=response):
+        private.fetch_imageinfo(["File:Secret.jpg"])
+    with patch.object(anonymous, "_request", return_value=response) as request:
+        anonymous.fetch_imageinfo(["File:Secret.jpg"])
+    assert request.call_count == 1
+
+
+def test_download_to_file_uses_cache(cache, tmp_path):
+    url = "https://upload.example.com/foo.png"
+
+    def download(client, url, path, temp_path, retry_policy):
+        with open(path, "wb") as out:
+            out.write(b"png data")
+
+    with (
+        patch("mwlib.network.fetch._get_download_client"),
+        patch("mwlib.network.fetch._acquire_download_rate_limit"),
+        patch("mwlib.network.fetch._download_with_retries", side_effect=download) as mock_dl,
+    ):
+        for name in ("first.png", "second.png"):
+            path = str(tmp_path / name)
+            fetch.download_to_file(url, path, path + ".tmp")
+            with open(path, "rb") as downloaded:
+                assert downloaded.read() == b"png data"
+    assert mock_dl.call_count == 1
+    assert cache.kind_hits["download"] == 1
+
+
+def test_downloads_are_linked_into_cache(cache, tmp_path):
+    url = "https://upload.example.com/foo.png"
+    path = tmp_path / "foo.png"
+    path.write_bytes(b"png data")
+    cache.store_file(url, str(path))
+    path.unlink()  # the fetch output is removed after the zip is built
+
+    for name in ("first.png", "second.png"):
+        assert cache.fetch_file(url, str(tmp_path / name))
+        assert (tmp_path / name).read_bytes() == b"png data"
+    assert (tmp_path / "first.png").stat().st_nlink == 3
+    assert not cache.fetch_file("https://upload.example.com/bar.png", str(tmp_path / "bar.png"))
+    with patch("mwlib.network.fetchcache.time.time", return_value=time.time() + 120):
+        assert not cache.fetch_file(url, str(tmp_path / "third.png"))
@@ -2,6 +2,7 @@
 
 """Unit tests for mwlib.network.sapi module."""
 
+import json
 from unittest.mock import MagicMock, patch
 
 import httpx
@@ -282,3 +283,69 @@ class TestMwApi:
             assert mock_limiter_cls.call_count == 2
             limiter_a.acquire.assert_called()
             limiter_b.acquire.assert_called_once_with()
+
+    def test_continued_contributors_are_merged(self, mw_api):
+        responses = [
+            {
+                "continue": {"pccontinue": "1|5", "continue": "||"},
+                "query": {
+                    "pages": {
+                        "1": {
+                            "pageid": 1,
+                            "title": "Foo",
+                            "anoncontributors": 2,
+                            "contributors": [{"name": "Alice"}, {"name": "Bob"}],
+                        }
+                    }
+                },
+            },
+            {
+                "query": {
+                    "pages": {
+                        "1": {
+                            "pageid": 1,
+                            "title": "Foo",
+                            "anoncontributors": 2,
+                            "contributors": [{"name": "Carol"}],
+                        }
+                    }
+                },
+            },
+        ]
+        with patch.object(
+            mw_api, "_request", side_effect=[json.dumps(r) for r in responses]
+        ) as request:
+            result = mw_api.get_contributors(["Foo"])
+        assert request.call_count == 2
+        assert request.call_args.kwargs["pccontinue"] == "1|5"
+        assert result["Foo"].authors == {"Alice", "Bob", "Carol"}
+        assert result["Foo"].num_anon == 2
+
+    def test_continued_images_are_merged(self, mw_api):
+        page = {"pageid": 1, "ns": 0, "title": "Foo"}
+        responses = [
+            {
+                "continue": {"imcontinue": "1|B.png", "continue": "||revisions|templates"},
+                "query": {
+                    "pages": {
+                        "1": dict(
+                            page,
+                            revisions=[{"revid": 7}],
+                            templates=[{"ns": 10, "title": "Template:X"}],
+                            images=[{"ns": 6, "title": "File:A.png"}],
+                        )
+                    }
+                },
+            },
+            {"query": {"pages": {"1": dict(page, images=[{"ns": 6, "title": "File:B.png"}])}}},
+        ]
+        with patch.object(
+            mw_api, "_request", side_effect=[json.dumps(r) for r in responses]
+        ) as request:
+            result = mw_api.fetch_used(titles=["Foo"])
+        assert request.call_count == 2
+        assert request.call_args.kwargs["imcontinue"] == "1|B.png"
+        merged = result["pages"]["1"]
+        assert merged["revisions"] == [{"revid": 7}]
+        assert merged["templates"] == [{"ns": 10, "title": "Template:X"}]
+        assert [image["title"] for image in merged["images"]] == ["File:A.png", "File:B.png"]
@@ -0,0 +1,39 @@
+#! /usr/bin/env py.test
+
+from mwlib.core.metabook import Article
+from mwlib.parser import advtree
+from mwlib.parser.refine import uparser
+from mwlib.writers.rl import articlecache
+
+
+class FakeWriter:
+    def __init__(self, cache):
+        self.article_cache = cache
+        self.built = []
+
+    def buildArticle(self, item):
+        self.built.append(item.title)
+        art = uparser.parse_string(title=item.title, raw="some ''text''")
+        advtree.build_advanced_tree(art)
+        return art
+
+
+def test_key_depends_on_revision_and_options(tmpdir):
+    cache = articlecache.ArticleCache(str(tmpdir.join("a")), options=("en",))
+    other = articlecache.ArticleCache(str(tmpdir.join("b")), options=("de",))
+    item = Article(title="Foo", revision="1")
+    assert cache.get_key(item) == cache.get_key(Article(title="Foo", revision="1"))
+    assert cache.get_key(item) != cache.get_key(Article(title="Foo", revision="2"))
+    assert cache.get_key(item) != other.get_key(item)
+
+
+def test_prebuild_articles(tmpdir):
+    cache = articlecache.ArticleCache(str(tmpdir))
+    rl_writer = FakeWriter(cache)
+    items = [Article(title="A", revision="1"), Article(title="B", revision="2")]
+    articlecache.prebuild_articles(rl_writer, items, 2)
+    assert rl_writer.built == []  # built in the worker processes
+    for item in items:
+        art = cache.get(cache.get_key(item))
+        assert art.caption == item.title
+        assert art.get_all_children()
@@ -0,0 +1,58 @@
+#! /usr/bin/env py.test
+
+import os
+
+import pytest
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen.canvas import Canvas
+
+from mwlib import rendering
+from mwlib.writers.rl import fontcache, fontconfig
+
+FONT_PATH = os.path.join(os.path.dirname(rendering.__file__), "freefont", "FreeSerif.ttf")
+
+
+@pytest.fixture
+def font_cache(tmpdir):
+    cache = fontcache.FontCache(str(tmpdir.join("fonts")))
+    fontcache.set_font_cache(cache)
+    yield cache
+    fontcache.set_font_cache(None)
+
+
+def test_cached_font_metrics(font_cache, tmpdir):
+    parsed = fontcache.load_ttfont("CacheTestA", FONT_PATH)
+    cached = fontcache.load_ttfont("CacheTestB", FONT_PATH)
+    assert (font_cache.writes, font_cache.hits) == (1, 1)
+    assert cached.fontName == "CacheTestB"
+    assert cached.face.charWidths == parsed.face.charWidths
+    assert cached.face._pdfScale(500) == parsed.face._pdfScale(500)
+
+    pdfmetrics.registerFont(cached)
+    text = "Ärger über Größe"
+    assert pdfmetrics.stringWidth(text, "CacheTestB", 10) == pytest.approx(
+        parsed.stringWidth(text, 10)
+    )
+    canvas = Canvas(str(tmpdir.join("test.pdf")))
+    canvas.setFont("CacheTestB", 10)
+    canvas.drawString(10, 10, text)
+    canvas.save()
+
+
+def test_fonts_are_registered_once(monkeypatch):
+    font_switcher = fontconfig.RLFontSwitcher()
+    font_switcher.register_reportlab_fonts(fontconfig.fonts)
+
+    registered = []
+    monkeypatch.setattr(pdfmetrics, "registerFont", registered.append)
+    fontconfig.RLFontSwitcher().register_reportlab_fonts(fontconfig.fonts)
+    assert registered == []
+
+
+def test_font_path_cache():
+    font_switcher = fontconfig.RLFontSwitcher()
+    path = font_switcher.get_abs_font_path("freefont/FreeSerif.ttf")
+    assert path and os.path.exists(path)
+    assert font_switcher.get_abs_font_path("no/such/font.ttf") is None
+    font_switcher.font_paths = []
+    assert font_switcher.get_abs_font_path("freefont/FreeSerif.ttf") is None
@@ -0,0 +1,61 @@
+#! /usr/bin/env py.test
+
+import pytest
+from PIL import Image
+
+from mwlib.writers.rl import imagecache
+from mwlib.writers.rl.writer import RlWriter
+
+
+@pytest.fixture
+def image_cache(tmpdir):
+    cache = imagecache.ImageCache(str(tmpdir.join("images")))
+    imagecache.set_image_cache(cache)
+    yield cache
+    imagecache.set_image_cache(None)
+
+
+def make_la_image(path):
+    img = Image.new("LA", (3, 1))
+    img.putdata([(10, 0), (20, 128), (30, 255)])
+    img.save(path)
+
+
+def test_key_depends_on_content_and_conversion(image_cache, tmpdir):
+    path = str(tmpdir.join("a.png"))
+    make_la_image(path)
+    key = image_cache.get_key(path, "fix")
+    assert key == image_cache.get_key(path, "fix")
+    assert key != image_cache.get_key(path, "svg2png")
+    Image.new("LA", (3, 1)).save(path)
+    assert key != image_cache.get_key(path, "fix")
+
+
+def test_fetch_and_store(image_cache, tmpdir):
+    src = tmpdir.join("src.png")
+    src.write_binary(b"converted")
+    dest = str(tmpdir.join("dest.png"))
+    assert not image_cache.fetch("ab" * 32, dest)
+    image_cache.store("ab" * 32, str(src))
+    assert image_cache.fetch("ab" * 32, dest)
+    with open(dest, "rb") as dest_file:
+        assert dest_file.read() == b"converted"
+
+
+def test_fix_la_image(image_cache, tmpdir):
+    path = str(tmpdir.join("la.png"))
+    make_la_image(path)
+    key = image_cache.get_key(path, "fix_broken_images")
+
+    rl_writer = RlWriter(test_mode=True)
+    assert rl_writer._fix_broken_images(None, path.encode("utf-8")) == 0
+    assert list(Image.open(path).getdata()) == [(255, 0), (20, 128), (30, 255)]
+    assert rl_writer._fix_broken_images(None, path.encode("utf-8")) == 0
+
+    # another writer gets the fixed image from the cache
+    make_la_image(path)
+    rl_writer = RlWriter(test_mode=True)
+    rl_writer._clean_transparent_pixels = None
+    assert rl_writer._fix_broken_images(None, path.encode("utf-8")) == 0
+    assert list(Image.open(path).getdata()) == [(255, 0), (20, 128), (30, 255)]
+    assert key in image_cache
@@ -0,0 +1,35 @@
+#! /usr/bin/env py.test
+
+import pytest
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus.paragraph import Paragraph
+
+from mwlib.writers.rl import measure
+
+style = ParagraphStyle("test", fontName="Helvetica", fontSize=10, leftIndent=5, rightIndent=3)
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["1", "FC Bayern München", "12\xa0345", "a  b   c", " lead trail ", "3:1 (1:0)"],
+)
+def test_plain_text_width(text):
+    fast = measure.get_plain_text_width(Paragraph(text, style), 400)
+    assert fast == pytest.approx(measure.get_wrapped_width(Paragraph(text, style), 400))
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["<b>bold</b> text", "line<br/>break", "co\xadoperation", "word " * 100],
+)
+def test_plain_text_width_fallback(text):
+    assert measure.get_plain_text_width(Paragraph(text, style), 400) is None
+
+
+def test_max_para_width_memo():
+    para = Paragraph("x<br/>yyy", style)
+    width = measure.get_max_para_width(para, 400)
+    assert width == pytest.approx(measure.get_wrapped_width(para, 400))
+    hits = measure._cache.hits
+    assert measure.get_max_para_width(Paragraph("x<br/>yyy", style), 400) == width
+    assert measure._cache.hits == hits + 1
@@ -0,0 +1,86 @@
+#! /usr/bin/env py.test
+
+import os
+
+import pytest
+from reportlab.platypus.flowables import Flowable
+
+from mwlib.core import metabook, wiki
+from mwlib.network.fetch import FsOutput
+from mwlib.network.siteinfo import get_siteinfo
+from mwlib.parser import advtree
+from mwlib.utils.status import Status
+from mwlib.writers.rl import pdfstyles, writer
+
+TITLES = ["Alpha", "Beta", "Gamma", "Delta"]
+
+
+class BrokenFlowable(Flowable):
+    def wrap(self, avail_width, avail_height):
+        raise ValueError("broken flowable")
+
+
+def make_book(path):
+    fsout = FsOutput(path)
+    fsout.write_siteinfo(get_siteinfo("en"))
+    fsout.write_pages(
+        {
+            "pages": {
+                str(i): {
+                    "title": title,
+                    "ns": 0,
+                    "revisions": [{"revid": 10 + i, "*": f"{title} is an article."}],
+                }
+                for i, title in enumerate(TITLES)
+            }
+        }
+    )
+    fsout.nfo = {
+        "format": "nuwiki",
+        "base_url": "https://en.wikipedia.org/w/",
+        "script_extension": ".php",
+    }
+    fsout.close()
+    mb = metabook.Collection()
+    for title in TITLES:
+        mb.append_article(title)
+    with open(os.path.join(path, "metabook.json"), "w") as f:
+        f.write(mb.dumps())
+    return wiki.make_wiki(path)
+
+
+@pytest.mark.parametrize("broken", [[], ["Beta"], ["Alpha", "Gamma", "Delta"]])
+def test_write_book_marks_broken_articles(tmpdir, monkeypatch, broken):
+    env = make_book(str(tmpdir.join("nuwiki")))
+    render_mixed = writer.RlWriter.renderMixed
+    render_book = writer.RlWriter.renderBook
+    rendered = []
+
+    def renderMixed(self, node, *args, **kw):
+        elements = render_mixed(self, node, *args, **kw)
+        if isinstance(node, advtree.Article) and node.caption in broken:
+            elements.append(BrokenFlowable())
+        return elements
+
+    def renderBook(self, elements, output):
+        rendered.append(sorted(self.failed_articles))
+        return render_book(self, elements, output)
+
+    # the table of contents is merged in by pdftk
+    monkeypatch.setattr(pdfstyles, "RENDER_TOC", False)
+    monkeypatch.setattr(writer.RlWriter, "renderMixed", renderMixed)
+    monkeypatch.setattr(writer.RlWriter, "renderBook", renderBook)
+    rl_writer = writer.RlWriter(env)
+    output = str(tmpdir.join("book.pdf"))
+    rl_writer.writeBook(output, status_callback=Status())
+
+    assert os.path.getsize(output) > 0
+    if not broken:
+        assert rendered == [[]]
+        return
+    # the first failure is attributed to the first broken article, the
+    # others are found by checking the articles before the second render
+    first = TITLES.index(broken[0])
+    assert rendered == [[], [first]]
+    assert rl_writer.failed_articles == {first}
+    assert rl_writer.check_articles
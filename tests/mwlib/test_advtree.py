@@ -261,3 +261,38 @@ Image:Cassini Saturn Orbit Insertion.jpg|''[[Cassini–Huygens]]''<br>First Satu
     assert len(images) == 9
     for image in images:
         assert image.render_caption is True
+
+
+def test_deep_tree_traversal():
+    tree = get_adv_tree("x")
+    node = tree
+    for _ in range(2 * sys.getrecursionlimit()):
+        child = Section()
+        node.append_child(child)
+        node = child
+    node.append_child(Text("leaf"))
+
+    children = list(tree.get_all_children())
+    assert children[-1].caption == "leaf"
+    assert list(tree.allchildren()) == [tree] + children
+    assert len(node.get_parent_nodes_by_class(Section)) == 2 * sys.getrecursionlimit() - 1
+
+
+def test_sibling_index_survives_direct_modification():
+    parent = Section()
+    children = [Text(str(i)) for i in range(5)]
+    for child in children:
+        parent.append_child(child)
+    assert [c.get_next().caption for c in children[:-1]] == ["1", "2", "3", "4"]
+
+    parent.children.insert(0, parent.children.pop())  # bypasses the API
+    assert children[4].get_previous() is None
+    assert children[0].get_previous() is children[4]
+    assert children[3].get_next() is None
+
+    parent.remove_child(children[2])
+    assert children[1].get_next() is children[3]
+    assert not parent.has_child(children[2])
+    assert _id_index(parent.children, children[3]) == 3
+    with pytest.raises(ValueError):
+        _id_index(parent.children, children[2])
@@ -0,0 +1,39 @@
+#! /usr/bin/env py.test
+
+from unittest.mock import patch
+
+from mwlib.utils.diskcache import DiskCache
+
+
+def test_size_is_tracked_without_scanning(tmpdir):
+    cache = DiskCache(str(tmpdir), maxsize=100 * 1024, purge_interval=10)
+    with patch.object(DiskCache, "_list_entries", wraps=cache._list_entries) as scan:
+        for i in range(100):
+            cache["%064x" % i] = "x" * 100
+    # the first update finds no size file and scans the cache once
+    assert scan.call_count == 1
+    assert cache._read_size() + cache.unaccounted == cache.size()
+    assert cache.evictions == 0
+
+
+def test_size_is_shared_and_purged(tmpdir):
+    first = DiskCache(str(tmpdir), maxsize=10 * 1024, purge_interval=10)
+    second = DiskCache(str(tmpdir), maxsize=10 * 1024, purge_interval=10)
+    for i in range(100):
+        cache = first if i % 2 else second
+        cache["%064x" % i] = "x" * 200
+    assert first.evictions + second.evictions > 0
+    assert first.size() <= 10 * 1024
+    assert second._read_size() <= 10 * 1024
+
+
+def test_files(tmpdir):
+    cache = DiskCache(str(tmpdir.join("cache")))
+    src = tmpdir.join("src")
+    src.write_binary(b"data")
+    cache.set_file("ab" * 32, str(src))
+    assert cache.get_file("ab" * 32, str(tmpdir.join("dst")))
+    assert tmpdir.join("dst").read_binary() == b"data"
+    assert not cache.get_file("cd" * 32, str(tmpdir.join("missing")))
+    assert not tmpdir.join("missing").exists()
+    assert cache.size() == 4
@@ -4,6 +4,7 @@ import pytest
 from mwlib.parser import expander
 from mwlib.parser.dummydb import DummyDB
 from mwlib.parser.expander import DictDB
+from mwlib.parser.templ.evaluate import ArgumentList, TemplateCache
 from mwlib.parser.templ.misc import expand_str
 from mwlib.parser.templ.node import show
 from mwlib.parser.templ.nodes import Template, Variable
@@ -759,3 +760,60 @@ def test_safesubst():
     expand_str("{{safesubst:#expr:1+2}}", "3")
     expand_str("{{{{{|safesubst:}}}#expr:1+3}}", "4")
     expand_str("{{safesubst:#if: 1| yes | no}}", "yes")
+
+
+def _expand_cached(txt, **templates):
+    db = DictDB(**templates)
+    te = expander.Expander(txt, pagename="thispage", wikidb=db)
+    return te.expandTemplates(), te.template_cache
+
+
+def test_template_cache_hits():
+    res, cache = _expand_cached(
+        "{{flag|DE}} {{flag|DE}} {{flag|1=DE}} {{flag|FR}}", flag="[[File:{{{1}}}.svg]]"
+    )
+    assert res == "[[File:DE.svg]] [[File:DE.svg]] [[File:DE.svg]] [[File:FR.svg]]"
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_template_cache_skips_page_dependent_templates():
+    res, cache = _expand_cached("{{p|a}} {{p|a}}", p="{{PAGENAME}} {{{1}}}")
+    assert res == "Thispage a Thispage a"
+    assert cache.hits == 0
+    assert not cache._cache
+
+
+def test_template_cache_argument_values():
+    res, cache = _expand_cached(
+        "{{outer|x}} {{outer|y}}", outer="{{inner|{{{1}}}}}", inner="<{{{1}}}>"
+    )
+    assert res == "<x> <y>"
+    assert cache.hits == 0
+
+
+def test_template_cache_skips_unused_arguments():
+    db = DictDB(t="<{{{1}}}>")
+    te = expander.Expander("{{t|a|{{DISPLAYTITLE:Other}}}} {{t|a|b}}", wikidb=db)
+    assert te.expandTemplates() == "<a> <a>"
+    assert (te.template_cache.hits, te.template_cache.misses) == (1, 1)
+    # an argument the template does not use is not expanded
+    assert te.magic_displaytitle is None
+
+
+def test_template_cache_accessed_arguments():
+    res, cache = _expand_cached(
+        "{{t|x|A|B}} {{t||A|B}} {{t|x|A|C}} {{t||C|B}}", t="{{#if:{{{1|}}}|{{{2}}}|{{{3}}}}}"
+    )
+    assert res == "A B A B"
+    # {{{3}}} is not used if {{{1}}} is set, {{{2}}} if it is not
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_template_cache_maxsize():
+    cache = TemplateCache(10)
+    args = ArgumentList(args=["x"], expander=expander.Expander("", wikidb=DictDB()))
+    cache.set("a", {"1": "x"}, ["12345"])
+    cache.set("b", {}, ["0123456789"])
+    assert cache.get("a", args) == ("12345",)
+    assert cache.get("b", args) is None
+    assert cache.size == 7
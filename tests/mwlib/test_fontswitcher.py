@@ -0,0 +1,103 @@
+#! /usr/bin/env py.test
+
+import pytest
+
+from mwlib.rendering.fontswitcher import FontSwitcher, Scripts
+from mwlib.writers.rl import fontconfig
+
+
+def reference_runs(switcher, txt):
+    """character by character segmentation the run matching must agree with"""
+
+    def get_font(ord_c):
+        for block_start, block_end, font_name in switcher.code_points2font:
+            if block_start <= ord_c <= block_end:
+                return font_name
+        return switcher.default_font
+
+    txt_list = []
+    last_font = None
+    last_txt = []
+    for text_char in txt:
+        ord_c = ord(text_char)
+        blacklisted = switcher.char_blacklist.get(ord_c, False)
+        if ord_c in switcher.no_switch_chars or blacklisted:
+            if ord_c in switcher.remove_chars:
+                text_char = ""
+            if ord_c in switcher.space_like_chars:
+                text_char = " "
+            if blacklisted:
+                text_char = chr(9633)
+            font = last_font if last_font else switcher.default_font
+        else:
+            font = get_font(ord_c)
+        if font != last_font and last_txt:
+            txt_list.append(("".join(last_txt), last_font))
+            last_txt = []
+        last_txt.append(text_char)
+        last_font = font
+    return last_font, "".join(last_txt), txt_list
+
+
+@pytest.fixture
+def switcher():
+    fs = FontSwitcher()
+    for font in fontconfig.fonts:
+        fs.register_font(font["name"], code_points=font.get("code_points"))
+    fs.register_default_font("DejaVuSans")
+    return fs
+
+
+SAMPLES = [
+    "",
+    "plain latin text",
+    "­soft­ hyphen‎ and ‏marks\tand\x7f controls\x01",
+    "Tokyo 東京都 العربية text",
+    "किताब ภาษา 한국어 ─│",
+    " 東 leading space, unassigned \U000e01f0 and astral \U0001f600 chars",
+]
+
+
+@pytest.mark.parametrize("txt", SAMPLES)
+def test_runs_match_reference(switcher, txt):
+    last_font, last_txt, txt_list = switcher.extract_last_font_last_text_and_text_list(txt)
+    assert (last_font, "".join(last_txt), txt_list) == reference_runs(switcher, txt)
+
+
+def test_blacklisted_chars(switcher):
+    switcher.char_blacklist = {ord("x"): True}
+    switcher.unregister_font("DejaVuSans")  # rebuild lookup tables
+    txt = "x東x and x"
+    last_font, last_txt, txt_list = switcher.extract_last_font_last_text_and_text_list(txt)
+    assert (last_font, "".join(last_txt), txt_list) == reference_runs(switcher, txt)
+    assert "x" not in "".join(run for run, _ in txt_list)
+
+
+def test_get_font_priority_and_default():
+    fs = FontSwitcher()
+    fs.register_font("wide", code_points=[(0x100, 0x2FF)])
+    fs.register_font("narrow", code_points=[(0x180, 0x1FF)])
+    assert fs.get_font(0x41) is None
+    assert fs.get_font(0x100) == "wide"
+    assert fs.get_font(0x180) == "narrow"
+    assert fs.get_font(0x1FF) == "narrow"
+    assert fs.get_font(0x200) == "wide"
+    assert fs.get_font(0x300) is None
+
+    fs.register_default_font("default")
+    assert fs.get_font(0x41) == "default"
+    assert fs.get_font_list("Aƀɐ") == [("A", "default"), ("ƀ", "narrow"), ("ɐ", "wide")]
+
+    fs.unregister_font("narrow")
+    assert fs.get_font(0x180) == "wide"
+    assert fs.get_font_list("Aƀɐ") == [("A", "default"), ("ƀɐ", "wide")]
+
+
+def test_get_scripts():
+    scripts = Scripts()
+    assert scripts.get_scripts("") == []
+    assert scripts.get_scripts("   ") == []
+    assert sorted(scripts.get_scripts("abc 東京")) == sorted(
+        {scripts.get_script(ord("a")), scripts.get_script(0x6771)}
+    )
+    assert scripts.get_script(0x0627) in scripts.get_scripts("ا \U000e01f0")
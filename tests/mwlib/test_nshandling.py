@@ -53,3 +53,18 @@ def test_localized_redirect_matcher():
     bad_redirect = "bad redirect"
     assert m("#REDIRECT [[Data structure]]") == data_structure, bad_redirect
     assert m("#WEITERLEITUNG [[Data structure]]") == data_structure, bad_redirect
+
+
+def test_namespace_aliases():
+    assert nshandler.splitname("Bild:Foo.jpg") == (6, "Foo.jpg", "Datei:Foo.jpg")
+    assert nshandler.splitname("image:Foo.jpg") == (6, "Foo.jpg", "Datei:Foo.jpg")
+    assert nshandler.splitname("nonamespace:Foo") == (0, "Nonamespace:Foo", "Nonamespace:Foo")
+
+
+def test_splitname_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(nshandling, "SPLITNAME_CACHE_SIZE", 10)
+    handler = nshandling.NsHandler(siteinfo_de)
+    for i in range(25):
+        assert handler.get_fqname(f"user:name {i}") == f"Benutzer:Name {i}"
+    assert len(handler._splitname_cache) <= 10
+    assert handler.get_fqname("user:name 24") == "Benutzer:Name 24"
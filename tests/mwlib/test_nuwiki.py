@@ -47,3 +47,142 @@ class TestNuwikiXnet:
         assert self.nuwiki.siteinfo["general"]["lang"] == "de"
         assert self.nuwiki.nshandler is not None
         assert self.nuwiki.nfo["base_url"] == "https://de.wikipedia.org/w/"
+
+
+def make_collection_zip(zip_fn):
+    from sqlitedict import SqliteDict
+
+    from mwlib.network.siteinfo import get_siteinfo
+    from mwlib.utils import myjson
+    from mwlib.utils.unorganized import fs_escape
+
+    page = (
+        "\n\f --page-- "
+        + myjson.dumps({"title": "Monty Python", "ns": 0, "revid": 42})
+        + "\nMonty Python is a comedy group."
+    )
+    db_fn = zip_fn + ".db"
+    db = SqliteDict(db_fn, autocommit=True)
+    db["Monty Python"] = myjson.dumps(["Eric", "John"])
+    db.close()
+    with zipfile.ZipFile(zip_fn, "w") as zf:
+        zf.writestr("nfo.json", myjson.dumps({"format": "nuwiki", "base_url": "https://en.wikipedia.org/w/"}))
+        zf.writestr("siteinfo.json", myjson.dumps(get_siteinfo("en")), zipfile.ZIP_DEFLATED)
+        zf.writestr("revisions-1.txt", page.encode("utf-8"))
+        zf.writestr("images/" + fs_escape("File:Flying Circus.png"), b"\x89PNG image data", zipfile.ZIP_DEFLATED)
+        zf.write(db_fn, "authors.db")
+    os.unlink(db_fn)
+
+
+def test_zip_nuwiki(tmpdir):
+    zip_fn = str(tmpdir.join("collection.zip"))
+    make_collection_zip(zip_fn)
+    adapt = Adapt(zipfile.ZipFile(zip_fn))
+    wiki = adapt.nuwiki
+    path = wiki.path
+    try:
+        assert adapt.was_tmpdir
+        assert wiki.get_page("Monty Python").rawtext == "Monty Python is a comedy group."
+        assert wiki.get_page(None, 42).title == "Monty Python"
+        assert wiki.nfo["base_url"] == "https://en.wikipedia.org/w/"
+        assert wiki.siteinfo["general"]["lang"] == "en"
+        assert adapt.get_authors("Monty Python") == ["Eric", "John"]
+
+        # only members needed on disk are extracted
+        assert sorted(os.listdir(path)) == ["authors.db", "images"]
+        img_path = adapt.get_disk_path("File:Flying Circus.png")
+        assert os.path.islink(img_path)
+        with open(img_path, "rb") as f:
+            assert f.read() == b"\x89PNG image data"
+        assert adapt.get_disk_path("File:Missing.png") is None
+    finally:
+        adapt.clear()
+    assert not os.path.exists(path)
+
+
+def test_fsout_databases(tmpdir):
+    from mwlib.core.nuwiki import NuWiki
+    from mwlib.network.fetch import FsOutput
+    from mwlib.network.siteinfo import get_siteinfo
+
+    path = str(tmpdir.join("nuwiki"))
+    fsout = FsOutput(path, commit_count=2, commit_interval=3600)
+    fsout.write_siteinfo(get_siteinfo("en"))
+    fsout.set_db_key("authors", "Monty Python", ["Eric", "John"])
+    assert fsout.uncommitted == 1
+    fsout.set_db_key("imageinfo", "File:Flying Circus.png", {"width": 100})
+    assert fsout.uncommitted == 0
+    fsout.set_db_key("html", "Monty Python", {"text": {"*": "<p>comedy</p>"}})
+    fsout.close()
+
+    # closing checkpoints the write-ahead logs into the database files
+    assert sorted(name for name in os.listdir(path) if ".db" in name) == [
+        "authors.db",
+        "html.db",
+        "imageinfo.db",
+    ]
+    wiki = NuWiki(path)
+    assert wiki.authors["Monty Python"] == ["Eric", "John"]
+    assert wiki.authors["Graham Chapman"] is None
+    assert wiki.imageinfo.get("File:Flying Circus.png") == {"width": 100}
+    assert wiki.html.items() == [("Monty Python", '{"text": {"*": "<p>comedy</p>"}}')]
+
+
+_forked_wiki = None
+
+
+def _read_imageinfo(_=None):
+    imageinfo = _forked_wiki.imageinfo
+    return os.getpid(), imageinfo.get("File:Flying Circus.png"), imageinfo._pid
+
+
+def test_databases_are_reopened_after_fork(tmpdir):
+    import multiprocessing
+
+    from mwlib.core.nuwiki import NuWiki
+    from mwlib.network.fetch import FsOutput
+    from mwlib.network.siteinfo import get_siteinfo
+
+    global _forked_wiki
+    path = str(tmpdir.join("nuwiki"))
+    fsout = FsOutput(path)
+    fsout.write_siteinfo(get_siteinfo("en"))
+    fsout.set_db_key("imageinfo", "File:Flying Circus.png", {"width": 100})
+    fsout.close()
+
+    # the workers use the wiki of the parent like the ones of the rl writer
+    _forked_wiki = NuWiki(path)
+    try:
+        parent = _read_imageinfo()
+        with multiprocessing.get_context("fork").Pool(2) as pool:
+            results = pool.map(_read_imageinfo, range(4), chunksize=1)
+        assert _read_imageinfo() == parent
+    finally:
+        _forked_wiki = None
+    assert all(info == {"width": 100} for _, info, _ in results)
+    # every worker connected to the database on its own
+    assert all(pid == db_pid != parent[0] for pid, _, db_pid in results)
+
+
+def test_zip_nuwiki_maps_frames(tmpdir):
+    from mwlib.apps.buildzip import zip_dir
+    from mwlib.network.fetch import FsOutput
+    from mwlib.network.siteinfo import get_siteinfo
+
+    path = str(tmpdir.join("nuwiki"))
+    fsout = FsOutput(path, compression="zlib")
+    fsout.write_siteinfo(get_siteinfo("en"))
+    fsout.write_expanded_page("Monty Python", 0, "Monty Python is a comedy group. " * 20)
+    fsout.close()
+    zip_fn = zip_dir(path, str(tmpdir.join("collection.zip")))
+
+    with zipfile.ZipFile(zip_fn) as zf:
+        assert zf.getinfo("revisions-1.frames").compress_type == zipfile.ZIP_STORED
+        adapt = Adapt(zf)
+        try:
+            wiki = adapt.nuwiki
+            assert wiki.get_page("Monty Python").rawtext == "Monty Python is a comedy group. " * 20
+            # the frames are read from the mapped zip file
+            assert "revisions-1.frames" not in os.listdir(wiki.path)
+        finally:
+            adapt.clear()
@@ -6,6 +6,7 @@ import os
 import re
 import sys
 import tempfile
+import zipfile
 from contextlib import suppress
 from io import StringIO
 
@@ -484,3 +485,31 @@ B (''Molothrus ater'') are
     xml = get_xml(raw)
     print(xml)
     assert "Molothrus" in xml
+
+
+def make_book(num_articles):
+    book = mwlib.parser.Book()
+    for i in range(num_articles):
+        raw = f"== Section {i} ==\nsome '''bold''' text\n* a\n* b\n{{| class=wikitable\n|a||b\n|}}\n"
+        book.append_child(parse_string(title=f"Article {i}", raw=raw, wikidb=DummyDB()))
+    preprocess(book)
+    return book
+
+
+def test_write_book_streams_content(tmpdir):
+    stream_path = tmpdir.join("stream.odt").strpath
+    odfw = ODFWriter()
+    odfw.writeBook(make_book(3), stream_path)
+    assert not odfw.getDoc().text.childNodes
+    assert not lint_file(stream_path)
+
+    memory_path = tmpdir.join("memory.odt").strpath
+    odfw = ODFWriter()
+    for article in make_book(3).children:
+        odfw.write(article, odfw.getDoc().text)
+    odfw.getDoc().save(memory_path)
+
+    with zipfile.ZipFile(stream_path) as stream, zipfile.ZipFile(memory_path) as memory:
+        assert stream.namelist() == memory.namelist()
+        for name in memory.namelist():
+            assert stream.read(name) == memory.read(name)
@@ -0,0 +1,84 @@
+#! /usr/bin/env py.test
+
+import pytest
+
+from mwlib.parser import expander, sitecontext
+from mwlib.parser.expander import DictDB
+from mwlib.parser.templ import parsecache
+from mwlib.parser.templ.marks import eqmark
+from mwlib.utils import lrucache
+
+
+@pytest.fixture
+def parse_cache(tmpdir):
+    cache = parsecache.ParseCache(str(tmpdir.join("templ")))
+    parsecache.set_parse_cache(cache)
+    yield cache
+    parsecache.set_parse_cache(None)
+
+
+def expand(txt, **templates):
+    db = DictDB(**templates)
+    return expander.Expander(txt, pagename="test", wikidb=db).expandTemplates()
+
+
+def test_hit_after_miss(parse_cache):
+    templates = dict(Foo="{{{1}}}-{{{a}}}")
+    assert expand("{{Foo|x|a=y}}", **templates) == "x-y"
+    assert parse_cache.stats()["misses"] == 1
+    assert expand("{{Foo|x|a=z}}", **templates) == "x-z"
+    assert parse_cache.stats()["hits"] == 1
+
+
+def test_tags_survive_cache(parse_cache):
+    templates = dict(Ref="a<nowiki>{{b}}</nowiki>c<ref>{{{1}}}</ref>")
+    expected = expand("{{Ref|x}}", **templates)
+    assert expand("{{Ref|x}}", **templates) == expected
+    assert parse_cache.stats()["hits"] == 1
+    assert "a{{b}}c<ref>{{{1}}}</ref>" == expected
+
+
+def test_eqmark_identity(parse_cache):
+    key = parse_cache.get_key("{{a|b=c}}")
+    parse_cache.parse("{{a|b=c}}", expander.Expander("", wikidb=DictDB()).uniquifier)
+    parsed, _ = parse_cache.store[key]
+    assert parsed[1][0][1] is eqmark
+
+
+def test_key_depends_on_magicwords(parse_cache):
+    si1 = {"magicwords": [{"name": "if", "aliases": ["if"]}]}
+    si2 = {"magicwords": [{"name": "if", "aliases": ["if", "wenn"]}]}
+    assert parse_cache.get_key("x", siteinfo=si1) != parse_cache.get_key("x", siteinfo=si2)
+    assert parse_cache.get_key("x", siteinfo=si1) != parse_cache.get_key(
+        "x", included=False, siteinfo=si1
+    )
+
+
+def test_key_does_not_keep_siteinfos(parse_cache):
+    # every call brings a new siteinfo dict, like the Expanders of a
+    # long running worker
+    keys = {parse_cache.get_key("x", siteinfo={"magicwords": []}) for _ in range(200)}
+    assert len(keys) == 1
+    assert len(sitecontext._contexts) <= sitecontext.MAX_SITE_CONTEXTS
+
+
+def test_purge(tmpdir):
+    cache = parsecache.ParseCache(str(tmpdir), maxsize=1024)
+    for i in range(50):
+        cache.store["%064x" % i] = "x" * 100
+    assert cache.store.purge() > 0
+    assert cache.store.size() <= 1024
+
+
+def test_memory_parse_cache(monkeypatch):
+    monkeypatch.setattr(lrucache, "_registry", {})
+    cache = parsecache.MemoryParseCache(10)
+    parsecache.set_parse_cache(cache)
+    try:
+        templates = dict(Ref="a<nowiki>{{b}}</nowiki>c<ref>{{{1}}}</ref>")
+        expected = expand("{{Ref|x}}", **templates)
+        assert expand("{{Ref|x}}", **templates) == expected
+        assert "a{{b}}c<ref>{{{1}}}</ref>" == expected
+        assert cache.stats()["hits"] == 1
+    finally:
+        parsecache.set_parse_cache(None)
@@ -1359,3 +1359,38 @@ def test_stray_tag():
     txt = parse(s).as_text()
     print(txt)
     assert "div" not in txt, "stray tag in output"
+
+
+def test_postprocessors_merge_text():
+    raw = "a &amp; b ''c'' d &lt; e &gt; f"
+    r = uparser.parse_string(title="X33", raw=raw, wikidb=DummyDB())
+    assert [text.caption for text in r.find(parser.Text)] == ["a & b ", "c", " d < e > f"]
+
+
+def test_postprocessors_remove_boilerplate():
+    from mwlib.parser import post_processors
+
+    div = parser.TagNode("div")
+    div.values = {"class": "metadata boilerplate"}
+    node = parser.Node()
+    node.children.extend([parser.Text("a"), div, parser.Text("b")])
+    post_processors.run_postprocessors(node)
+    assert [child.caption for child in node.children] == ["ab"]
+
+
+def test_run_postprocessors_keeps_order():
+    from mwlib.parser import post_processors
+
+    calls = []
+
+    def tree_processor(node, **kwargs):
+        calls.append((len(node.children[0].children), kwargs))
+
+    node = parser.Node()
+    node.children.append(parser.Node())
+    node.children[0].children.extend([parser.Text("a"), parser.Text("b")])
+    post_processors.run_postprocessors(
+        node, [tree_processor, post_processors.simplify, tree_processor], lang="de"
+    )
+    assert calls == [(2, {"lang": "de"}), (1, {"lang": "de"})]
+    assert node.children[0].children[0].caption == "ab"
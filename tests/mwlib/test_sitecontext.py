@@ -0,0 +1,47 @@
+#! /usr/bin/env py.test
+
+import copy
+
+from mwlib.core import nshandling
+from mwlib.network.siteinfo import get_siteinfo
+from mwlib.parser import sitecontext
+from mwlib.parser.expander import DictDB, Expander
+from mwlib.parser.templ import parser
+
+
+def test_context_is_shared():
+    si = get_siteinfo("de")
+    ctx = sitecontext.get_site_context(si)
+    assert sitecontext.get_site_context(si) is ctx
+    assert nshandling.get_nshandler_for_lang("de") is ctx.nshandler
+    assert parser.Parser("text", siteinfo=si).aliasmap is ctx.aliasmap
+
+
+def test_context_per_siteinfo():
+    si = get_siteinfo("de")
+    other = copy.deepcopy(si)
+    assert sitecontext.get_site_context(other) is not sitecontext.get_site_context(si)
+
+
+def test_localized_branch_regexes():
+    ctx = sitecontext.get_site_context(get_siteinfo("de"))
+    assert ctx.name2rx["if"].match("#if:")
+    assert ctx.name2rx["switch"].match("#switch:")
+
+
+def test_expanders_share_context():
+    db = DictDB()
+    first = Expander("{{PAGENAME}}", pagename="Foo", wikidb=db)
+    second = Expander("{{PAGENAME}}", pagename="Bar", wikidb=db)
+    assert first.nshandler is second.nshandler
+    assert first.aliasmap is second.aliasmap
+    assert first.expandTemplates() == "Foo"
+    assert second.expandTemplates() == "Bar"
+
+
+def test_imagemod():
+    si = get_siteinfo("de")
+    ctx = sitecontext.get_site_context(si)
+    assert ctx.get_imagemod(si["magicwords"]) is ctx.imagemod
+    assert ctx.get_imagemod(None) is not ctx.imagemod
+    assert ctx.imagemod.parse("miniatur") == ("img_thumbnail", "miniatur")
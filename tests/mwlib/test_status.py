@@ -0,0 +1,91 @@
+#! /usr/bin/env py.test
+
+import json
+import threading
+import time
+
+from mwlib.utils import status as status_module
+from mwlib.utils.status import Status, StatusPublisher
+
+
+class RecordingSink:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.sent = []
+
+    def __call__(self, status):
+        time.sleep(self.delay)
+        self.sent.append(status)
+
+
+def test_publisher_coalesces_updates():
+    sink = RecordingSink()
+    publisher = StatusPublisher(sink, interval=60)
+    for progress in range(100):
+        publisher.publish({"progress": progress})
+    publisher.flush()
+    # the first update is sent by the background thread, all others are
+    # coalesced into the flushed one
+    assert sink.sent[-1] == {"progress": 99}
+    assert len(sink.sent) <= 2
+
+
+def test_slow_sink_does_not_block():
+    sink = RecordingSink(delay=0.5)
+    publisher = StatusPublisher(sink, interval=0.01)
+    stime = time.time()
+    for progress in range(10):
+        publisher.publish({"progress": progress})
+    assert time.time() - stime < 0.25
+    publisher.flush()
+    assert sink.sent[-1] == {"progress": 9}
+
+
+def test_synchronous_without_interval():
+    sink = RecordingSink()
+    publisher = StatusPublisher(sink, interval=0)
+    publisher.publish({"progress": 1})
+    assert sink.sent == [{"progress": 1}]
+
+
+def test_final_status_is_written(tmpdir):
+    filename = str(tmpdir.join("status"))
+    status = Status(filename, interval=60)
+    status.stdout = None
+    status(status="rendering", progress=0)
+    sub_status = status.get_sub_range(50, 100)
+    for i in range(10):
+        sub_status(article="article %d" % i, progress=i * 10)
+    status(status="finished", progress=100, file_extension="pdf")
+    with open(filename) as status_file:
+        result = json.load(status_file)
+    assert result["status"] == "finished"
+    assert result["progress"] == 100
+    assert result["file_extension"] == "pdf"
+    assert ("file", filename) not in status_module._publishers
+
+
+def test_sinks_are_called_from_background_thread():
+    threads = []
+    publisher = StatusPublisher(lambda status: threads.append(threading.get_ident()), 60)
+    publisher.publish({})
+    for _ in range(100):
+        if threads:
+            break
+        time.sleep(0.01)
+    assert threads[0] != threading.get_ident()
+
+
+def test_flush_sends_from_background_thread():
+    # a QserveSink keeps its connection: the final status must not be
+    # sent from another thread than the progress updates
+    threads = []
+    publisher = StatusPublisher(lambda status: threads.append(threading.get_ident()), 60)
+    for progress in range(3):
+        publisher.publish({"progress": progress})
+        publisher.flush()
+    publisher.publish({"status": "finished"})
+    publisher.close()
+    assert len(threads) == 4
+    assert len(set(threads)) == 1
+    assert threads[0] != threading.get_ident()
@@ -16,3 +16,12 @@ def test_aliasmap_no_magicwords():
 def test_parser_no_magicwords():
     p = parser.Parser("some text", siteinfo=si)
     p.parse()
+
+
+def test_parser_cache(monkeypatch):
+    monkeypatch.setattr(parser.Parser, "use_cache", True)
+    first = parser.parse("{{foo|bar}}")
+    assert parser.parse("{{foo|bar}}") is first
+    assert parser.parse("{{foo|bar}}", included=False) is not first
+    replaced = parser.parse("{{foo|bar}}", replace_tags=lambda txt: txt)
+    assert replaced is not first
@@ -12,6 +12,7 @@ from mwlib.parser.advtree import (
     BreakingReturn,
     Center,
     DefinitionDescription,
+    DefinitionList,
     Div,
     Emphasized,
     Gallery,
@@ -376,6 +377,32 @@ def test_fix_nesting6():
     assert len(tree.get_child_nodes_by_class(Reference)) == 1
 
 
+def test_fix_nesting_many():
+    raw = "".join(f"para {i}\n; term {i} : definition {i}\n\n" for i in range(20))
+    tree, reports = clean_markup(raw)
+    _treesanity(tree)
+    def_lists = tree.get_child_nodes_by_class(DefinitionList)
+    assert len(def_lists) == 20
+    for def_list in def_lists:
+        assert not def_list.get_parent_nodes_by_class(Paragraph)
+
+
+def test_skip_cleaners_without_matching_nodes():
+    tree = get_tree_from_markup("just some text")
+    build_advanced_tree(tree)
+    called = []
+
+    class Cleaner(TreeCleaner):
+        def fix_table_colspans(self, node):
+            called.append("fix_table_colspans")
+
+        def remove_childless_nodes(self, node):
+            called.append("remove_childless_nodes")
+
+    Cleaner(tree).clean(["fix_table_colspans", "remove_childless_nodes"])
+    assert called == ["remove_childless_nodes"]
+
+
 def test_swap_nodes():
     raw = r"""
 <u><center>Text</center></u>
@@ -6,7 +6,7 @@ import socket
 
 import pytest
 
-from mwlib.utils import unorganized
+from mwlib.utils import lrucache, unorganized
 
 
 @pytest.mark.parametrize(
@@ -60,3 +60,21 @@ def test_garble_password():
     assert "secret" not in x
     unorganized.garble_password(["foo", "--password"])
     unorganized.garble_password(["foo"])
+
+
+def test_lrucache_registry(monkeypatch):
+    monkeypatch.setattr(lrucache, "_registry", {})
+    cache = lrucache.get_cache("test", 2)
+    assert lrucache.get_cache("test", 10) is cache
+    cache["a"] = "x" * 100
+    cache["b"] = "y"
+    cache["c"] = "z"
+    assert "a" not in cache
+    assert cache.get("a") is None
+    assert cache.get("c") == "z"
+    stats = lrucache.stats()["test"]
+    assert stats["entries"] == 2
+    assert stats["maxsize"] == 2
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 0.5
+    assert stats["memory"] > 0
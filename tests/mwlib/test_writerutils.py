@@ -9,7 +9,7 @@ from mwlib.parser import advtree
 from mwlib.parser.dummydb import DummyDB
 from mwlib.parser.refine.uparser import parse_string
 from mwlib.parser.treecleaner import TreeCleaner
-from mwlib.rendering import styleutils
+from mwlib.rendering import styleutils, writerbase
 
 RETURN_FALSE_ALIGNMENT = "styleutils.getCelTextAlign() returns false alignment"
 
@@ -106,3 +106,23 @@ def test_textalign3():
     for i, cell in enumerate(cells):
         align = styleutils.get_text_alignment(cell)
         assert align == correct_align[i], RETURN_FALSE_ALIGNMENT
+
+
+class DummyWriter:
+    def writeNode(self, node):
+        return "node"
+
+    def writeText(self, node):
+        return "text"
+
+
+def test_node_dispatcher():
+    writer = DummyWriter()
+    dispatcher = writerbase.NodeDispatcher(writer, "write")
+    assert dispatcher.get_handler(parser.Text("a"))(writer, None) == "text"
+    assert dispatcher.get_handler(parser.Text("b"))(writer, None) == "text"
+    assert dispatcher.get_handler(parser.Section()) is None
+    assert dispatcher.get_stats() == [("Text", 2), ("Section", 1)]
+
+    dispatcher = writerbase.NodeDispatcher(writer, "write", fallback=True)
+    assert dispatcher.get_handler(parser.Section())(writer, None) == "node"
@@ -0,0 +1,109 @@
+#! /usr/bin/env py.test
+
+import gevent
+import pytest
+
+from qs import rpcclient, rpcserver
+
+
+class Plugin:
+    sleeps = 0
+
+    def __init__(self, **kw):
+        pass
+
+    def rpc_echo(self, value):
+        return value
+
+    def rpc_sleep(self, seconds):
+        Plugin.sleeps += 1
+        gevent.sleep(seconds)
+        return seconds
+
+    def rpc_fail(self):
+        raise ValueError("failed as requested")
+
+    def shutdown(self):
+        pass
+
+
+class Handler(rpcserver.RequestHandler, Plugin):
+    pass
+
+
+@pytest.fixture
+def server():
+    server = rpcserver.Server(0, host="127.0.0.1", get_request_handler=Handler)
+    server.stream_server.start()
+    yield server
+    server.stream_server.stop()
+
+
+@pytest.fixture
+def proxy(server):
+    port = server.stream_server.socket.getsockname()[1]
+    client = rpcclient.MultiplexClient(host="127.0.0.1", port=port)
+    yield rpcclient.ServerProxy(rpc_client=client)
+    client.close()
+
+
+def test_call(proxy):
+    assert proxy.echo(value=[1, "a"]) == [1, "a"]
+    assert proxy.echo(value=2) == 2
+
+
+def test_calls_in_flight(proxy):
+    slow = gevent.spawn(proxy.sleep, seconds=0.5)
+    fast = gevent.spawn(proxy.sleep, seconds=0.01)
+    fast.join(timeout=0.3)
+    assert fast.value == 0.01
+    assert not slow.ready()
+    assert slow.get() == 0.5
+
+
+def test_batch(proxy):
+    calls = [("echo", {"value": 1}), ("sleep", {"seconds": 0}), ("echo", {"value": 3})]
+    assert proxy.batch(calls) == [1, 0, 3]
+
+
+def test_error(proxy):
+    with pytest.raises(RuntimeError, match="failed as requested"):
+        proxy.fail()
+    with pytest.raises(RuntimeError, match="failed as requested"):
+        proxy.batch([("echo", {"value": 1}), ("fail", {})])
+    assert proxy.echo(value=1) == 1
+
+
+def test_reconnect(proxy):
+    assert proxy.echo(value=1) == 1
+    proxy.get_client().close()
+    assert proxy.echo(value=2) == 2
+
+
+class BrokenWriter:
+    def write(self, data):
+        raise BrokenPipeError("broken pipe")
+
+
+def test_retry_failed_send(proxy):
+    assert proxy.echo(value=1) == 1
+    proxy.get_client().connection.writer = BrokenWriter()
+    assert proxy.echo(value=2) == 2
+
+
+def test_no_retry_after_send(proxy):
+    Plugin.sleeps = 0
+    call = gevent.spawn(proxy.sleep, seconds=0.2)
+    gevent.sleep(0.05)
+    # the connection is lost while qserve is executing the call
+    proxy.get_client().connection.close(ConnectionError("connection lost"))
+    with pytest.raises(ConnectionError, match="connection lost"):
+        call.get()
+    gevent.sleep(0.3)
+    assert Plugin.sleeps == 1
+
+
+def test_get_proxy_shares_client():
+    assert rpcclient.get_proxy("example.com", 1).get_client() is rpcclient.get_proxy(
+        "example.com", 1
+    ).get_client()